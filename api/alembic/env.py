@@ -19,6 +19,11 @@ from dotenv import load_dotenv
 from models.auth_model import User, UserRole
 from models.user_model import *
 from models.order_model import *
+from models.prescription_model import *
+from models.pharmacy_model import *
+from models.notification_model import *
+from models.outbox_model import *
+from models.idempotency_model import *
 
 load_dotenv()
 
@@ -0,0 +1,48 @@
+"""add pharmacies
+
+Revision ID: a3c9e1f47d25
+Revises: f18c6d4e7b92
+Create Date: 2026-10-17 16:52:09.417733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e1f47d25'
+down_revision: Union[str, Sequence[str], None] = 'f18c6d4e7b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pharmacies',
+    sa.Column('id', sa.String(length=50), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('address', sa.String(length=500), nullable=False),
+    sa.Column('city', sa.String(length=100), nullable=True),
+    sa.Column('phone', sa.String(length=20), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), server_default='true', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pharmacies_id'), 'pharmacies', ['id'], unique=False)
+    op.create_index(op.f('ix_pharmacies_updated_at'), 'pharmacies', ['updated_at'], unique=False)
+    op.add_column('orders', sa.Column('delivery_latitude', sa.Float(), nullable=True))
+    op.add_column('orders', sa.Column('delivery_longitude', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('orders', 'delivery_longitude')
+    op.drop_column('orders', 'delivery_latitude')
+    op.drop_index(op.f('ix_pharmacies_updated_at'), table_name='pharmacies')
+    op.drop_index(op.f('ix_pharmacies_id'), table_name='pharmacies')
+    op.drop_table('pharmacies')
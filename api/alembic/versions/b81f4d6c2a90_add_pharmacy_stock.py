@@ -0,0 +1,38 @@
+"""add pharmacy stock
+
+Revision ID: b81f4d6c2a90
+Revises: a3c9e1f47d25
+Create Date: 2026-10-17 17:40:21.903518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f4d6c2a90'
+down_revision: Union[str, Sequence[str], None] = 'a3c9e1f47d25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pharmacy_stock',
+    sa.Column('pharmacy_id', sa.String(length=50), nullable=False),
+    sa.Column('medication_key', sa.String(length=255), nullable=False),
+    sa.Column('medication_name', sa.String(length=255), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['pharmacy_id'], ['pharmacies.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('pharmacy_id', 'medication_key')
+    )
+    op.create_index(op.f('ix_pharmacy_stock_updated_at'), 'pharmacy_stock', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_pharmacy_stock_updated_at'), table_name='pharmacy_stock')
+    op.drop_table('pharmacy_stock')
@@ -0,0 +1,43 @@
+"""add prescription uploads
+
+Revision ID: d92a5f3b1e48
+Revises: c4d81e2f6a37
+Create Date: 2026-10-17 14:02:51.337915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd92a5f3b1e48'
+down_revision: Union[str, Sequence[str], None] = 'c4d81e2f6a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('prescription_uploads',
+    sa.Column('id', sa.String(length=50), nullable=False),
+    sa.Column('order_id', sa.String(length=50), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('received', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('content_type', sa.String(length=100), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_prescription_uploads_expires_at'), 'prescription_uploads', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_prescription_uploads_order_id'), 'prescription_uploads', ['order_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_prescription_uploads_order_id'), table_name='prescription_uploads')
+    op.drop_index(op.f('ix_prescription_uploads_expires_at'), table_name='prescription_uploads')
+    op.drop_table('prescription_uploads')
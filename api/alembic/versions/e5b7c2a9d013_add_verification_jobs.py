@@ -0,0 +1,48 @@
+"""add verification jobs
+
+Revision ID: e5b7c2a9d013
+Revises: d92a5f3b1e48
+Create Date: 2026-10-17 14:48:19.270556
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7c2a9d013'
+down_revision: Union[str, Sequence[str], None] = 'd92a5f3b1e48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('verification_jobs',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('order_id', sa.String(length=50), nullable=False),
+    sa.Column('blob_sha256', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'DONE', 'FAILED', name='verificationjobstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['blob_sha256'], ['prescription_blobs.sha256'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_verification_jobs_status_available_at', 'verification_jobs', ['status', 'available_at'], unique=False)
+    op.create_index(op.f('ix_verification_jobs_order_id'), 'verification_jobs', ['order_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_verification_jobs_order_id'), table_name='verification_jobs')
+    op.drop_index('ix_verification_jobs_status_available_at', table_name='verification_jobs')
+    op.drop_table('verification_jobs')
+    sa.Enum(name='verificationjobstatus').drop(op.get_bind(), checkfirst=True)
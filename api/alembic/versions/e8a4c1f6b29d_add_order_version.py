@@ -0,0 +1,28 @@
+"""add order version
+
+Revision ID: e8a4c1f6b29d
+Revises: d3f7b9e2c561
+Create Date: 2026-10-17 16:05:27.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a4c1f6b29d'
+down_revision: Union[str, Sequence[str], None] = 'd3f7b9e2c561'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('orders', 'version')
@@ -0,0 +1,33 @@
+"""add prescription derivatives
+
+Revision ID: f18c6d4e7b92
+Revises: e5b7c2a9d013
+Create Date: 2026-10-17 15:36:44.108327
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f18c6d4e7b92'
+down_revision: Union[str, Sequence[str], None] = 'e5b7c2a9d013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('prescription_image_path', sa.String(length=500), nullable=True))
+    op.add_column('orders', sa.Column('prescription_thumbnails', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column('prescription_blobs', sa.Column('derivatives', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('prescription_blobs', 'derivatives')
+    op.drop_column('orders', 'prescription_thumbnails')
+    op.drop_column('orders', 'prescription_image_path')
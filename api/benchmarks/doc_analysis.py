@@ -0,0 +1,120 @@
+"""
+Prescription documents analysed per second, by file type, on one core versus
+the document analysis process pool.
+
+Synthetic documents are generated in a temporary directory: a 12 MP phone
+photo (JPEG), an A4 300 dpi scan (PNG), the same scan wrapped in a PDF, and a
+PDF with a text layer. Text extraction uses whatever DOC_TEXT_EXTRACTOR is
+configured ("none" by default), so the numbers cover decode and downscale.
+
+    python -m benchmarks.doc_analysis --count 32 --workers 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from utils.doc_analysis import DOC_ANALYSIS_WORKERS, DocumentAnalysisPool, analyze_document
+
+PRESCRIPTION_LINES = [
+    "Dr. Amina Bello, General Hospital Kano",
+    "Date: 12/03/2026",
+    "Coartem 20/120 mg - 24 tablets",
+    "Paracetamol 500 mg - 1 tablet three times daily",
+]
+
+
+def draw_scan(size) -> Image.Image:
+    scan = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(scan)
+    for i, line in enumerate(PRESCRIPTION_LINES * 10):
+        draw.text((150, 200 + i * 70), line, fill=0)
+    return scan
+
+
+def phone_photo(path: str):
+    # Upscaled noise compresses like a real photo rather than a flat colour
+    noise = [Image.effect_noise((1000, 750), 60) for _ in range(3)]
+    photo = Image.merge("RGB", noise).resize((4000, 3000))
+    photo.paste(draw_scan((2000, 2800)).convert("RGB"), (1000, 100))
+    photo.save(path, "JPEG", quality=90)
+
+
+def png_scan(path: str):
+    draw_scan((2480, 3508)).save(path, "PNG")
+
+
+def scanned_pdf(path: str):
+    draw_scan((2480, 3508)).save(path, "PDF", resolution=300)
+
+
+def text_pdf(path: str):
+    content = "BT /F1 12 Tf 72 760 Td 16 TL " + " ".join(
+        f"({line}) '" for line in PRESCRIPTION_LINES
+    ) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+DOCUMENT_TYPES = {
+    "jpeg photo": ("jpg", phone_photo),
+    "png scan": ("png", png_scan),
+    "scanned pdf": ("pdf", scanned_pdf),
+    "text pdf": ("pdf", text_pdf),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=32, help="documents per type")
+    parser.add_argument("--workers", type=int, default=DOC_ANALYSIS_WORKERS)
+    args = parser.parse_args()
+
+    pool = DocumentAnalysisPool(args.workers)
+    # Start the workers before timing anything
+    pool.analyze_batch([])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, (extension, generate) in DOCUMENT_TYPES.items():
+            path = os.path.join(tmp, f"sample.{extension}")
+            generate(path)
+            paths = [path] * args.count
+            size_kb = os.path.getsize(path) / 1024
+
+            started = time.perf_counter()
+            serial = [analyze_document(p) for p in paths]
+            serial_rate = args.count / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            pooled = pool.analyze_batch(paths)
+            pool_rate = args.count / (time.perf_counter() - started)
+
+            assert all("error" not in result for result in serial + pooled), serial[0]
+            print(
+                f"{label:<12} {size_kb:>8.0f} KB  serial {serial_rate:>7.1f} docs/s"
+                f"  pool({args.workers}) {pool_rate:>7.1f} docs/s  x{pool_rate / serial_rate:.1f}"
+            )
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Shared helpers for the HTTP benchmarks.
+
+Run benchmarks from the api directory, e.g. `python -m benchmarks.order_reads`.
+"""
+import asyncio
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BackgroundServer:
+    """Run a uvicorn server for an app on a background thread"""
+
+    def __init__(self, app, port: int = None):
+        self.port = port or free_port()
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def load(base_url: str, request, concurrency: int, duration: float) -> list[float]:
+    """
+    Drive `request(client)` from `concurrency` clients for `duration` seconds.
+    Returns per-request latencies in seconds for successful responses.
+    """
+    latencies = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await request(client)
+                if response.status_code < 400:
+                    latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return latencies
+
+
+def summarize(label: str, latencies: list[float], duration: float) -> str:
+    if not latencies:
+        return f"{label:<28} no successful requests"
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (
+        f"{label:<28} {len(ordered) / duration:>9.1f} req/s"
+        f"  p50 {statistics.median(ordered) * 1000:>8.1f} ms"
+        f"  p99 {p99 * 1000:>8.1f} ms"
+    )
@@ -0,0 +1,74 @@
+"""
+Latency of POST /api/v1/auth/login under concurrent clients, before and after
+moving bcrypt onto the hashing process pool.
+
+"inline" is the previous implementation: a `def` route verifying the password
+with bcrypt on the request thread. "pool" is the real route. Needs DATABASE_URL
+with migrations applied; a throwaway user is seeded. 503s from a saturated
+pool are counted separately rather than as latencies.
+
+    python -m benchmarks.login --concurrency 200 --duration 15
+"""
+import argparse
+import asyncio
+import uuid
+
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from benchmarks.harness import BackgroundServer, load, summarize
+from database import SessionLocal, get_db
+from models.auth_model import User
+from models.order_model import Order  # noqa: F401 - registers the User.orders target
+from routes.auth_route import router as auth_router
+from schemas.auth_schema import LoginRequest
+from utils.hashing import hash_password, hashing_pool, verify_password
+
+PASSWORD = "BenchmarkPassword123"
+
+
+def seed_user() -> str:
+    email = f"bench_{uuid.uuid4().hex[:8]}@example.com"
+    with SessionLocal() as db:
+        db.add(User(fullname="Benchmark User", email=email, password_hash=hash_password(PASSWORD)))
+        db.commit()
+    return email
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(auth_router)
+
+    @app.post("/inline/login")
+    def login_inline(request: LoginRequest, db: Session = Depends(get_db)):
+        user = db.execute(select(User).where(User.email == request.email)).scalar_one_or_none()
+        if not user or not verify_password(request.password, user.password_hash):
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        return {"message": "Login successful"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    body = {"email": seed_user(), "password": PASSWORD}
+    with BackgroundServer(build_app()) as server:
+        for label, path in (("inline bcrypt", "/inline/login"), ("hashing pool", "/api/v1/auth/login")):
+            rejected_before = hashing_pool.rejected
+            latencies = asyncio.run(load(
+                server.base_url,
+                lambda client: client.post(path, json=body),
+                args.concurrency,
+                args.duration
+            ))
+            print(summarize(label, latencies, args.duration), f" 503s {hashing_pool.rejected - rejected_before}")
+    hashing_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Notifications delivered per second by the dispatcher versus sending one at a time.
+
+Notifications are queued in the notifications table on two benchmark channels
+with local stub senders: a push-style provider taking batches of 100 per call,
+and an SMS-style provider taking one message per call. One at a time is how
+notify_pharmacies used to send. Needs DATABASE_URL pointing at a database with
+the alembic migrations applied; the benchmark's rows are removed afterwards.
+
+    python -m benchmarks.notifications --count 5000 --latency 0.05 --failure-rate 0.01
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import delete, func, insert, select
+
+from database import AsyncSessionLocal
+from models.notification_model import DeadLetterNotification, Notification
+from utils.notifications import Message, NotificationDispatcher, StubSender
+
+
+async def queue(order_id: str, channels: list[str], count: int):
+    rows = [
+        {
+            "channel": channels[i % len(channels)],
+            "recipient": f"bench-{i}",
+            "order_id": order_id,
+            "payload": {"type": "order_available", "order_id": order_id, "text": "benchmark"},
+        }
+        for i in range(count)
+    ]
+    async with AsyncSessionLocal() as db:
+        for start in range(0, len(rows), 5000):
+            await db.execute(insert(Notification), rows[start:start + 5000])
+        await db.commit()
+
+
+async def remaining(order_id: str) -> int:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(func.count()).where(Notification.order_id == order_id, Notification.attempts == 0)
+        )
+        return result.scalar_one()
+
+
+async def cleanup(order_id: str):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Notification).where(Notification.order_id == order_id))
+        await db.execute(delete(DeadLetterNotification).where(DeadLetterNotification.order_id == order_id))
+        await db.commit()
+
+
+async def one_at_a_time(senders: dict, count: int) -> float:
+    """Rate of awaiting each send before the next, as notify_pharmacies did"""
+    channels = list(senders)
+    started = time.perf_counter()
+    for i in range(count):
+        message = Message(id=i, channel=channels[i % len(channels)], recipient="bench", payload={}, attempts=1)
+        await senders[message.channel].send_batch([message])
+    return count / (time.perf_counter() - started)
+
+
+async def run(args):
+    senders = {
+        "bench_push": StubSender(args.latency, args.failure_rate, batch_size=100, max_concurrency=4),
+        "bench_sms": StubSender(args.latency, args.failure_rate, batch_size=1, max_concurrency=args.sms_concurrency),
+    }
+    serial_rate = await one_at_a_time(senders, max(1, min(args.count, int(2 / args.latency) if args.latency else 1000)))
+    for sender in senders.values():
+        sender.sent.clear()
+
+    order_id = f"BENCH_{uuid.uuid4().hex[:12].upper()}"
+    await queue(order_id, list(senders), args.count)
+    try:
+        dispatcher = NotificationDispatcher(senders, max_in_flight=args.max_in_flight)
+        stopping = asyncio.Event()
+        started = time.perf_counter()
+        running = asyncio.create_task(dispatcher.run(stopping, poll_interval=0.05))
+        # First attempts done; retries are pushed back by the backoff and not waited for
+        while await remaining(order_id):
+            await asyncio.sleep(0.05)
+        stopping.set()
+        await running
+        elapsed = time.perf_counter() - started
+    finally:
+        await cleanup(order_id)
+
+    stats = dispatcher.stats()
+    print(f"one at a time        {serial_rate:>9.1f} notifications/s")
+    print(f"dispatcher           {args.count / elapsed:>9.1f} notifications/s  x{args.count / elapsed / serial_rate:.0f}")
+    print(
+        f"sent {stats.get('sent', 0)}, retried {stats.get('retried', 0)}, dead-lettered {stats.get('dead_lettered', 0)}"
+        f" in {elapsed:.2f}s; provider calls: "
+        + ", ".join(f"{channel} {sender.calls}" for channel, sender in senders.items())
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per provider call")
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--sms-concurrency", type=int, default=50)
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Requests/sec for GET /api/v1/orders/{order_id}, blocking Session vs AsyncSession.
+
+The sync variant is the same lookup done through `database.get_db()` in a
+`def` route (FastAPI threadpool), which is how the route would have run before
+the async session path existed. Needs DATABASE_URL pointing at a database with
+the alembic migrations applied; a throwaway user and order are seeded.
+
+    python -m benchmarks.order_reads --concurrency 200 --duration 10
+"""
+import argparse
+import asyncio
+import uuid
+
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from benchmarks.harness import BackgroundServer, load, summarize
+from database import SessionLocal, get_db
+from models.auth_model import User
+from models.order_model import Order, OrderItem
+from routes.order_route import router as order_router
+from schemas.order_schema import MedicationItemResponse, OrderResponse
+
+
+def seed_order(items: int) -> str:
+    with SessionLocal() as db:
+        user = User(
+            fullname="Benchmark User",
+            email=f"bench_{uuid.uuid4().hex[:8]}@example.com",
+            password_hash="x"
+        )
+        db.add(user)
+        db.flush()
+        order = Order(
+            id=uuid.uuid4().hex,
+            order_id=f"ORD_{uuid.uuid4().hex[:12].upper()}",
+            user_id=user.id,
+            delivery_address="1 Benchmark Road, Kano"
+        )
+        db.add(order)
+        db.flush()
+        db.add_all([
+            OrderItem(
+                id=uuid.uuid4().hex,
+                order_id=order.id,
+                medication_name=f"Medication {i}",
+                quantity=1,
+                unit_price=0.0,
+                total_price=0.0
+            )
+            for i in range(items)
+        ])
+        db.commit()
+        return order.order_id
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(order_router)
+
+    @app.get("/sync/orders/{order_id}", response_model=OrderResponse)
+    def get_order_sync(order_id: str, db: Session = Depends(get_db)):
+        order = db.execute(select(Order).where(Order.order_id == order_id)).scalar_one_or_none()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        items = db.execute(select(OrderItem).where(OrderItem.order_id == order.id)).scalars()
+        return OrderResponse(
+            order_id=order.order_id,
+            user_id=str(order.user_id),
+            status=order.status,
+            prescription_required=order.prescription_required,
+            prescription_status=order.prescription_status,
+            medications=[MedicationItemResponse.model_validate(item) for item in items],
+            delivery_address=order.delivery_address,
+            created_at=order.created_at,
+            message="Order details retrieved"
+        )
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    order_id = seed_order(args.items)
+    with BackgroundServer(build_app()) as server:
+        for label, path in (
+            ("sync Session", f"/sync/orders/{order_id}"),
+            ("AsyncSession", f"/api/v1/orders/{order_id}"),
+        ):
+            latencies = asyncio.run(load(
+                server.base_url,
+                lambda client: client.get(path),
+                args.concurrency,
+                args.duration
+            ))
+            print(summarize(label, latencies, args.duration))
+
+
+if __name__ == "__main__":
+    main()
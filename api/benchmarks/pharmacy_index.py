@@ -0,0 +1,162 @@
+"""
+Nearest-pharmacy lookups on the in-memory grid index versus a linear scan,
+plain and for orders that must be matched on stock.
+
+Synthetic pharmacies are clustered around the geocoder's cities, with a share
+spread uniformly over Nigeria, and each stocks a random share of a medication
+catalogue weighted towards common drugs. Queries are delivery points drawn the
+same way, with orders of --items medications for the stock-aware lookups.
+Every indexed answer is checked against the scan.
+
+    python -m benchmarks.pharmacy_index --pharmacies 50000 --queries 2000 --items 10
+"""
+import argparse
+import heapq
+import random
+import statistics
+import time
+
+from utils.geocoding import GAZETTEER
+from utils.spatial_index import GeoGridIndex, haversine_km
+from utils.inventory_index import InventoryIndex
+from utils.pharmacy_index import PHARMACY_INDEX_CELL_DEGREES, PHARMACY_MATCH_LIMIT, PHARMACY_MATCH_RADIUS_KM
+
+# Nigeria's bounding box
+LAT_RANGE = (4.2, 13.9)
+LON_RANGE = (2.7, 14.7)
+CITIES = list(GAZETTEER.values())
+CATALOGUE = [f"medication {i}" for i in range(400)]
+# Common drugs are stocked nearly everywhere, rarer ones less often
+STOCK_PROBABILITY = [0.997 ** (i + 1) for i in range(len(CATALOGUE))]
+
+
+def random_point(rng: random.Random) -> tuple[float, float]:
+    if rng.random() < 0.2:
+        return rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)
+    lat, lon = rng.choice(CITIES)
+    return lat + rng.gauss(0, 0.08), lon + rng.gauss(0, 0.08)
+
+
+def linear_nearest(points, lat, lon, k, radius_km):
+    found = (
+        (haversine_km(lat, lon, plat, plon), key)
+        for key, (plat, plon) in points.items()
+    )
+    return heapq.nsmallest(k, (item for item in found if item[0] <= radius_km))
+
+
+def random_stock(rng: random.Random) -> set[str]:
+    return {name for name, p in zip(CATALOGUE, STOCK_PROBABILITY) if rng.random() < p}
+
+
+def random_order(rng: random.Random, items: int) -> list[str]:
+    # Orders lean on common drugs too, with the odd rarer one
+    return rng.sample(CATALOGUE[:60], items - 1) + [rng.choice(CATALOGUE[:150])]
+
+
+def linear_match(points, stock, lat, lon, medications, k, radius_km):
+    """Nearest k, stockists of every item first, checking each pharmacy's stock in turn"""
+    found = linear_nearest(points, lat, lon, len(points), radius_km)
+    full = [item for item in found if all(m in stock[item[1]] for m in medications)]
+    partial = [item for item in found if not all(m in stock[item[1]] for m in medications)]
+    return (full + partial)[:k]
+
+
+def timed(fn, queries) -> tuple[list[float], list]:
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(fn(query))
+        latencies.append(time.perf_counter() - started)
+    return latencies, results
+
+
+def summarize(label: str, latencies: list[float]) -> str:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (
+        f"{label:<14} mean {statistics.fmean(ordered) * 1e6:>9.1f} us"
+        f"  p50 {statistics.median(ordered) * 1e6:>9.1f} us"
+        f"  p99 {p99 * 1e6:>9.1f} us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pharmacies", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=10, help="medications per order")
+    parser.add_argument("--k", type=int, default=PHARMACY_MATCH_LIMIT)
+    parser.add_argument("--radius-km", type=float, default=PHARMACY_MATCH_RADIUS_KM)
+    parser.add_argument("--cell-degrees", type=float, default=PHARMACY_INDEX_CELL_DEGREES)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    points = {f"ph{i}": random_point(rng) for i in range(args.pharmacies)}
+    stock = {key: random_stock(rng) for key in points}
+    queries = [random_point(rng) for _ in range(args.queries)]
+    orders = [random_order(rng, args.items) for _ in range(args.queries)]
+
+    started = time.perf_counter()
+    index = GeoGridIndex(args.cell_degrees)
+    inventory = InventoryIndex()
+    for key, (lat, lon) in points.items():
+        index.upsert(key, lat, lon, inventory.slot(key))
+    build = time.perf_counter() - started
+    print(f"built {len(index)} points in {index.stats()['cells']} cells in {build * 1000:.0f} ms")
+
+    started = time.perf_counter()
+    inventory.load((key, medication) for key, medications in stock.items() for medication in medications)
+    build = time.perf_counter() - started
+    stats = inventory.stats()
+    print(
+        f"indexed {stats['stock_entries']} stock entries for {stats['medications']} medications"
+        f" in {stats['bitset_bytes'] / 1024:.0f} KB of bitsets in {build * 1000:.0f} ms"
+    )
+
+    grid_latencies, grid_results = timed(
+        lambda point: index.nearest(*point, args.k, args.radius_km), queries
+    )
+    scan_latencies, scan_results = timed(
+        lambda point: linear_nearest(points, *point, args.k, args.radius_km), queries
+    )
+
+    for grid, scan in zip(grid_results, scan_results):
+        assert [round(distance, 9) for distance, _, _ in grid] == [round(distance, 9) for distance, _ in scan]
+
+    print(summarize("grid nearest", grid_latencies))
+    print(summarize("linear scan", scan_latencies))
+    print(f"speedup x{statistics.fmean(scan_latencies) / statistics.fmean(grid_latencies):.0f}")
+
+    def indexed_match(query):
+        (lat, lon), medications = query
+        mask = inventory.stocking_all(medications)
+        full = index.nearest(lat, lon, args.k, args.radius_km, where=lambda _, slot: mask >> slot & 1)
+        if len(full) < args.k:
+            full += index.nearest(
+                lat, lon, args.k - len(full), args.radius_km, where=lambda _, slot: not mask >> slot & 1
+            )
+        return full
+
+    matched = list(zip(queries, orders))
+    mask_latencies, _ = timed(inventory.stocking_all, orders)
+    match_latencies, match_results = timed(indexed_match, matched)
+    # The scan is slow; a tenth of the queries is enough to compare
+    scan_latencies, scan_results = timed(
+        lambda query: linear_match(points, stock, *query[0], query[1], args.k, args.radius_km),
+        matched[:max(1, len(matched) // 10)]
+    )
+
+    for indexed, scan in zip(match_results, scan_results):
+        assert [key for _, key, _ in indexed] == [key for _, key in scan]
+
+    print(f"\n{args.items}-item orders, stockists of every item first")
+    print(summarize("bitset AND", mask_latencies))
+    print(summarize("grid + bitset", match_latencies))
+    print(summarize("linear scan", scan_latencies))
+    print(f"speedup x{statistics.fmean(scan_latencies) / statistics.fmean(match_latencies):.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,120 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 import os
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
 load_dotenv()
+from utils.db_metrics import sync_pool_metrics, async_pool_metrics, timed_pool_class
 
-engine = create_engine(os.getenv("DATABASE_URL"))
-SessionLocal = sessionmaker(
-    autocommit=False, 
-    autoflush=False, 
-    bind=engine
+# Async drivers used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url() -> str:
+    """Build the async driver URL from DATABASE_URL unless ASYNC_DATABASE_URL is set"""
+    async_url = os.getenv("ASYNC_DATABASE_URL")
+    if async_url:
+        return async_url
+
+    url = make_url(os.getenv("DATABASE_URL"))
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def pool_options() -> dict:
+    """Connection pool settings shared by the sync and async engines"""
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "True").lower() in ("1", "true", "yes"),
+    }
+
+
+_engines = {}
+
+
+def get_engine():
+    """The sync engine, created on first use so importing this module needs no DATABASE_URL"""
+    if "sync" not in _engines:
+        engine = create_engine(
+            os.getenv("DATABASE_URL"),
+            poolclass=timed_pool_class(QueuePool, sync_pool_metrics),
+            **pool_options()
+        )
+        sync_pool_metrics.attach(engine)
+        _engines["sync"] = engine
+    return _engines["sync"]
+
+
+def get_async_engine():
+    """The async engine, created on first use"""
+    if "async" not in _engines:
+        engine = create_async_engine(
+            get_async_database_url(),
+            poolclass=timed_pool_class(AsyncAdaptedQueuePool, async_pool_metrics),
+            **pool_options()
+        )
+        async_pool_metrics.attach(engine.sync_engine)
+        _engines["async"] = engine
+    return _engines["async"]
+
+
+def __getattr__(name: str):
+    # `engine` and `async_engine` are built when first asked for
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LazySessionmaker(sessionmaker):
+    """sessionmaker that binds to its engine when the first session is made"""
+
+    def __init__(self, get_bind, **kw):
+        super().__init__(**kw)
+        self.get_bind = get_bind
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=self.get_bind())
+        return super().__call__(**local_kw)
+
+
+class LazyAsyncSessionmaker(async_sessionmaker):
+    """async_sessionmaker that binds to its engine when the first session is made"""
+
+    def __init__(self, get_bind, **kw):
+        super().__init__(**kw)
+        self.get_bind = get_bind
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=self.get_bind())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = LazySessionmaker(
+    get_engine,
+    autocommit=False,
+    autoflush=False
+)
+
+AsyncSessionLocal = LazyAsyncSessionmaker(
+    get_async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
 )
 
 Base = declarative_base()
@@ -19,4 +124,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,9 +1,100 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.order_route import router as order_router
 from routes.auth_route import router as auth_router
+from routes.profile_route import router as profile_router
+from routes.internal_route import router as internal_router
+from routes.pharmacy_route import router as pharmacy_router
+from utils.db_metrics import log_pool_counts
+from utils.hashing import hashing_pool, calibrate_bcrypt_rounds
+from utils.revocation import revocation_store
+from utils.blob_store import purge_unreferenced_blobs, sweep_orphaned_files
+from utils.upload_sessions import expire_upload_sessions
+from utils.idempotency import purge_expired_idempotency_keys
+from utils.pharmacy_index import load_pharmacy_index, refresh_pharmacy_index_periodically, PHARMACY_INDEX_REFRESH_SECONDS
+from database import AsyncSessionLocal
 
-app = FastAPI()
+DB_POOL_LOG_INTERVAL = float(os.getenv("DB_POOL_LOG_INTERVAL_SECONDS", 60))
+TOKEN_REVOCATION_COMPACT_INTERVAL = float(os.getenv("TOKEN_REVOCATION_COMPACT_INTERVAL_SECONDS", 600))
+BLOB_GC_INTERVAL = float(os.getenv("BLOB_GC_INTERVAL_SECONDS", 3600))
+UPLOAD_SESSION_CLEANUP_INTERVAL = float(os.getenv("UPLOAD_SESSION_CLEANUP_INTERVAL_SECONDS", 900))
+IDEMPOTENCY_CLEANUP_INTERVAL = float(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS", 3600))
+
+logger = logging.getLogger(__name__)
+
+
+async def log_pool_counts_periodically():
+    while True:
+        await asyncio.sleep(DB_POOL_LOG_INTERVAL)
+        log_pool_counts()
+
+
+async def compact_revocations_periodically():
+    while True:
+        await asyncio.sleep(TOKEN_REVOCATION_COMPACT_INTERVAL)
+        await asyncio.to_thread(revocation_store.compact)
+
+
+async def purge_blobs_periodically():
+    while True:
+        await asyncio.sleep(BLOB_GC_INTERVAL)
+        try:
+            async with AsyncSessionLocal() as db:
+                await purge_unreferenced_blobs(db)
+                await sweep_orphaned_files(db)
+        except Exception:
+            logger.exception("Prescription blob purge failed")
+
+
+async def expire_upload_sessions_periodically():
+    while True:
+        await asyncio.sleep(UPLOAD_SESSION_CLEANUP_INTERVAL)
+        try:
+            async with AsyncSessionLocal() as db:
+                await expire_upload_sessions(db)
+        except Exception:
+            logger.exception("Upload session cleanup failed")
+
+
+async def purge_idempotency_keys_periodically():
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_CLEANUP_INTERVAL)
+        try:
+            async with AsyncSessionLocal() as db:
+                await purge_expired_idempotency_keys(db)
+        except Exception:
+            logger.exception("Idempotency key cleanup failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(calibrate_bcrypt_rounds)
+    async with AsyncSessionLocal() as db:
+        await load_pharmacy_index(db)
+    tasks = []
+    if DB_POOL_LOG_INTERVAL > 0:
+        tasks.append(asyncio.create_task(log_pool_counts_periodically()))
+    if TOKEN_REVOCATION_COMPACT_INTERVAL > 0:
+        tasks.append(asyncio.create_task(compact_revocations_periodically()))
+    if BLOB_GC_INTERVAL > 0:
+        tasks.append(asyncio.create_task(purge_blobs_periodically()))
+    if UPLOAD_SESSION_CLEANUP_INTERVAL > 0:
+        tasks.append(asyncio.create_task(expire_upload_sessions_periodically()))
+    if IDEMPOTENCY_CLEANUP_INTERVAL > 0:
+        tasks.append(asyncio.create_task(purge_idempotency_keys_periodically()))
+    if PHARMACY_INDEX_REFRESH_SECONDS > 0:
+        tasks.append(asyncio.create_task(refresh_pharmacy_index_periodically()))
+    yield
+    for task in tasks:
+        task.cancel()
+    hashing_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -16,4 +107,7 @@ app.add_middleware(
 
 # Include routers
 app.include_router(auth_router)
-app.include_router(order_router)
\ No newline at end of file
+app.include_router(profile_router)
+app.include_router(order_router)
+app.include_router(pharmacy_router)
+app.include_router(internal_router)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, DateTime, Integer, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+import enum
+from database import Base
+
+
+class IdempotencyKeyStatus(str, enum.Enum):
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+
+# Idempotency-Key headers seen on retry-prone POSTs, with the response to replay for repeats
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # The user and endpoint the key was sent with; the same key elsewhere is a different request
+    scope = Column(String(255), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # sha256 of the request; a repeat with a different request is refused
+    fingerprint = Column(String(64), nullable=False)
+    status = Column(SQLEnum(IdempotencyKeyStatus), default=IdempotencyKeyStatus.IN_PROGRESS, nullable=False)
+    response_status = Column(Integer)
+    response_body = Column(JSONB)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    completed_at = Column(DateTime(timezone=True))
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Text, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from database import Base
+
+
+# Notifications waiting to be delivered; rows are deleted once sent
+class Notification(Base):
+    __tablename__ = "notifications"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # Name of the sender that delivers it (see utils.notifications)
+    channel = Column(String(20), nullable=False)
+    recipient = Column(String(255), nullable=False)
+    pharmacy_id = Column(String(50))
+    order_id = Column(String(50))
+    payload = Column(JSONB, nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    # Not claimed before this time; pushed back when a failed attempt is retried
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Set while a dispatcher is sending it
+    locked_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Dispatchers claim the oldest available notifications in available_at order
+Index("ix_notifications_available_at", Notification.available_at)
+
+
+# Notifications that failed NOTIFICATION_MAX_ATTEMPTS times, kept for inspection and replay
+class DeadLetterNotification(Base):
+    __tablename__ = "notification_dead_letters"
+
+    id = Column(BigInteger, primary_key=True)
+    channel = Column(String(20), nullable=False)
+    recipient = Column(String(255), nullable=False)
+    pharmacy_id = Column(String(50))
+    order_id = Column(String(50), index=True)
+    payload = Column(JSONB, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(Text)
+
+    created_at = Column(DateTime(timezone=True))
+    failed_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,10 +1,10 @@
-from sqlalchemy import Column, String, Float, DateTime, Boolean, Text, ForeignKey, Enum as SQLEnum, Integer
+from sqlalchemy import Column, String, Float, DateTime, Boolean, Text, ForeignKey, Enum as SQLEnum, Integer, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
 from database import Base
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 
 # Enums
 class OrderStatus(str, enum.Enum):
@@ -32,15 +32,23 @@ class Order(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     order_id = Column(String(50), unique=True, nullable=False, index=True)
     status = Column(SQLEnum(OrderStatus), default=OrderStatus.PENDING, nullable=False)
+    # Bumped by every status transition; transitions only apply to the version they were read at
+    version = Column(Integer, default=1, server_default="1", nullable=False)
     prescription_required = Column(Boolean, default=True)
     prescription_status = Column(SQLEnum(PrescriptionStatus), default=PrescriptionStatus.PENDING)
     prescription_file_path = Column(String(500))
+    # Normalised image and thumbnails ({size: path}) rendered from the prescription; views serve these
+    prescription_image_path = Column(String(500))
+    prescription_thumbnails = Column(JSONB)
     prescription_verified_at = Column(DateTime(timezone=True))
     verification_notes = Column(Text)
     rejection_reason = Column(Text)
     
     # Delivery information
     delivery_address = Column(String(500), nullable=False)
+    # From the client's GPS fix, or geocoded from delivery_address; used for pharmacy matching
+    delivery_latitude = Column(Float)
+    delivery_longitude = Column(Float)
     # delivery_phone = Column(String(20), nullable=False)
     
     # Pricing
@@ -54,11 +62,15 @@ class Order(Base):
     
     # Relationships
     owner = relationship("User", back_populates="orders")
-    # order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+    # Load explicitly (selectinload) on read paths; lazy loading here would mean a query per order
+    order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", passive_deletes=True, lazy="raise")
     # order_pharmacies = relationship("OrderPharmacy", back_populates="order", cascade="all, delete-orphan")
     # payments = relationship("Payment", back_populates="order", cascade="all, delete-orphan")
     # tracking = relationship("OrderTracking", back_populates="order", cascade="all, delete-orphan")
 
+# Serves a user's order history newest-first with keyset pagination on (created_at, id)
+Index("ix_orders_user_id_created_at", Order.user_id, Order.created_at.desc(), Order.id.desc())
+
 # OrderItem Model
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -75,5 +87,5 @@ class OrderItem(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    # order = relationship("Order", back_populates="order_items")
+    order = relationship("Order", back_populates="order_items")
     # medication = relationship("Medication", back_populates="order_items")
\ No newline at end of file
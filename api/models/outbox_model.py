@@ -0,0 +1,37 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Text, Index, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+import enum
+from database import Base
+
+
+class OutboxEventStatus(str, enum.Enum):
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+
+# Events written in the same transaction as the change they describe, delivered by outbox_relay.py
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    event_type = Column(String(50), nullable=False)
+    # Public id of the order the event is about
+    aggregate_id = Column(String(50), nullable=False, index=True)
+    payload = Column(JSONB, nullable=False)
+    status = Column(SQLEnum(OutboxEventStatus), default=OutboxEventStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    # Not delivered before this time; pushed back when a subscriber fails
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    processed_at = Column(DateTime(timezone=True), index=True)
+
+# The relay only ever scans pending events, in id order
+Index(
+    "ix_outbox_events_pending",
+    OutboxEvent.id,
+    postgresql_where=OutboxEvent.status == OutboxEventStatus.PENDING
+)
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, String, Float, DateTime, Boolean, Integer, ForeignKey
+from sqlalchemy.sql import func
+from database import Base
+
+
+# Pharmacy Model
+class Pharmacy(Base):
+    __tablename__ = "pharmacies"
+
+    id = Column(String(50), primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    address = Column(String(500), nullable=False)
+    city = Column(String(100))
+    phone = Column(String(20))
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    # Inactive pharmacies stay registered but are never matched
+    is_active = Column(Boolean, default=True, server_default="true", nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set on insert too: the spatial index refresh picks up rows changed since its last pass
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
+
+
+# Pharmacy Stock Model
+class PharmacyStock(Base):
+    __tablename__ = "pharmacy_stock"
+
+    pharmacy_id = Column(String(50), ForeignKey("pharmacies.id", ondelete="CASCADE"), primary_key=True)
+    # normalize_medication(medication_name): the key orders are matched on
+    medication_key = Column(String(255), primary_key=True)
+    medication_name = Column(String(255), nullable=False)
+    # Out-of-stock items are kept at 0 rather than deleted, so index refreshes see the change
+    quantity = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
@@ -0,0 +1,70 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, ForeignKey, Text, Index, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+import enum
+from database import Base
+
+
+class VerificationJobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+# Content-addressed prescription documents, shared by every order that uploaded the same bytes
+class PrescriptionBlob(Base):
+    __tablename__ = "prescription_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    storage_key = Column(String(500), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100))
+    # Orders whose prescription_file_path points at this blob
+    ref_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Outcome of verify_prescription_document, reused for repeat uploads of the same document
+    verification_result = Column(JSONB)
+    verified_at = Column(DateTime(timezone=True))
+    # Keys of the normalised image and thumbnails ({} when the document has no picture), see utils.derivatives
+    derivatives = Column(JSONB)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# Resumable prescription upload; the bytes received so far live in storage under partial/<id>
+class PrescriptionUpload(Base):
+    __tablename__ = "prescription_uploads"
+
+    id = Column(String(50), primary_key=True)
+    order_id = Column(String(50), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    # Mirrors the partial file's length after each PATCH; the file itself is authoritative
+    received = Column(BigInteger, default=0, server_default="0", nullable=False)
+    content_type = Column(String(100))
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# Prescription verification waiting for (or handled by) verification_worker.py
+class VerificationJob(Base):
+    __tablename__ = "verification_jobs"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    order_id = Column(String(50), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    blob_sha256 = Column(String(64), ForeignKey("prescription_blobs.sha256", ondelete="CASCADE"), nullable=False)
+    status = Column(SQLEnum(VerificationJobStatus), default=VerificationJobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    # Not claimed before this time; pushed back when a failed attempt is retried
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+# Workers claim the oldest available job in (status, available_at) order
+Index("ix_verification_jobs_status_available_at", VerificationJob.status, VerificationJob.available_at)
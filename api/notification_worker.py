@@ -0,0 +1,54 @@
+"""
+Pharmacy notification worker.
+Sends the notifications queued in the notifications table through the
+configured channel senders; run one or more next to the API with
+`python notification_worker.py`.
+"""
+import asyncio
+import logging
+import os
+import signal
+from utils.notifications import NotificationDispatcher, load_senders
+from dotenv import load_dotenv
+load_dotenv()
+
+# How long an idle dispatcher waits before looking for new notifications again
+NOTIFICATION_POLL_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_POLL_INTERVAL_SECONDS", 1))
+NOTIFICATION_STATS_LOG_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_STATS_LOG_INTERVAL_SECONDS", 60))
+
+logger = logging.getLogger("notification_worker")
+
+
+async def log_stats_periodically(dispatcher: NotificationDispatcher):
+    while True:
+        await asyncio.sleep(NOTIFICATION_STATS_LOG_INTERVAL_SECONDS)
+        logger.info("Notification dispatcher: %s", dispatcher.stats())
+
+
+async def main():
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Finish the sends in hand, claim nothing new
+        loop.add_signal_handler(sig, stopping.set)
+
+    senders = load_senders()
+    dispatcher = NotificationDispatcher(senders)
+    logger.info(
+        "Notification worker started with senders %s",
+        {channel: type(sender).__name__ for channel, sender in senders.items()}
+    )
+    stats_logger = None
+    if NOTIFICATION_STATS_LOG_INTERVAL_SECONDS > 0:
+        stats_logger = asyncio.create_task(log_stats_periodically(dispatcher))
+    try:
+        await dispatcher.run(stopping, NOTIFICATION_POLL_INTERVAL_SECONDS)
+    finally:
+        if stats_logger is not None:
+            stats_logger.cancel()
+    logger.info("Notification worker stopped: %s", dispatcher.stats())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""
+Order event relay.
+Delivers the events in the outbox_events table to the configured broker and
+to the subscribers in utils.order_events; run one or more next to the API with
+`python outbox_relay.py`.
+"""
+import asyncio
+import logging
+import os
+import signal
+import time
+from database import AsyncSessionLocal
+# User and Order refer to each other by name, so both models have to be loaded
+from models.auth_model import User
+from models.order_model import Order
+from utils.outbox import OutboxRelay, create_broker, purge_delivered_events
+# Registers the order event subscribers
+import utils.order_events
+from dotenv import load_dotenv
+load_dotenv()
+
+# How long an idle relay waits before looking for new events again
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", 0.5))
+OUTBOX_PURGE_INTERVAL_SECONDS = float(os.getenv("OUTBOX_PURGE_INTERVAL_SECONDS", 3600))
+OUTBOX_STATS_LOG_INTERVAL_SECONDS = float(os.getenv("OUTBOX_STATS_LOG_INTERVAL_SECONDS", 60))
+
+logger = logging.getLogger("outbox_relay")
+
+
+async def main():
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Finish the batch in hand, take no new one
+        loop.add_signal_handler(sig, stopping.set)
+
+    relay = OutboxRelay(create_broker())
+    logger.info("Outbox relay started with broker %s", type(relay.broker).__name__)
+    last_purge = last_stats = time.monotonic()
+
+    while not stopping.is_set():
+        try:
+            async with AsyncSessionLocal() as db:
+                relayed = await relay.relay_batch(db)
+        except Exception:
+            logger.exception("Outbox batch failed")
+            relayed = 0
+
+        now = time.monotonic()
+        if OUTBOX_PURGE_INTERVAL_SECONDS > 0 and now - last_purge >= OUTBOX_PURGE_INTERVAL_SECONDS:
+            last_purge = now
+            try:
+                async with AsyncSessionLocal() as db:
+                    await purge_delivered_events(db)
+            except Exception:
+                logger.exception("Outbox purge failed")
+        if OUTBOX_STATS_LOG_INTERVAL_SECONDS > 0 and now - last_stats >= OUTBOX_STATS_LOG_INTERVAL_SECONDS:
+            last_stats = now
+            logger.info("Outbox relay: %s", relay.stats())
+
+        # A full batch means more are probably waiting
+        if relayed < relay.batch_size:
+            try:
+                await asyncio.wait_for(stopping.wait(), OUTBOX_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    logger.info("Outbox relay stopped: %s", relay.stats())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    asyncio.run(main())
@@ -1,52 +1,67 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from datetime import timedelta
-import os
-import jwt
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
 from schemas.auth_schema import *
 
 from models.auth_model import User, UserRole
-from database import get_db
-from utils.auth_utils import create_token, get_current_user, hash_password, verify_password
+from database import get_async_db
+from utils.auth_utils import Principal, create_access_token, create_refresh_token, resolve_token, revoke_token, load_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from utils.hashing import hash_password_async, verify_password_async, needs_rehash
 
 router = APIRouter(prefix="/api/v1/auth", tags=["authentication"])
+logger = logging.getLogger(__name__)
+
+
+async def rehash_password(db: AsyncSession, user: User, password: str):
+    """Re-hash a verified password at the current bcrypt cost"""
+    old_hash = user.password_hash
+    try:
+        new_hash = await hash_password_async(password)
+        # Only replace the hash we verified, so a concurrent password change wins
+        await db.execute(
+            update(User)
+            .where(User.id == user.id, User.password_hash == old_hash)
+            .values(password_hash=new_hash)
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        logger.warning("Password rehash failed for user %s", user.id, exc_info=True)
 
 
 @router.post("/register", response_model=AuthResponse, status_code=status.HTTP_201_CREATED)
-def register(request: RegisterRequest, db: Session = Depends(get_db)):
+async def register(request: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
 
     try:
-        existing_email = db.query(User).filter(User.email == request.email).first()
-        if existing_email:
+        password_hash = await hash_password_async(request.password)
+
+        # Single round trip: the unique email index decides, so concurrent signups cannot race
+        result = await db.execute(
+            insert(User)
+            .values(
+                fullname=request.fullname,
+                email=request.email,
+                password_hash=password_hash,
+                role=UserRole.CUSTOMER
+            )
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User)
+        )
+        new_user = result.scalar_one_or_none()
+        if new_user is None:
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
+        await db.commit()
         
-        new_user = User(
-            fullname=request.fullname,
-            email=request.email,
-            password_hash=hash_password(request.password),
-            role=UserRole.CUSTOMER
-        )
-        
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-        
-        access_token_expires = timedelta(minutes=int(
-    os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30)))
-        access_token = create_token(
-            data={"sub": str(new_user.id)},
-            expires_delta=access_token_expires
-        )
-        
-        refresh_token_expires = timedelta(days=int(
-    os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30)))
-        refresh_token = create_token(
-            data={"sub": str(new_user.id), "type": "refresh"},
-            expires_delta=refresh_token_expires
-        )
+        principal = Principal.from_user(new_user)
+        access_token = create_access_token(principal)
+        refresh_token = create_refresh_token(principal)
         
         return AuthResponse(
             message="User registered successfully",
@@ -58,7 +73,7 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {str(e)}"
@@ -66,37 +81,33 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=AuthResponse, status_code=status.HTTP_200_OK)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
 
     try:
         # Find user by email
-        user = db.query(User).filter(User.email == request.email).first()
+        result = await db.execute(select(User).where(User.email == request.email))
+        user = result.scalar_one_or_none()
+        # Release the pooled connection while bcrypt runs
+        await db.commit()
         
-        if not user or not verify_password(request.password, user.password_hash):
+        if not user or not await verify_password_async(request.password, user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
             )
         
+        if needs_rehash(user.password_hash):
+            await rehash_password(db, user, request.password)
+
         # Update last login
         # user.last_login = datetime.utcnow()
         # db.commit()
         # db.refresh(user)
         
         # Create tokens
-        access_token_expires = timedelta(minutes=int(
-    os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30)))
-        access_token = create_token(
-            data={"sub": str(user.id)},
-            expires_delta=access_token_expires
-        )
-        
-        refresh_token_expires = timedelta(days=int(
-    os.getenv("ACCESS_TOKEN_EXPIRE_DAYS", 30)))
-        refresh_token = create_token(
-            data={"sub": str(user.id), "type": "refresh"},
-            expires_delta=refresh_token_expires
-        )
+        principal = Principal.from_user(user)
+        access_token = create_access_token(principal)
+        refresh_token = create_refresh_token(principal)
         
         return AuthResponse(
             message="Login successful",
@@ -115,51 +126,30 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/refresh", response_model=TokenResponse, status_code=status.HTTP_200_OK)
-def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+async def refresh_token(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Refresh access token
     """
     try:
-        payload = jwt.decode(request.refresh_token, os.getenv("JWT_SECRET_KEY"), algorithms=[os.getenv("JWT_ALGORITHM")])
-        user_id: str = payload.get("sub")
-        token_type: str = payload.get("type")
+        entry = await resolve_token(request.refresh_token, token_type="refresh")
+        # Refreshes are rare, so the user's token_version is checked against the database:
+        # a refresh token from before a password change is refused on every worker
+        user = await load_user(entry.principal, db)
+        principal = Principal.from_user(user)
         
-        if token_type != "refresh":
+        # Rotate: each refresh token can be exchanged once
+        if not await revoke_token(entry):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token type"
+                detail="Token has been revoked"
             )
         
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found"
-            )
-        
-        # Create new access token
-        access_token_expires = timedelta(minutes=os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
-        new_access_token = create_token(
-            data={"sub": str(user.id)},
-            expires_delta=access_token_expires
-        )
-        
         return TokenResponse(
-            access_token=new_access_token,
-            refresh_token=request.refresh_token,
-            expires_in=os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES") * 60
+            access_token=create_access_token(principal),
+            refresh_token=create_refresh_token(principal),
+            expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60
         )
     
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Refresh token has expired"
-        )
-    except jwt.InvalidTokenError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid refresh token"
-        )
     except HTTPException:
         raise
     except Exception as e:
@@ -170,9 +160,10 @@ def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
-def logout(token: str = None, db: Session = Depends(get_db)):
+async def logout(request: Optional[LogoutRequest] = None, token: str = None):
     """
-    Logout user (requires Authorization header with Bearer token)
+    Logout user (requires Authorization header with Bearer token).
+    Send the session's refresh token in the body too, or it can still be used to refresh.
     """
     if not token:
         raise HTTPException(
@@ -180,5 +171,17 @@ def logout(token: str = None, db: Session = Depends(get_db)):
             detail="Authorization token required"
         )
     
-    user = get_current_user(token, db)
-    return {"message": f"User {user.email} logged out successfully"}
+    entry = await resolve_token(token)
+    refresh_entry = None
+    if request is not None and request.refresh_token:
+        refresh_entry = await resolve_token(request.refresh_token, token_type="refresh")
+        if refresh_entry.principal.user_id != entry.principal.user_id:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token belongs to another user"
+            )
+    
+    await revoke_token(entry)
+    if refresh_entry is not None:
+        await revoke_token(refresh_entry)
+    return {"message": f"User {entry.principal.user_id} logged out successfully"}
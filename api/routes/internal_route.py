@@ -0,0 +1,115 @@
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models.auth_model import UserRole
+from utils.auth_utils import get_current_principal
+from utils.db_metrics import pool_snapshot
+from utils.hashing import hashing_pool
+from utils.auth_utils import token_cache
+from utils.revocation import revocation_store
+from utils.verification_queue import verification_queue_stats
+from utils.pharmacy_index import index_stats
+from utils.notifications import notification_queue_stats
+from utils.outbox import outbox_stats
+from utils.idempotency import idempotency_cache
+
+# Shared secret for metrics scrapers, sent as X-Internal-Token; unset means admin tokens only
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+
+async def require_internal_access(
+    x_internal_token: Optional[str] = Header(None),
+    token: Optional[str] = None
+):
+    """Internal endpoints are for operators: an X-Internal-Token or an admin token is required"""
+    if INTERNAL_API_TOKEN and x_internal_token and hmac.compare_digest(x_internal_token, INTERNAL_API_TOKEN):
+        return
+    if token and (await get_current_principal(token)).role == UserRole.ADMIN:
+        return
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Not allowed to read internal metrics"
+    )
+
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(require_internal_access)]
+)
+
+
+@router.get("/db/pool")
+def get_db_pool_stats():
+    """
+    Connection pool usage and checkout wait-time histograms for both engines
+    """
+    return pool_snapshot()
+
+
+@router.get("/auth/hashing")
+def get_hashing_pool_stats():
+    """
+    Password hashing pool occupancy and rejected requests
+    """
+    return hashing_pool.stats()
+
+
+@router.get("/auth/token-cache")
+def get_token_cache_stats():
+    """
+    Decoded token cache size, hit/miss and eviction counters
+    """
+    return token_cache.stats()
+
+
+@router.get("/auth/revocations")
+def get_revocation_stats():
+    """
+    Revoked token store size and Bloom filter effectiveness
+    """
+    return revocation_store.stats()
+
+
+@router.get("/verification/queue")
+async def get_verification_queue_stats(db: AsyncSession = Depends(get_async_db)):
+    """
+    Verification job queue depth, oldest waiting job and recent latency percentiles
+    """
+    return await verification_queue_stats(db)
+
+
+@router.get("/pharmacies/index")
+def get_pharmacy_index_stats():
+    """
+    Pharmacy spatial and inventory index sizes, match cache hit ratio and invalidations, last refresh
+    """
+    return index_stats()
+
+
+@router.get("/notifications/queue")
+async def get_notification_queue_stats(db: AsyncSession = Depends(get_async_db)):
+    """
+    Notifications waiting per channel, age of the oldest due one and dead letters
+    """
+    return await notification_queue_stats(db)
+
+
+@router.get("/outbox")
+async def get_outbox_stats(db: AsyncSession = Depends(get_async_db)):
+    """
+    Order events waiting in the outbox, relay lag percentiles and throughput
+    """
+    return await outbox_stats(db)
+
+
+@router.get("/idempotency/cache")
+def get_idempotency_cache_stats():
+    """
+    Cached idempotent responses: size, hit/miss and eviction counters
+    """
+    return idempotency_cache.stats()
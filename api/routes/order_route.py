@@ -1,10 +1,30 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Query, Header, Request, Response
+from fastapi.responses import JSONResponse, FileResponse
+from starlette.requests import ClientDisconnect
+from sqlalchemy import select, insert, update, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
+import json
 import uuid
 from schemas.order_schema import *
 from utils.doc_verify import *
-from database import get_db
+from database import get_async_db
+from utils.pagination import encode_cursor, decode_cursor
+from utils.order_reads import select_order_rows, select_order_version, build_order_responses, order_etag
+from utils.http_cache import make_etag, etag_matches, not_modified, set_cache_headers
+from utils.storage import get_storage, file_too_large, MAX_FILE_SIZE
+from utils.blob_store import store_blob, register_blob, release_blob, STAGING_PREFIX
+from utils.verification_queue import enqueue_verification, latest_verification_job
+from utils.derivatives import PRESCRIPTION_THUMBNAIL_SIZES
+from utils.order_events import record_order_event, ORDER_CREATED, PRESCRIPTION_UPLOADED, ORDER_VERIFIED, ORDER_REJECTED
+from utils.order_state import transition_order, check_transition, order_conflict
+from utils.idempotency import run_idempotent, idempotency_scope, request_fingerprint, upload_fingerprint
+from utils.geocoding import geocode_address
+from utils.upload_sessions import create_upload_session, get_upload_session, partial_key, session_expiry
+from models.prescription_model import PrescriptionUpload
 
 
 router = APIRouter(prefix="/api/v1/orders", tags=["orders"])
@@ -12,163 +32,578 @@ router = APIRouter(prefix="/api/v1/orders", tags=["orders"])
 @router.post("/create", response_model=OrderResponse, status_code=201)
 async def create_order(
     order_data: CreateOrderRequest,
-    # db: Annotated[Session, Depends(get_db)]
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Create a new medication order
+    Create a new medication order.
+    With an Idempotency-Key header, a retry gets the first response back instead of a second order.
     """
     try:
-        # Generate order ID
-        order_id = f"ORD_{uuid.uuid4().hex[:12].upper()}"
-        
-        # Check if prescription is required (you can add logic to determine this)
-        requires_prescription = True  # Set based on medication type
-        
-        # Create order in database
-        new_order = {
-            "order_id": order_id,
-            "user_id": order_data.user_id,
-            "status": OrderStatus.PENDING,
-            "prescription_required": requires_prescription,
-            "prescription_status": PrescriptionStatus.PENDING if requires_prescription else None,
-            "medications": [med.model_dump() for med in order_data.medications],
-            "delivery_address": order_data.delivery_address,
-            "created_at": datetime.now()
-        }
-        
-        # Save to database (implement your DB logic)
-        # db.add(new_order)
-        # db.commit()
-        
-        return OrderResponse(
-            **new_order,
-            message="Order created successfully"
+        user_id = uuid.UUID(order_data.user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user id")
+
+    try:
+        return await run_idempotent(
+            db,
+            idempotency_scope(user_id, f"{router.prefix}/create"),
+            idempotency_key,
+            request_fingerprint(order_data),
+            lambda: place_order(db, order_data, user_id),
+            status_code=201
         )
         
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="User not found")
+    except HTTPException:
+        raise
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to create order: {str(e)}"
         )
 
+async def place_order(db: AsyncSession, order_data: CreateOrderRequest, user_id: uuid.UUID) -> OrderResponse:
+    # Generate order ID
+    order_id = f"ORD_{uuid.uuid4().hex[:12].upper()}"
+    # Primary keys are generated here so items can be inserted without reading the order back
+    order_pk = uuid.uuid4().hex
+    
+    # Check if prescription is required (you can add logic to determine this)
+    requires_prescription = True  # Set based on medication type
+    
+    new_order = {
+        "order_id": order_id,
+        "user_id": order_data.user_id,
+        "status": OrderStatus.PENDING,
+        "prescription_required": requires_prescription,
+        "prescription_status": PrescriptionStatus.PENDING if requires_prescription else None,
+        "delivery_address": order_data.delivery_address,
+    }
+    
+    if order_data.delivery_latitude is not None and order_data.delivery_longitude is not None:
+        coordinates = (order_data.delivery_latitude, order_data.delivery_longitude)
+    else:
+        coordinates = await geocode_address(order_data.delivery_address) or (None, None)
+    
+    # Order row and all item rows in one transaction: one INSERT for the order,
+    # one multi-row INSERT for the items, no per-item flush or refresh
+    result = await db.execute(
+        insert(Order)
+        .values({
+            **new_order,
+            "id": order_pk,
+            "user_id": user_id,
+            "delivery_latitude": coordinates[0],
+            "delivery_longitude": coordinates[1],
+        })
+        .returning(Order.created_at)
+    )
+    created_at = result.scalar_one()
+    
+    if order_data.medications:
+        await db.execute(
+            insert(OrderItem),
+            [
+                {
+                    "id": uuid.uuid4().hex,
+                    "order_id": order_pk,
+                    "medication_name": med.medication_name,
+                    "dosage": med.dosage,
+                    "quantity": med.quantity,
+                    # Priced once a pharmacy accepts the order
+                    "unit_price": 0.0,
+                    "total_price": 0.0,
+                }
+                for med in order_data.medications
+            ]
+        )
+    await record_order_event(db, ORDER_CREATED, order_id, user_id, items=len(order_data.medications))
+    await db.flush()
+    
+    return OrderResponse(
+        **new_order,
+        medications=[med.model_dump() for med in order_data.medications],
+        created_at=created_at,
+        message="Order created successfully"
+    )
+
+async def attach_prescription(db: AsyncSession, order: Order, blob):
+    """
+    Point an order at a stored prescription and get it verified.
+    A document verified before is settled straight away; anything else is queued
+    for verification_worker.py and answered with 202 while the order is VERIFYING.
+    The order moves in one conditional UPDATE at the version it was loaded at,
+    so a concurrent change to it is answered with 409 rather than overwritten.
+    Changes are flushed, not committed; the caller commits.
+    """
+    verification_result = blob.verification_result
+    if verification_result is None:
+        target, through = OrderStatus.VERIFYING, ()
+        values = {"prescription_status": PrescriptionStatus.PENDING, "rejection_reason": None}
+    elif verification_result["valid"]:
+        target, through = OrderStatus.VERIFIED, (OrderStatus.VERIFYING,)
+        values = {"prescription_status": PrescriptionStatus.VALID, "rejection_reason": None}
+    else:
+        target, through = OrderStatus.REJECTED, (OrderStatus.VERIFYING,)
+        values = {"prescription_status": PrescriptionStatus.INVALID, "rejection_reason": verification_result["reason"]}
+    
+    changed = await transition_order(
+        db,
+        order.id,
+        order.status,
+        target,
+        version=order.version,
+        through=through,
+        prescription_file_path=blob.storage_key,
+        prescription_image_path=(blob.derivatives or {}).get("image"),
+        prescription_thumbnails=(blob.derivatives or {}).get("thumbnails"),
+        **values
+    )
+    if changed is None:
+        raise order_conflict()
+    await release_blob(db, order.prescription_file_path)
+    await record_order_event(db, PRESCRIPTION_UPLOADED, order.order_id, order.user_id, sha256=blob.sha256)
+    
+    if verification_result is None or blob.derivatives is None:
+        # The worker verifies the document and renders its image and thumbnails
+        await enqueue_verification(db, order, blob)
+    if verification_result is None:
+        await db.flush()
+        return JSONResponse(
+            status_code=202,
+            content={
+                "order_id": order.order_id,
+                "status": "verifying",
+                "prescription_status": "pending",
+                "message": "Prescription received and queued for verification.",
+                "status_url": f"{router.prefix}/{order.order_id}/prescription/status"
+            }
+        )
+    
+    if verification_result["valid"]:
+        # Find matching pharmacies
+        medications = [
+            MedicationItem(medication_name=item.medication_name, quantity=item.quantity, dosage=item.dosage)
+            for item in order.order_items
+        ]
+        pharmacies = await find_matching_pharmacies(medications, order.delivery_latitude, order.delivery_longitude)
+        
+        # Queue their notifications with the status change; the notification worker sends them
+        await notify_pharmacies(db, order.order_id, pharmacies)
+        await record_order_event(db, ORDER_VERIFIED, order.order_id, order.user_id, matched_pharmacies=len(pharmacies))
+        await db.flush()
+        
+        return {
+            "order_id": order.order_id,
+            "status": "verified",
+            "prescription_status": "valid",
+            "matched_pharmacies": len(pharmacies),
+            "message": "Prescription verified successfully. Pharmacies have been notified.",
+            "next_step": "payment"
+        }
+    else:
+        await record_order_event(db, ORDER_REJECTED, order.order_id, order.user_id, reason=verification_result["reason"])
+        await db.flush()
+        
+        return {
+            "order_id": order.order_id,
+            "status": "rejected",
+            "prescription_status": "invalid",
+            "reason": verification_result["reason"],
+            "message": "Prescription verification failed. Please upload a valid prescription."
+        }
+
+
+async def load_order_for_prescription(db: AsyncSession, order_id: str) -> Order:
+    result = await db.execute(
+        select(Order)
+        .where(Order.order_id == order_id)
+        .options(selectinload(Order.order_items))
+    )
+    order = result.scalar_one_or_none()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    # Refuse before the document is stored; attach_prescription re-checks atomically
+    check_transition(order.status, OrderStatus.VERIFYING)
+    return order
+
+
 @router.post("/{order_id}/upload_prescription")
 async def upload_prescription(
     order_id: str,
-    background_tasks: BackgroundTasks,
     prescription: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Upload prescription document for an order
+    Upload prescription document for an order.
+    With an Idempotency-Key header, a retry gets the first response back instead of uploading again.
     """
     try:
-        # Fetch order from database
-        # order = db.query(Order).filter(Order.order_id == order_id).first()
-        # if not order:
-        #     raise HTTPException(status_code=404, detail="Order not found")
-        
-        # Mock order for demonstration
-        order = {"order_id": order_id, "status": OrderStatus.PENDING}
-        
-        # Save prescription file
-        file_path = f"prescriptions/{order_id}_{prescription.filename}"
-        # Implement file storage (local, S3, etc.)
-        # with open(file_path, "wb") as f:
-        #     content = await prescription.read()
-        #     f.write(content)
-        
-        # Update order status
-        # order.status = OrderStatus.VERIFYING
-        # order.prescription_file_path = file_path
-        # db.commit()
-        
-        # Verify prescription in background
-        verification_result = await verify_prescription_document(prescription)
-        
-        if verification_result["valid"]:
-            # Update order status
-            # order.prescription_status = PrescriptionStatus.VALID
-            # order.status = OrderStatus.VERIFIED
-            # db.commit()
-            
-            # Find matching pharmacies
-            pharmacies = await find_matching_pharmacies([], order.get("delivery_city", "Kano"))
-            
-            # Notify pharmacies in background
-            background_tasks.add_task(notify_pharmacies, order_id, pharmacies)
-            
-            return {
-                "order_id": order_id,
-                "status": "verified",
-                "prescription_status": "valid",
-                "matched_pharmacies": len(pharmacies),
-                "message": "Prescription verified successfully. Pharmacies have been notified.",
-                "next_step": "payment"
-            }
-        else:
-            # Update order with rejection
-            # order.prescription_status = PrescriptionStatus.INVALID
-            # order.status = OrderStatus.REJECTED
-            # order.rejection_reason = verification_result["reason"]
-            # db.commit()
-            
-            return {
-                "order_id": order_id,
-                "status": "rejected",
-                "prescription_status": "invalid",
-                "reason": verification_result["reason"],
-                "message": "Prescription verification failed. Please upload a valid prescription."
-            }
+        scope = fingerprint = None
+        if idempotency_key is not None:
+            owner = (await db.execute(select(Order.user_id).where(Order.order_id == order_id))).scalar_one_or_none()
+            if owner is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+            scope = idempotency_scope(owner, f"{router.prefix}/{order_id}/upload_prescription")
+            fingerprint = await upload_fingerprint(prescription)
+        return await run_idempotent(
+            db,
+            scope,
+            idempotency_key,
+            fingerprint,
+            lambda: store_prescription(db, order_id, prescription)
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to process prescription: {str(e)}"
         )
 
-@router.get("/{order_id}", response_model=OrderResponse)
-async def get_order(
+async def store_prescription(db: AsyncSession, order_id: str, prescription: UploadFile):
+    # Fetch order from database
+    order = await load_order_for_prescription(db, order_id)
+    # Release the connection while the file is written; attach_prescription re-checks the order
+    await db.commit()
+    
+    # Stream the prescription into the content-addressed store; identical documents share one blob
+    blob = await store_blob(db, prescription)
+    return await attach_prescription(db, order, blob)
+
+@router.post("/{order_id}/prescription_uploads", response_model=PrescriptionUploadSessionResponse, status_code=201)
+async def create_prescription_upload(
     order_id: str,
-    db: Session = Depends(get_db)
+    upload: CreatePrescriptionUploadRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get order details by ID
+    Start a resumable prescription upload.
+    Send the bytes with PATCH requests carrying Upload-Offset, then finalize the upload.
     """
-    # Fetch from database
-    # order = db.query(Order).filter(Order.order_id == order_id).first()
-    # if not order:
-    #     raise HTTPException(status_code=404, detail="Order not found")
+    if upload.size > MAX_FILE_SIZE:
+        raise file_too_large()
     
-    # Mock response
-    return OrderResponse(
-        order_id=order_id,
-        user_id="user_123",
-        status=OrderStatus.PENDING,
-        prescription_required=True,
-        prescription_status=PrescriptionStatus.PENDING,
-        medications=[
-            MedicationItem(medication_name="Sample Med", quantity=1)
-        ],
-        delivery_address="123 Sample St",
-        created_at=datetime.now(),
-        message="Order details retrieved"
+    try:
+        order = (await db.execute(select(Order).where(Order.order_id == order_id))).scalar_one_or_none()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        check_transition(order.status, OrderStatus.VERIFYING)
+        
+        session = await create_upload_session(db, order, upload.size, upload.content_type)
+        await db.commit()
+        
+        response.headers["Location"] = f"{router.prefix}/{order_id}/prescription_uploads/{session.id}"
+        response.headers["Upload-Offset"] = "0"
+        return PrescriptionUploadSessionResponse(
+            upload_id=session.id,
+            order_id=order_id,
+            offset=0,
+            size=session.size,
+            expires_at=session.expires_at
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to start upload: {str(e)}"
+        )
+
+@router.patch("/{order_id}/prescription_uploads/{upload_id}", status_code=204)
+async def upload_prescription_chunk(
+    order_id: str,
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Append the request body to a resumable upload at Upload-Offset.
+    On a 409 the Upload-Offset response header says where to resume.
+    """
+    try:
+        session = await get_upload_session(db, order_id, upload_id)
+        # Release the connection while the body trickles in over a slow link
+        await db.commit()
+        
+        storage = get_storage()
+        try:
+            received = await storage.append_stream(partial_key(upload_id), upload_offset, request.stream(), session.size)
+        except ClientDisconnect:
+            # Whatever arrived is kept; the client asks for the offset when it reconnects
+            received = await storage.size(partial_key(upload_id))
+        
+        await db.execute(
+            update(PrescriptionUpload)
+            .where(PrescriptionUpload.id == upload_id)
+            .values(received=received, expires_at=session_expiry())
+        )
+        await db.commit()
+        
+        return Response(status_code=204, headers={"Upload-Offset": str(received)})
+        
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to store upload chunk: {str(e)}"
+        )
+
+@router.get("/{order_id}/prescription_uploads/{upload_id}", response_model=PrescriptionUploadSessionResponse)
+async def get_prescription_upload(
+    order_id: str,
+    upload_id: str,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Current offset of a resumable upload, also sent as the Upload-Offset header
+    """
+    try:
+        session = await get_upload_session(db, order_id, upload_id)
+        offset = await get_storage().size(partial_key(upload_id))
+        
+        response.headers["Upload-Offset"] = str(offset)
+        response.headers["Upload-Length"] = str(session.size)
+        response.headers["Cache-Control"] = "no-store"
+        return PrescriptionUploadSessionResponse(
+            upload_id=session.id,
+            order_id=order_id,
+            offset=offset,
+            size=session.size,
+            expires_at=session.expires_at
+        )
+        
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to retrieve upload: {str(e)}"
+        )
+
+@router.post("/{order_id}/prescription_uploads/{upload_id}/finalize")
+async def finalize_prescription_upload(
+    order_id: str,
+    upload_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Complete a resumable upload and verify it like a single-shot upload
+    """
+    try:
+        order = await load_order_for_prescription(db, order_id)
+        session = await get_upload_session(db, order_id, upload_id)
+        
+        storage = get_storage()
+        offset = await storage.size(partial_key(upload_id))
+        if offset != session.size:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload is incomplete: {offset} of {session.size} bytes received",
+                headers={"Upload-Offset": str(offset)}
+            )
+        
+        # Sealing consumes the partial file, so claim the order for the document
+        # first; a request that changed it since it was loaded gets 409 with the
+        # upload still intact, and attach_prescription moves on from the claim
+        claimed = await transition_order(db, order.id, order.status, OrderStatus.VERIFYING, version=order.version)
+        if claimed is None:
+            raise order_conflict()
+        set_committed_value(order, "status", OrderStatus.VERIFYING)
+        set_committed_value(order, "version", claimed.version)
+        
+        stored = await storage.seal(partial_key(upload_id), f"{STAGING_PREFIX}/{uuid.uuid4().hex}")
+        blob = await register_blob(db, stored, session.content_type)
+        await db.delete(session)
+        result = await attach_prescription(db, order, blob)
+        await db.commit()
+        return result
+        
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to process prescription: {str(e)}"
+        )
+
+@router.get("/{order_id}/prescription/status", response_model=PrescriptionStatusResponse)
+async def get_prescription_status(
+    order_id: str,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Verification progress of an order's prescription, for polling after a 202 upload
+    """
+    try:
+        order = (await db.execute(select(Order).where(Order.order_id == order_id))).scalar_one_or_none()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        
+        job = await latest_verification_job(db, order.id)
+        image_url = f"{router.prefix}/{order.order_id}/prescription/image"
+        response.headers["Cache-Control"] = "no-store"
+        return PrescriptionStatusResponse(
+            order_id=order.order_id,
+            status=order.status,
+            prescription_status=order.prescription_status,
+            rejection_reason=order.rejection_reason,
+            image_url=image_url if order.prescription_image_path else None,
+            thumbnail_urls={
+                size: f"{image_url}?size={size}" for size in (order.prescription_thumbnails or {})
+            },
+            verification=VerificationJobResponse(
+                status=job.status,
+                attempts=job.attempts,
+                queued_at=job.created_at,
+                started_at=job.started_at,
+                finished_at=job.finished_at,
+                last_error=job.last_error
+            ) if job else None
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Failed to retrieve prescription status: {str(e)}"
+        )
+
+@router.get("/{order_id}/prescription/image")
+async def get_prescription_image(
+    order_id: str,
+    size: Optional[int] = Query(None, description="Thumbnail size; omit for the normalised full image"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Normalised prescription image or one of its thumbnails, for pharmacist and app views.
+    The original upload is never re-decoded per view.
+    """
+    result = await db.execute(
+        select(Order.prescription_image_path, Order.prescription_thumbnails)
+        .where(Order.order_id == order_id)
     )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if size is not None and size not in PRESCRIPTION_THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported thumbnail size. Available sizes: {', '.join(map(str, PRESCRIPTION_THUMBNAIL_SIZES))}"
+        )
+    
+    key = row.prescription_image_path if size is None else (row.prescription_thumbnails or {}).get(str(size))
+    if not key:
+        raise HTTPException(status_code=404, detail="Prescription image is not available yet")
+    
+    # Keys are content-addressed, so the key itself identifies the representation
+    etag = make_etag("prescription_image", key)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response = FileResponse(get_storage().local_path(key), media_type="image/jpeg")
+    set_cache_headers(response, etag)
+    return response
 
-@router.get("/user/{user_id}")
+@router.get("/{order_id}", response_model=OrderResponse)
+async def get_order(
+    order_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get order details by ID.
+    Supports If-None-Match: an unchanged order costs one version-only query and a 304.
+    """
+    if if_none_match:
+        version = (await db.execute(select_order_version(order_id))).first()
+        if not version:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if etag_matches(if_none_match, order_etag(version)):
+            return not_modified(order_etag(version))
+
+    rows = (await db.execute(select_order_rows().where(Order.order_id == order_id))).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    set_cache_headers(response, order_etag(rows[0]))
+    orders = await build_order_responses(db, rows, message="Order details retrieved")
+    return orders[0]
+
+@router.get("/user/{user_id}", response_model=OrderListResponse)
 async def get_user_orders(
     user_id: str,
-    skip: int = 0,
-    limit: int = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get all orders for a specific user
+    Get orders for a specific user, newest first.
+    Pass the returned next_cursor to fetch the following page.
     """
-    # Query database for user orders
-    # orders = db.query(Order).filter(Order.user_id == user_id).offset(skip).limit(limit).all()
-    
-    return {
-        "user_id": user_id,
-        "total_orders": 0,
-        "orders": []
-    }
\ No newline at end of file
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user id")
+
+    # Keyset pagination over ix_orders_user_id_created_at: every page is an index range scan
+    query = (
+        select_order_rows()
+        .where(Order.user_id == user_uuid)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, order_pk = decode_cursor(cursor)
+        query = query.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_pk))
+
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    total_orders = None
+    if include_total:
+        total_orders = await estimate_row_count(db, select(Order.id).where(Order.user_id == user_uuid))
+
+    return OrderListResponse(
+        user_id=user_id,
+        total_orders=total_orders,
+        orders=await build_order_responses(db, rows, message="Order details retrieved"),
+        next_cursor=next_cursor
+    )
+
+
+async def estimate_row_count(db: AsyncSession, query) -> int:
+    """Planner row estimate for a query, avoiding an exact COUNT(*)"""
+    compiled = query.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,178 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from typing import List, Optional
+import uuid
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models.auth_model import UserRole
+from models.pharmacy_model import Pharmacy, PharmacyStock
+from schemas.pharmacy_schema import (
+    CreatePharmacyRequest,
+    UpdatePharmacyRequest,
+    PharmacyResponse,
+    UpdateStockRequest,
+    StockResponse,
+    NearbyPharmaciesResponse
+)
+from utils.auth_utils import get_current_principal
+from utils.geocoding import geocode_address
+from utils.pharmacy_index import find_nearby_pharmacies, set_pharmacy_stock, PHARMACY_MATCH_RADIUS_KM, PHARMACY_MATCH_LIMIT
+
+router = APIRouter(prefix="/api/v1/pharmacies", tags=["pharmacies"])
+
+
+async def require_role(token: str, *roles: UserRole):
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authorization token required"
+        )
+    if (await get_current_principal(token)).role not in roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to manage pharmacies"
+        )
+
+
+@router.post("", response_model=PharmacyResponse, status_code=status.HTTP_201_CREATED)
+async def create_pharmacy(
+    request: CreatePharmacyRequest,
+    token: str = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Register a pharmacy; it is matched to orders as soon as this commits
+    """
+    await require_role(token, UserRole.ADMIN)
+
+    if request.latitude is not None and request.longitude is not None:
+        coordinates = (request.latitude, request.longitude)
+    else:
+        coordinates = await geocode_address(f"{request.address} {request.city or ''}")
+        if coordinates is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Could not locate the address; please send latitude and longitude"
+            )
+
+    try:
+        pharmacy = Pharmacy(
+            id=uuid.uuid4().hex,
+            name=request.name,
+            address=request.address,
+            city=request.city,
+            phone=request.phone,
+            latitude=coordinates[0],
+            longitude=coordinates[1],
+            is_active=True
+        )
+        db.add(pharmacy)
+        await db.commit()
+        await db.refresh(pharmacy)
+        return pharmacy
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to register pharmacy: {str(e)}"
+        )
+
+
+@router.patch("/{pharmacy_id}", response_model=PharmacyResponse)
+async def update_pharmacy(
+    pharmacy_id: str,
+    request: UpdatePharmacyRequest,
+    token: str = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Update a pharmacy; set is_active to false to stop matching it
+    """
+    await require_role(token, UserRole.ADMIN)
+
+    try:
+        pharmacy = (await db.execute(select(Pharmacy).where(Pharmacy.id == pharmacy_id))).scalar_one_or_none()
+        if not pharmacy:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pharmacy not found")
+
+        for field, value in request.model_dump(exclude_unset=True).items():
+            setattr(pharmacy, field, value)
+        await db.commit()
+        await db.refresh(pharmacy)
+        return pharmacy
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update pharmacy: {str(e)}"
+        )
+
+
+@router.put("/{pharmacy_id}/stock", response_model=StockResponse)
+async def update_pharmacy_stock(
+    pharmacy_id: str,
+    request: UpdateStockRequest,
+    token: str = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Set the pharmacy's quantity of each listed medication
+    """
+    # Admins only: pharmacist accounts are not linked to a pharmacy, so a
+    # pharmacist could otherwise overwrite any pharmacy's stock
+    await require_role(token, UserRole.ADMIN)
+
+    try:
+        exists = (await db.execute(select(Pharmacy.id).where(Pharmacy.id == pharmacy_id))).scalar_one_or_none()
+        if not exists:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pharmacy not found")
+
+        await set_pharmacy_stock(db, pharmacy_id, [(item.medication_name, item.quantity) for item in request.items])
+        await db.commit()
+        return StockResponse(pharmacy_id=pharmacy_id, items=request.items)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update stock: {str(e)}"
+        )
+
+
+@router.get("/{pharmacy_id}/stock", response_model=StockResponse)
+async def get_pharmacy_stock(pharmacy_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Medications the pharmacy has a stock entry for
+    """
+    result = await db.execute(
+        select(PharmacyStock.medication_name, PharmacyStock.quantity)
+        .where(PharmacyStock.pharmacy_id == pharmacy_id)
+        .order_by(PharmacyStock.medication_key)
+    )
+    return StockResponse(
+        pharmacy_id=pharmacy_id,
+        items=[{"medication_name": row.medication_name, "quantity": row.quantity} for row in result]
+    )
+
+
+@router.get("/nearby", response_model=NearbyPharmaciesResponse)
+def get_nearby_pharmacies(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(PHARMACY_MATCH_RADIUS_KM, gt=0, le=100),
+    limit: int = Query(PHARMACY_MATCH_LIMIT, ge=1, le=100),
+    medication: Optional[List[str]] = Query(None, max_length=50)
+):
+    """
+    Active pharmacies nearest to a point, from the in-memory spatial index.
+    With ?medication=...&medication=..., pharmacies stocking all of them come first.
+    """
+    return NearbyPharmaciesResponse(
+        pharmacies=find_nearby_pharmacies(latitude, longitude, radius_km, limit, medications=medication)
+    )
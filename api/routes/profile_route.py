@@ -1,28 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-import os
-import bcrypt
+from fastapi import APIRouter, HTTPException, Depends, Header, Response, status
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from schemas.auth_schema import UserResponse, ChangePasswordRequest
 from models.auth_model import User
-from database import get_db
-from helpers.user_utils import get_current_user
+from database import get_async_db
+from utils.auth_utils import Principal, get_current_user, get_current_profile, get_current_principal, revoke_older_tokens, bump_token_version, create_access_token, create_refresh_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from utils.http_cache import make_etag, etag_matches, not_modified, set_cache_headers
+from utils.hashing import hash_password_async, verify_password_async
 
 router = APIRouter(prefix="/api/v1/profile", tags=["profile"])
 
 
-def verify_password(password: str, password_hash: str) -> bool:
-    """Verify a password against its hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
-
-
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt(rounds=os.getenv("BCRYPT_ROUNDS", 12))
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
-
-
 @router.get("/me", response_model=UserResponse, status_code=status.HTTP_200_OK)
-def get_profile(token: str = None, db: Session = Depends(get_db)):
+async def get_profile(
+    response: Response,
+    token: str = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     
     if not token:
         raise HTTPException(
@@ -30,18 +26,35 @@ def get_profile(token: str = None, db: Session = Depends(get_db)):
             detail="Authorization token required"
         )
     
-    user = get_current_user(token, db)
-    return UserResponse.from_orm(user)
+    current_version = None
+    if if_none_match:
+        # Version-only lookup; the profile itself is only built when it changed
+        principal = await get_current_principal(token)
+        result = await db.execute(
+            select(User.updated_at, User.token_version).where(User.id == principal.user_id)
+        )
+        version = result.first()
+        if version and version.token_version == principal.token_version:
+            etag = make_etag("user", principal.user_id, version.updated_at)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            # The client's copy is out of date, so a cached snapshot may be too
+            current_version = version.updated_at
+    
+    profile = await get_current_profile(token, db, updated_at=current_version)
+    set_cache_headers(response, make_etag("user", profile.id, profile.updated_at))
+    return profile
 
 
 @router.post("/change-password", status_code=status.HTTP_200_OK)
-def change_password(
+async def change_password(
     request: ChangePasswordRequest,
     token: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Change user password (requires Authorization header with Bearer token)
+    Change user password (requires Authorization header with Bearer token).
+    All of the user's tokens are revoked; the response carries a new pair for this session.
     """
     if not token:
         raise HTTPException(
@@ -50,25 +63,38 @@ def change_password(
         )
     
     try:
-        user = get_current_user(token, db)
+        user = await get_current_user(token, db)
+        # Release the pooled connection while bcrypt runs
+        await db.commit()
         
         # Verify current password
-        if not verify_password(request.current_password, user.password_hash):
+        if not await verify_password_async(request.current_password, user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Current password is incorrect"
             )
         
-        # Update password
-        user.password_hash = hash_password(request.new_password)
-        db.commit()
+        # Update password; the version is bumped in the UPDATE so concurrent changes each get their own
+        token_version = await bump_token_version(
+            db, user.id, password_hash=await hash_password_async(request.new_password)
+        )
+        await db.commit()
+        await revoke_older_tokens(user.id, token_version)
         
-        return {"message": "Password changed successfully"}
+        # Every existing session is logged out, this one included; it carries on with the new tokens
+        principal = Principal(user_id=user.id, role=user.role, token_version=token_version)
+        return {
+            "message": "Password changed successfully",
+            "access_token": create_access_token(principal),
+            "refresh_token": create_refresh_token(principal),
+            "token_type": "bearer",
+            "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        }
     
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Password change failed: {str(e)}"
@@ -127,6 +127,18 @@ class RefreshTokenRequest(BaseModel):
         }
 
 
+class LogoutRequest(BaseModel):
+    # Revoked along with the access token, so the session cannot be refreshed
+    refresh_token: Optional[str] = None
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "refresh_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."
+            }
+        }
+
+
 class ChangePasswordRequest(BaseModel):
     current_password: str = Field(..., min_length=8, max_length=255)
     new_password: str = Field(..., min_length=8, max_length=255)
@@ -1,7 +1,8 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from models.order_model import *
+from models.prescription_model import VerificationJobStatus
 
 class MedicationItem(BaseModel):
     medication_name: str
@@ -12,6 +13,9 @@ class CreateOrderRequest(BaseModel):
     user_id: str
     medications: List[MedicationItem]
     delivery_address: str
+    # Device location; when absent the city in delivery_address is geocoded instead
+    delivery_latitude: Optional[float] = Field(None, ge=-90, le=90)
+    delivery_longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class MedicationItemResponse(BaseModel):
     medication_name: str
@@ -36,6 +40,12 @@ class OrderResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class OrderListResponse(BaseModel):
+    user_id: str
+    total_orders: Optional[int] = None
+    orders: List[OrderResponse]
+    next_cursor: Optional[str] = None
+
 class PrescriptionUploadResponse(BaseModel):
     order_id: str
     order_number: str
@@ -44,4 +54,32 @@ class PrescriptionUploadResponse(BaseModel):
     prescription_url: Optional[str]
     matched_pharmacies: int
     message: str
-    next_step: str
\ No newline at end of file
+    next_step: str
+
+class CreatePrescriptionUploadRequest(BaseModel):
+    size: int = Field(gt=0)
+    content_type: str
+
+class PrescriptionUploadSessionResponse(BaseModel):
+    upload_id: str
+    order_id: str
+    offset: int
+    size: int
+    expires_at: datetime
+
+class VerificationJobResponse(BaseModel):
+    status: VerificationJobStatus
+    attempts: int
+    queued_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+class PrescriptionStatusResponse(BaseModel):
+    order_id: str
+    status: OrderStatus
+    prescription_status: Optional[PrescriptionStatus]
+    rejection_reason: Optional[str] = None
+    image_url: Optional[str] = None
+    thumbnail_urls: Dict[str, str] = {}
+    verification: Optional[VerificationJobResponse] = None
@@ -0,0 +1,67 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+
+class CreatePharmacyRequest(BaseModel):
+    name: str = Field(..., min_length=2, max_length=255)
+    address: str = Field(..., max_length=500)
+    city: Optional[str] = Field(None, max_length=100)
+    phone: Optional[str] = Field(None, max_length=20)
+    # Geocoded from the address when omitted
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+
+class UpdatePharmacyRequest(BaseModel):
+    name: Optional[str] = Field(None, min_length=2, max_length=255)
+    address: Optional[str] = Field(None, max_length=500)
+    city: Optional[str] = Field(None, max_length=100)
+    phone: Optional[str] = Field(None, max_length=20)
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    is_active: Optional[bool] = None
+
+
+class PharmacyResponse(BaseModel):
+    id: str
+    name: str
+    address: str
+    city: Optional[str]
+    phone: Optional[str]
+    latitude: float
+    longitude: float
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class StockItem(BaseModel):
+    medication_name: str = Field(..., min_length=1, max_length=255)
+    quantity: int = Field(..., ge=0)
+
+
+class UpdateStockRequest(BaseModel):
+    # Items not listed are left as they are; send quantity 0 for items out of stock
+    items: List[StockItem] = Field(..., min_length=1, max_length=1000)
+
+
+class StockResponse(BaseModel):
+    pharmacy_id: str
+    items: List[StockItem]
+
+
+class NearbyPharmacy(BaseModel):
+    pharmacy_id: str
+    name: str
+    distance_km: float
+    latitude: float
+    longitude: float
+    # Only set when medications were asked for
+    has_all_items: Optional[bool] = None
+
+
+class NearbyPharmaciesResponse(BaseModel):
+    pharmacies: List[NearbyPharmacy]
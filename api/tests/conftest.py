@@ -0,0 +1,75 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+
+# Modules import each other from the api directory, as they do when the app runs
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# Hash on a thread rather than spawning worker processes
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """
+    AsyncSession on DATABASE_URL with the alembic migrations applied; tests
+    using it are skipped when no database is reachable. Tests clean up the
+    rows they create.
+    """
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set")
+    from sqlalchemy import text
+    from database import AsyncSessionLocal, async_engine
+
+    try:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Database not reachable: {e}")
+
+    async with AsyncSessionLocal() as session:
+        yield session
+    await async_engine.dispose()
+
+
+@pytest.fixture
+async def client(db):
+    """HTTP client for the app, without its startup tasks; skipped like `db` when there is no database"""
+    import httpx
+    from main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Local storage under a temporary directory, which the app's get_storage() resolves to"""
+    from utils.storage import LocalStorageBackend
+
+    monkeypatch.chdir(tmp_path)
+    return LocalStorageBackend()
+
+
+@pytest.fixture
+def statements(db):
+    """SQL the app's async engine runs during the test; clear it before the part being measured"""
+    from sqlalchemy import event
+    from database import async_engine
+
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
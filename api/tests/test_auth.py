@@ -0,0 +1,175 @@
+import asyncio
+import uuid
+import pytest
+from sqlalchemy import delete, select
+from models.auth_model import User
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "password123"
+
+
+@pytest.fixture
+async def session(client, db):
+    """A freshly registered user's registration response"""
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post(
+        "/api/v1/auth/register",
+        json={"fullname": "Auth Test", "email": email, "password": PASSWORD}
+    )
+    assert response.status_code == 201, response.text
+    body = response.json()
+    yield body
+    await db.rollback()
+    await db.execute(delete(User).where(User.email == email))
+    await db.commit()
+
+
+async def profile_status(client, token):
+    return (await client.get("/api/v1/profile/me", params={"token": token})).status_code
+
+
+async def refresh_status(client, refresh_token):
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token})
+    return response.status_code
+
+
+async def test_logout_revokes_the_refresh_token_too(client, session):
+    response = await client.post(
+        "/api/v1/auth/logout",
+        params={"token": session["access_token"]},
+        json={"refresh_token": session["refresh_token"]}
+    )
+    assert response.status_code == 200
+    assert await profile_status(client, session["access_token"]) == 401
+    assert await refresh_status(client, session["refresh_token"]) == 401
+
+
+async def test_logout_refuses_another_users_refresh_token(client, session, db):
+    other_email = f"{uuid.uuid4().hex[:12]}@example.com"
+    other = await client.post(
+        "/api/v1/auth/register",
+        json={"fullname": "Other", "email": other_email, "password": PASSWORD}
+    )
+    try:
+        response = await client.post(
+            "/api/v1/auth/logout",
+            params={"token": session["access_token"]},
+            json={"refresh_token": other.json()["refresh_token"]}
+        )
+        assert response.status_code == 401
+        # Nothing was revoked
+        assert await profile_status(client, session["access_token"]) == 200
+        assert await refresh_status(client, other.json()["refresh_token"]) == 200
+    finally:
+        await db.execute(delete(User).where(User.email == other_email))
+        await db.commit()
+
+
+async def test_refresh_tokens_are_single_use(client, session):
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": session["refresh_token"]})
+    assert response.status_code == 200
+    assert await profile_status(client, response.json()["access_token"]) == 200
+    assert await refresh_status(client, session["refresh_token"]) == 401
+
+
+async def change_password(client, token, current, new):
+    return await client.post(
+        "/api/v1/profile/change-password",
+        params={"token": token},
+        json={"current_password": current, "new_password": new}
+    )
+
+
+async def test_change_password_retires_old_tokens_and_returns_new_ones(client, session):
+    response = await change_password(client, session["access_token"], PASSWORD, "new-password-1")
+    assert response.status_code == 200
+    body = response.json()
+
+    assert await profile_status(client, session["access_token"]) == 401
+    assert await refresh_status(client, session["refresh_token"]) == 401
+    assert await profile_status(client, body["access_token"]) == 200
+    assert await refresh_status(client, body["refresh_token"]) == 200
+
+
+async def test_concurrent_version_bumps_do_not_collide(session):
+    from database import AsyncSessionLocal
+    from utils.auth_utils import bump_token_version
+
+    user_id = uuid.UUID(session["user"]["id"])
+
+    async def bump():
+        async with AsyncSessionLocal() as db:
+            version = await bump_token_version(db, user_id)
+            await asyncio.sleep(0.05)
+            await db.commit()
+            return version
+
+    # A Python-side read-modify-write would give both the same version
+    assert sorted(await asyncio.gather(bump(), bump())) == [1, 2]
+
+
+async def test_role_change_retires_tokens_with_the_old_role(client, session, db):
+    from models.auth_model import UserRole
+    from utils import auth_utils
+
+    user = await db.get(User, uuid.UUID(session["user"]["id"]))
+    user.role = UserRole.PHARMACIST
+    await db.commit()
+    await asyncio.gather(*auth_utils._revocations)
+
+    result = await db.execute(select(User.token_version).where(User.id == user.id))
+    assert result.scalar_one() == 1
+    await db.rollback()
+    # Signed with the old role, so refused even though the database was not asked
+    assert await profile_status(client, session["access_token"]) == 401
+    assert await refresh_status(client, session["refresh_token"]) == 401
+
+    response = await client.post("/api/v1/auth/login", json={"email": session["user"]["email"], "password": PASSWORD})
+    assert response.status_code == 200
+    assert await profile_status(client, response.json()["access_token"]) == 200
+
+
+async def test_other_updates_keep_tokens(client, session, db):
+    user = await db.get(User, uuid.UUID(session["user"]["id"]))
+    user.fullname = "Renamed"
+    await db.commit()
+    assert await profile_status(client, session["access_token"]) == 200
+
+
+async def test_registration_is_one_insert(client, db, statements):
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    try:
+        response = await client.post(
+            "/api/v1/auth/register",
+            json={"fullname": "One Trip", "email": email, "password": PASSWORD}
+        )
+        assert response.status_code == 201
+        assert len(statements) == 1
+        assert "ON CONFLICT (email) DO NOTHING" in statements[0]
+    finally:
+        await db.execute(delete(User).where(User.email == email))
+        await db.commit()
+
+
+async def test_concurrent_signups_with_one_email_create_one_user(client, db):
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    try:
+        responses = await asyncio.gather(*(
+            client.post(
+                "/api/v1/auth/register",
+                json={"fullname": f"Racer {number}", "email": email, "password": PASSWORD}
+            )
+            for number in range(5)
+        ))
+        assert sorted(response.status_code for response in responses) == [201, 400, 400, 400, 400]
+        assert {response.json().get("detail") for response in responses if response.status_code == 400} == {
+            "Email already registered"
+        }
+        result = await db.execute(select(User.fullname).where(User.email == email))
+        [winner] = [response.json()["user"]["fullname"] for response in responses if response.status_code == 201]
+        assert result.scalars().all() == [winner]
+    finally:
+        await db.rollback()
+        await db.execute(delete(User).where(User.email == email))
+        await db.commit()
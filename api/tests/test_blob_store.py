@@ -0,0 +1,48 @@
+import os
+import time
+import pytest
+from sqlalchemy import delete, insert
+import utils.blob_store as blob_store
+from models.prescription_model import PrescriptionBlob
+from utils.storage import LocalStorageBackend
+
+pytestmark = pytest.mark.anyio
+
+
+def write(storage, key, age_seconds):
+    path = storage.local_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"prescription")
+    stamp = time.time() - age_seconds
+    os.utime(path, (stamp, stamp))
+
+
+async def test_sweep_deletes_only_stale_files_without_a_row(db, tmp_path, monkeypatch):
+    storage = LocalStorageBackend(str(tmp_path))
+    monkeypatch.setattr(blob_store, "get_storage", lambda: storage)
+    kept_sha, orphan_sha, fresh_sha = "a" * 64, "b" * 64, "c" * 64
+    await db.execute(insert(PrescriptionBlob).values(
+        sha256=kept_sha, storage_key=blob_store.blob_key(kept_sha), size=12, ref_count=1
+    ))
+    await db.commit()
+    try:
+        write(storage, blob_store.blob_key(kept_sha), 7200)
+        write(storage, blob_store.blob_key(kept_sha) + ".jpg", 7200)
+        # Moved into place by a transaction that rolled back
+        write(storage, blob_store.blob_key(orphan_sha), 7200)
+        write(storage, blob_store.blob_key(orphan_sha) + ".160.jpg", 7200)
+        # Its transaction may still commit
+        write(storage, blob_store.blob_key(fresh_sha), 0)
+        write(storage, "staging/left-behind", 7200)
+
+        assert await blob_store.sweep_orphaned_files(db, grace_seconds=3600) == 3
+
+        assert os.path.exists(storage.local_path(blob_store.blob_key(kept_sha)))
+        assert os.path.exists(storage.local_path(blob_store.blob_key(kept_sha) + ".jpg"))
+        assert os.path.exists(storage.local_path(blob_store.blob_key(fresh_sha)))
+        assert not os.path.exists(storage.local_path(blob_store.blob_key(orphan_sha)))
+        assert not os.path.exists(storage.local_path("staging/left-behind"))
+    finally:
+        await db.execute(delete(PrescriptionBlob).where(PrescriptionBlob.sha256 == kept_sha))
+        await db.commit()
@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+import routes.internal_route as internal_route
+from utils.db_metrics import PoolMetrics, timed_pool_class
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def pool():
+    """A one-connection pool with metrics, on an in-memory SQLite database"""
+    metrics = PoolMetrics("test")
+    engine = create_engine(
+        "sqlite://",
+        poolclass=timed_pool_class(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.2
+    )
+    metrics.attach(engine)
+    yield engine, metrics
+    engine.dispose()
+
+
+def test_checkouts_and_waits_are_counted(pool):
+    engine, metrics = pool
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        assert metrics.counts() == {"size": 1, "checked_out": 1, "idle": 0, "overflow": 0}
+        # The only connection is taken, so this waits out pool_timeout
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["checked_out"] == 0 and snapshot["idle"] == 1
+    assert (snapshot["checkouts"], snapshot["connects"], snapshot["checkout_timeouts"]) == (1, 1, 1)
+    wait = snapshot["checkout_wait"]
+    assert wait["count"] == 2
+    assert wait["max_ms"] >= 200
+    # Cumulative buckets: the first checkout was quick, the timed-out one was not
+    assert wait["histogram"]["le_100ms"] == 1
+    assert wait["histogram"]["le_250ms"] == wait["histogram"]["le_inf"] == 2
+
+
+def test_slow_checkouts_are_logged(pool, caplog):
+    engine, metrics = pool
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    assert "Slow test pool checkout" in caplog.text
+
+
+def test_metrics_before_the_engine_exists():
+    assert PoolMetrics("unused").snapshot()["size"] == 0
+
+
+async def test_pool_endpoint_needs_the_internal_token(monkeypatch):
+    import httpx
+    from main import app
+
+    monkeypatch.setattr(internal_route, "INTERNAL_API_TOKEN", "scraper-secret")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/internal/db/pool")).status_code == 403
+        response = await client.get("/internal/db/pool", headers={"X-Internal-Token": "scraper-secret"})
+    assert response.status_code == 200
+    assert set(response.json()) == {"sync", "async"}
+    assert "histogram" in response.json()["async"]["checkout_wait"]
@@ -0,0 +1,121 @@
+import pytest
+from PIL import Image
+import utils.doc_analysis as doc_analysis
+from utils.doc_analysis import DocumentAnalysisPool, TextExtractionError, analyze_document, extract_fields
+from utils.doc_verify import verify_prescription_document
+
+pytestmark = pytest.mark.anyio
+
+PRESCRIPTION_TEXT = "Dr. Ada Obi\nDate: 02/01/2026\nAmoxil 500 mg three times daily\nRest"
+
+
+def write_image(path, size=(4000, 3000), format="JPEG"):
+    Image.new("RGB", size, "white").save(path, format)
+    return str(path)
+
+
+def write_pdf(path, text):
+    """A one-page PDF whose text layer says `text`"""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(pdf)
+    return str(path)
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    """Text extractor that reads PRESCRIPTION_TEXT off any image and records what it was given"""
+    seen = []
+
+    def extract(image):
+        seen.append((image.mode, image.size))
+        return PRESCRIPTION_TEXT
+
+    monkeypatch.setattr(doc_analysis, "_text_extractor", extract)
+    return seen
+
+
+def test_fields_from_prescription_text():
+    assert extract_fields(PRESCRIPTION_TEXT) == {
+        "doctor_name": "Dr. Ada Obi",
+        "prescription_date": "02/01/2026",
+        "medications_found": ["Amoxil 500 mg three times daily"],
+        "text_length": len(PRESCRIPTION_TEXT),
+    }
+
+
+def test_photos_are_downscaled_before_text_extraction(tmp_path, extractor):
+    analysis = analyze_document(write_image(tmp_path / "rx.jpg"))
+    assert analysis["detected_type"] == "image/jpeg"
+    # The original size is reported, but the extractor only sees a greyscale copy that fits the limit
+    assert (analysis["width"], analysis["height"], analysis["page_count"]) == (4000, 3000, 1)
+    [(mode, size)] = extractor
+    assert mode == "L" and max(size) <= doc_analysis.DOC_ANALYSIS_MAX_DIMENSION
+    assert analysis["extracted_data"]["doctor_name"] == "Dr. Ada Obi"
+
+
+def test_pdf_text_layer_is_read_without_ocr(tmp_path, extractor):
+    analysis = analyze_document(write_pdf(tmp_path / "rx.pdf", "Dr. Ada Obi 2026-01-02 Amoxil 500 mg"))
+    assert (analysis["detected_type"], analysis["page_count"]) == ("application/pdf", 1)
+    assert analysis["extracted_data"]["prescription_date"] == "2026-01-02"
+    assert extractor == []
+
+
+def test_type_comes_from_the_content(tmp_path):
+    path = tmp_path / "rx.jpg"
+    path.write_bytes(b"just some text")
+    assert analyze_document(str(path))["detected_type"] is None
+
+    # Declared PNG by its header, but cut short
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 20)
+    analysis = analyze_document(str(path))
+    assert analysis["detected_type"] == "image/png"
+    assert analysis["error"].startswith("Unreadable document")
+
+
+def test_extractor_failures_are_raised_for_a_retry(tmp_path, monkeypatch):
+    def broken(image):
+        raise RuntimeError("OCR service down")
+
+    monkeypatch.setattr(doc_analysis, "_text_extractor", broken)
+    with pytest.raises(TextExtractionError):
+        analyze_document(write_image(tmp_path / "rx.png", (100, 100), "PNG"))
+
+
+async def test_analysis_runs_in_worker_processes(tmp_path):
+    paths = [write_image(tmp_path / f"rx{number}.png", (200 + number, 100), "PNG") for number in range(3)]
+    pool = DocumentAnalysisPool(2)
+    try:
+        analysis = await pool.analyze(paths[0])
+        batch = pool.analyze_batch(paths)
+    finally:
+        pool.shutdown()
+    assert (analysis["detected_type"], analysis["width"]) == ("image/png", 200)
+    assert [result["width"] for result in batch] == [200, 201, 202]
+
+
+async def test_verification_trusts_the_content_over_the_declared_type(tmp_path, monkeypatch):
+    monkeypatch.setattr(doc_analysis.analysis_pool, "workers", 0)
+    result = await verify_prescription_document(write_image(tmp_path / "rx.png", (100, 100), "PNG"), "application/pdf")
+    assert result["valid"]
+    assert (result["document"]["detected_type"], result["document"]["declared_type"]) == ("image/png", "application/pdf")
+
+    path = tmp_path / "rx.txt"
+    path.write_bytes(b"not a prescription")
+    result = await verify_prescription_document(str(path), "image/png")
+    assert result == {"valid": False, "reason": "Invalid file type. Only JPEG, PNG, and PDF allowed"}
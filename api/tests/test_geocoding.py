@@ -0,0 +1,61 @@
+import httpx
+import pytest
+import utils.geocoding as geocoding
+from utils.ttl_cache import TTLCache
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeNominatim:
+    """Answers searches with `results`, or 503 while `down`; records the requests it gets"""
+
+    def __init__(self):
+        self.results = []
+        self.down = False
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if self.down:
+            return httpx.Response(503)
+        return httpx.Response(200, json=self.results)
+
+
+@pytest.fixture
+def nominatim(monkeypatch):
+    """Nominatim as the geocoder, with a fake in place of the service"""
+    fake = FakeNominatim()
+    monkeypatch.setattr(geocoding, "GEOCODER", "nominatim")
+    monkeypatch.setattr(geocoding, "geocode_cache", TTLCache(100, 60))
+    monkeypatch.setattr(geocoding, "geocoder_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(fake)))
+    return fake
+
+
+def test_gazetteer_takes_the_last_city_named():
+    assert geocoding.gazetteer_lookup("12 Kano Road, Kaduna") == geocoding.GAZETTEER["kaduna"]
+    assert geocoding.gazetteer_lookup("somewhere unknown") is None
+
+
+async def test_gazetteer_alone_by_default():
+    assert geocoding.get_geocoder() is None
+    assert await geocoding.geocode_address("1 Zoo Road, Kano") == geocoding.GAZETTEER["kano"]
+
+
+async def test_street_level_answer_is_cached(nominatim):
+    nominatim.results = [{"lat": "12.0101", "lon": "8.5333", "display_name": "Zoo Road, Kano"}]
+    assert await geocoding.geocode_address("1 Zoo Road,  Kano") == (12.0101, 8.5333)
+    assert await geocoding.geocode_address("1 zoo road, kano") == (12.0101, 8.5333)
+    [request] = nominatim.requests
+    assert request.url.params["q"] == "1 Zoo Road, Kano"
+    assert request.url.params["countrycodes"] == "ng"
+
+
+async def test_falls_back_to_the_gazetteer(nominatim):
+    # Nothing found: the city centre will do
+    assert await geocoding.geocode_address("1 Nowhere Street, Jos") == geocoding.GAZETTEER["jos"]
+
+    # Down: the city centre, and the address is asked about again next time
+    nominatim.down = True
+    assert await geocoding.geocode_address("2 Nowhere Street, Jos") == geocoding.GAZETTEER["jos"]
+    assert await geocoding.geocode_address("2 Nowhere Street, Jos") == geocoding.GAZETTEER["jos"]
+    assert len(nominatim.requests) == 3
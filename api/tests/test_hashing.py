@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete
+import utils.hashing as hashing
+from models.auth_model import User
+from utils.hashing import HashingPool, hash_password, verify_password
+
+pytestmark = pytest.mark.anyio
+
+
+def wait_for(event: threading.Event) -> bool:
+    return event.wait(10)
+
+
+async def test_hashes_beyond_the_queue_are_turned_away():
+    pool = HashingPool(workers=0, max_queue=1)
+    release = threading.Event()
+    # One hashing, one waiting for the slot
+    running = [asyncio.create_task(pool.run(wait_for, release)) for _ in range(2)]
+    while pool.in_flight < 2:
+        await asyncio.sleep(0.01)
+
+    with pytest.raises(HTTPException) as raised:
+        await pool.run(wait_for, release)
+    assert raised.value.status_code == 503
+    assert raised.value.headers["Retry-After"] == "1"
+    assert pool.stats()["rejected"] == 1
+
+    release.set()
+    assert await asyncio.gather(*running) == [True, True]
+    assert pool.stats()["in_flight"] == 0
+
+
+async def test_worker_processes_hash_and_verify():
+    pool = HashingPool(workers=1, max_queue=0)
+    try:
+        password_hash = await pool.run(hash_password, "password123", 4)
+        assert await pool.run(verify_password, "password123", password_hash)
+        assert not await pool.run(verify_password, "wrong", password_hash)
+    finally:
+        pool.shutdown()
+    assert hashing.hash_rounds(password_hash) == 4
+
+
+async def test_registration_is_refused_while_hashing_is_saturated(client, db, monkeypatch):
+    pool = HashingPool(workers=0, max_queue=0)
+    pool.in_flight = 1
+    monkeypatch.setattr(hashing, "hashing_pool", pool)
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    try:
+        response = await client.post(
+            "/api/v1/auth/register",
+            json={"fullname": "Busy", "email": email, "password": "password123"}
+        )
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        await db.execute(delete(User).where(User.email == email))
+        await db.commit()
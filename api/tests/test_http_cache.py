@@ -0,0 +1,81 @@
+import uuid
+import pytest
+from sqlalchemy import delete, select, update
+from models.auth_model import User
+from models.order_model import Order, OrderStatus
+from utils.http_cache import etag_matches, make_etag
+from utils.order_state import transition_order
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def account(client, db):
+    """A freshly registered user's registration response; their orders go with them"""
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post(
+        "/api/v1/auth/register",
+        json={"fullname": "Cache Test", "email": email, "password": "password123"}
+    )
+    assert response.status_code == 201, response.text
+    yield response.json()
+    await db.rollback()
+    await db.execute(delete(User).where(User.email == email))
+    await db.commit()
+
+
+def test_if_none_match_comparison():
+    etag = make_etag("order", "abc", 1)
+    assert etag == make_etag("order", "abc", 1) != make_etag("order", "abc", 2)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+async def test_unchanged_order_is_not_sent_again(client, db, account, statements):
+    created = await client.post("/api/v1/orders/create", json={
+        "user_id": account["user"]["id"],
+        "medications": [{"medication_name": "Coartem", "quantity": 2}],
+        "delivery_address": "1 Zoo Road, Kano"
+    })
+    url = f"/api/v1/orders/{created.json()['order_id']}"
+    first = await client.get(url)
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    statements.clear()
+    repeat = await client.get(url, headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.headers["ETag"] == etag
+    assert repeat.content == b""
+    # Only the version was read
+    assert len(statements) == 1
+
+    result = await db.execute(select(Order.id).where(Order.order_id == created.json()["order_id"]))
+    await transition_order(db, result.scalar_one(), OrderStatus.PENDING, OrderStatus.VERIFYING)
+    await db.commit()
+    changed = await client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["status"] == "verifying"
+    assert changed.headers["ETag"] != etag
+
+
+async def test_unchanged_profile_is_not_sent_again(client, db, account, statements):
+    params = {"token": account["access_token"]}
+    first = await client.get("/api/v1/profile/me", params=params)
+    etag = first.headers["ETag"]
+
+    statements.clear()
+    repeat = await client.get("/api/v1/profile/me", params=params, headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert len(statements) == 1
+
+    await db.execute(update(User).where(User.id == uuid.UUID(account["user"]["id"])).values(fullname="Renamed"))
+    await db.commit()
+    # The cached profile snapshot is from the old version, so it is not what comes back
+    changed = await client.get("/api/v1/profile/me", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["fullname"] == "Renamed"
+    assert changed.headers["ETag"] != etag
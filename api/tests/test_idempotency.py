@@ -0,0 +1,137 @@
+import asyncio
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from models.idempotency_model import IdempotencyKey, IdempotencyKeyStatus
+import utils.idempotency as idempotency
+from utils.idempotency import claim_idempotency_key, idempotency_cache, request_fingerprint, run_idempotent
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def scope(db):
+    scope = f"/test/{uuid.uuid4().hex}"
+    yield scope
+    await db.rollback()
+    await db.execute(delete(IdempotencyKey).where(IdempotencyKey.scope == scope))
+    await db.commit()
+    idempotency_cache.clear()
+
+
+def handler_counting(calls, body):
+    async def handler():
+        calls.append(body)
+        return body
+    return handler
+
+
+async def test_repeat_replays_the_stored_response(db, scope):
+    calls = []
+    fingerprint = request_fingerprint("order", 1)
+    first = await run_idempotent(db, scope, "k", fingerprint, handler_counting(calls, {"n": 1}), status_code=201)
+    assert first == {"n": 1}
+
+    # From the database, as another process would see it
+    idempotency_cache.clear()
+    repeat = await run_idempotent(db, scope, "k", fingerprint, handler_counting(calls, {"n": 2}))
+    assert repeat.status_code == 201
+    assert repeat.headers["Idempotent-Replayed"] == "true"
+    assert repeat.body == b'{"n":1}'
+    assert calls == [{"n": 1}]
+
+
+async def test_same_key_for_a_different_request_is_refused(db, scope):
+    await run_idempotent(db, scope, "k", request_fingerprint(1), handler_counting([], {}))
+    for clear in (False, True):
+        if clear:
+            idempotency_cache.clear()
+        with pytest.raises(HTTPException) as raised:
+            await run_idempotent(db, scope, "k", request_fingerprint(2), handler_counting([], {}))
+        assert raised.value.status_code == 422
+
+
+async def test_failed_request_leaves_the_key_free(db, scope):
+    async def failing():
+        await db.execute(select(1))
+        raise RuntimeError("lost the connection after the handler's writes")
+
+    with pytest.raises(RuntimeError):
+        await run_idempotent(db, scope, "k", request_fingerprint(1), failing)
+    await db.rollback()
+
+    calls = []
+    assert await run_idempotent(db, scope, "k", request_fingerprint(1), handler_counting(calls, {"ok": True})) == {"ok": True}
+    assert calls == [{"ok": True}]
+    result = await db.execute(select(IdempotencyKey.status).where(IdempotencyKey.scope == scope))
+    assert result.scalar_one() == IdempotencyKeyStatus.COMPLETED
+    await db.rollback()
+
+
+async def test_concurrent_repeat_is_told_to_retry(db, scope):
+    from database import AsyncSessionLocal
+
+    release = asyncio.Event()
+    calls = []
+
+    async def slow():
+        calls.append("first")
+        await release.wait()
+        return {"n": 1}
+
+    fingerprint = request_fingerprint(1)
+    first = asyncio.create_task(run_idempotent(db, scope, "k", fingerprint, slow))
+    while not calls:
+        await asyncio.sleep(0.01)
+
+    async with AsyncSessionLocal() as other:
+        # Answered at once from the committed claim, not after the first request
+        with pytest.raises(HTTPException) as raised:
+            await asyncio.wait_for(
+                run_idempotent(other, scope, "k", fingerprint, handler_counting(calls, {"n": 2})), 1
+            )
+        assert raised.value.status_code == 409
+        assert raised.value.headers["Retry-After"] == "1"
+
+        release.set()
+        assert await first == {"n": 1}
+        idempotency_cache.clear()
+        repeat = await run_idempotent(other, scope, "k", fingerprint, handler_counting(calls, {"n": 2}))
+    assert repeat.body == b'{"n":1}'
+    assert calls == ["first"]
+
+
+async def test_abandoned_claim_is_taken_over_after_its_lease(db, scope, monkeypatch):
+    fingerprint = request_fingerprint(1)
+    # Claimed by a process that died before finishing
+    assert await claim_idempotency_key(db, scope, "k", fingerprint)
+    with pytest.raises(HTTPException) as raised:
+        await run_idempotent(db, scope, "k", fingerprint, handler_counting([], {}))
+    assert raised.value.status_code == 409
+
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LEASE_SECONDS", 0)
+    # A different request still cannot take the key
+    with pytest.raises(HTTPException) as raised:
+        await run_idempotent(db, scope, "k", request_fingerprint(2), handler_counting([], {}))
+    assert raised.value.status_code == 422
+    assert await run_idempotent(db, scope, "k", fingerprint, handler_counting([], {"n": 1})) == {"n": 1}
+
+
+async def test_work_is_dropped_when_the_claim_was_taken_over(db, scope, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LEASE_SECONDS", 0)
+
+    async def overtaken():
+        # Another request takes over the key while this one runs past its lease
+        from database import AsyncSessionLocal
+        async with AsyncSessionLocal() as other:
+            assert await claim_idempotency_key(other, scope, "k", request_fingerprint(1))
+        return {"n": 1}
+
+    with pytest.raises(HTTPException) as raised:
+        await run_idempotent(db, scope, "k", request_fingerprint(1), overtaken)
+    assert raised.value.status_code == 409
+    # The new owner's claim is left alone
+    result = await db.execute(select(IdempotencyKey.status).where(IdempotencyKey.scope == scope))
+    assert result.scalar_one() == IdempotencyKeyStatus.IN_PROGRESS
+    await db.rollback()
@@ -0,0 +1,213 @@
+import asyncio
+import uuid
+import pytest
+from sqlalchemy import delete, func, select
+import utils.notifications as notifications
+from models.notification_model import DeadLetterNotification, Notification
+from utils.notifications import (
+    NotificationDispatcher,
+    NotificationError,
+    PermanentNotificationError,
+    StubSender,
+    claim_notifications,
+    enqueue_notification,
+    record_results,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def channel(db):
+    """A channel of its own, so other rows in the queue are left alone"""
+    channel = f"t{uuid.uuid4().hex[:12]}"
+    yield channel
+    await db.rollback()
+    await db.execute(delete(Notification).where(Notification.channel == channel))
+    await db.execute(delete(DeadLetterNotification).where(DeadLetterNotification.channel == channel))
+    await db.commit()
+
+
+async def enqueue(db, channel, count):
+    for number in range(count):
+        await enqueue_notification(db, channel, f"recipient-{number}", {"text": f"message {number}"})
+    await db.commit()
+
+
+async def queued(db, channel):
+    result = await db.execute(
+        select(
+            Notification.recipient,
+            Notification.attempts,
+            Notification.locked_at,
+            Notification.last_error,
+            func.extract("epoch", Notification.available_at - func.now()).label("due_in")
+        )
+        .where(Notification.channel == channel)
+        .order_by(Notification.recipient)
+    )
+    rows = result.all()
+    await db.commit()
+    return rows
+
+
+async def dead_letters(db, channel):
+    result = await db.execute(
+        select(DeadLetterNotification.recipient, DeadLetterNotification.attempts, DeadLetterNotification.last_error)
+        .where(DeadLetterNotification.channel == channel)
+        .order_by(DeadLetterNotification.recipient)
+    )
+    rows = result.all()
+    await db.commit()
+    return rows
+
+
+async def test_failures_back_off_then_dead_letter(db, channel, monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFICATION_RETRY_BACKOFF_SECONDS", 100)
+    monkeypatch.setattr(notifications, "NOTIFICATION_MAX_ATTEMPTS", 2)
+    await enqueue(db, channel, 4)
+    messages = await claim_notifications(db, 10, [channel])
+    assert sorted(message.attempts for message in messages) == [1, 1, 1, 1]
+    by_recipient = {message.recipient: message for message in messages}
+
+    outcome = await record_results(db, [
+        (by_recipient["recipient-0"], None),
+        (by_recipient["recipient-1"], NotificationError("provider timeout")),
+        (by_recipient["recipient-2"], PermanentNotificationError("invalid number")),
+        (by_recipient["recipient-3"], NotificationError("provider timeout")),
+    ])
+    await db.commit()
+    assert outcome == {"sent": 1, "retried": 2, "dead_lettered": 1}
+
+    rows = await queued(db, channel)
+    assert [row.recipient for row in rows] == ["recipient-1", "recipient-3"]
+    for row in rows:
+        assert row.locked_at is None
+        assert row.last_error == "provider timeout"
+        # First retry waits the base backoff
+        assert 90 < row.due_in <= 100
+    assert await dead_letters(db, channel) == [("recipient-2", 1, "invalid number")]
+
+    # Not due yet, so nothing to claim
+    assert await claim_notifications(db, 10, [channel]) == []
+    await db.execute(Notification.__table__.update().where(Notification.channel == channel).values(available_at=func.now()))
+    await db.commit()
+    retried = await claim_notifications(db, 10, [channel])
+    assert sorted(message.attempts for message in retried) == [2, 2]
+
+    outcome = await record_results(db, [
+        (retried[0], NotificationError("provider timeout")),
+        (retried[1], None),
+    ])
+    await db.commit()
+    # Out of attempts
+    assert outcome == {"sent": 1, "dead_lettered": 1}
+    assert await queued(db, channel) == []
+    assert [row.attempts for row in await dead_letters(db, channel)] == [2, 1]
+
+
+async def test_backoff_doubles_per_attempt(db, channel, monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFICATION_RETRY_BACKOFF_SECONDS", 100)
+    await enqueue(db, channel, 1)
+    for attempt in (1, 2, 3):
+        [message] = await claim_notifications(db, 10, [channel])
+        assert message.attempts == attempt
+        await record_results(db, [(message, NotificationError("busy"))])
+        await db.commit()
+        [row] = await queued(db, channel)
+        expected = 100 * 2 ** (attempt - 1)
+        assert expected - 10 < row.due_in <= expected
+        await db.execute(Notification.__table__.update().where(Notification.channel == channel).values(available_at=func.now()))
+        await db.commit()
+
+
+class TrackingSender(StubSender):
+    """StubSender that records the most messages it was sending at once"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sending = 0
+        self.peak = 0
+
+    async def send_batch(self, messages):
+        self.sending += len(messages)
+        self.peak = max(self.peak, self.sending)
+        try:
+            return await super().send_batch(messages)
+        finally:
+            self.sending -= len(messages)
+
+
+async def run_until(dispatcher, done, timeout=20):
+    stopping = asyncio.Event()
+    running = asyncio.create_task(dispatcher.run(stopping, poll_interval=0.05))
+    try:
+        async with asyncio.timeout(timeout):
+            while not done():
+                await asyncio.sleep(0.02)
+    finally:
+        stopping.set()
+        await running
+
+
+async def test_max_in_flight_holds_back_claims(db, channel, monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFICATION_FLUSH_INTERVAL_SECONDS", 0.05)
+    await enqueue(db, channel, 24)
+    sender = TrackingSender(latency=0.1, max_concurrency=100)
+    dispatcher = NotificationDispatcher({channel: sender}, max_in_flight=5, claim_batch=4)
+
+    await run_until(dispatcher, lambda: dispatcher.counters["sent"] == 24)
+
+    # A fast claimer would have had all 24 out at once
+    assert sender.peak <= 5
+    assert len(sender.sent) == 24
+    assert dispatcher.stats()["in_flight"] == 0
+    assert await queued(db, channel) == []
+
+
+async def test_failing_sender_dead_letters_through_the_dispatcher(db, channel, monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFICATION_FLUSH_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(notifications, "NOTIFICATION_RETRY_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(notifications, "NOTIFICATION_MAX_ATTEMPTS", 3)
+    await enqueue(db, channel, 5)
+    sender = StubSender(failure_rate=1.0, batch_size=2)
+    dispatcher = NotificationDispatcher({channel: sender})
+
+    await run_until(dispatcher, lambda: dispatcher.counters["dead_lettered"] == 5)
+
+    assert sender.sent == []
+    assert dispatcher.counters["retried"] == 10
+    assert await queued(db, channel) == []
+    assert [(row.attempts, row.last_error) for row in await dead_letters(db, channel)] == [(3, "Stub failure")] * 5
+
+
+class ShortSender(StubSender):
+    """Loses the result of the last message in each batch"""
+
+    async def send_batch(self, messages):
+        return (await super().send_batch(messages))[:-1]
+
+
+async def test_missing_results_fail_the_whole_chunk(db, channel, monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFICATION_FLUSH_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(notifications, "NOTIFICATION_RETRY_BACKOFF_SECONDS", 100)
+    await enqueue(db, channel, 6)
+    dispatcher = NotificationDispatcher({channel: ShortSender(batch_size=3)}, max_in_flight=6)
+
+    await run_until(dispatcher, lambda: dispatcher.counters["retried"] == 6)
+
+    # Every message was recorded, so none is still holding capacity
+    assert dispatcher.stats()["in_flight"] == 0
+    rows = await queued(db, channel)
+    assert len(rows) == 6
+    assert {row.last_error for row in rows} == {"Sender returned 2 results for 3 messages"}
+
+
+def test_senders_must_implement_delivery():
+    class Incomplete(notifications.MessageSender):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(TypeError):
+        notifications.NotificationSender()
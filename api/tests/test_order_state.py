@@ -0,0 +1,76 @@
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select
+from models.auth_model import User
+from models.order_model import Order, OrderStatus
+from utils.order_state import ORDER_TRANSITIONS, check_transition, transition_order
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def order(db):
+    user_id = uuid.uuid4()
+    order_pk = uuid.uuid4().hex
+    await db.execute(insert(User).values(
+        id=user_id, fullname="Order State", email=f"{user_id.hex}@example.com", password_hash="x"
+    ))
+    await db.execute(insert(Order).values(
+        id=order_pk, user_id=user_id, order_id=f"ORD_{order_pk[:12].upper()}",
+        status=OrderStatus.PENDING, delivery_address="1 Test Street"
+    ))
+    await db.commit()
+    yield order_pk
+    await db.rollback()
+    await db.execute(delete(User).where(User.id == user_id))
+    await db.commit()
+
+
+async def current(db, order_pk):
+    result = await db.execute(select(Order.status, Order.version).where(Order.id == order_pk))
+    row = result.one()
+    await db.commit()
+    return row
+
+
+def test_final_statuses_have_no_way_out():
+    assert not ORDER_TRANSITIONS[OrderStatus.DELIVERED]
+    assert not ORDER_TRANSITIONS[OrderStatus.CANCELLED]
+
+
+def test_check_transition_follows_each_step():
+    check_transition(OrderStatus.PENDING, OrderStatus.VERIFYING, OrderStatus.VERIFIED)
+    with pytest.raises(HTTPException) as raised:
+        check_transition(OrderStatus.PENDING, OrderStatus.VERIFIED)
+    assert raised.value.status_code == 409
+    with pytest.raises(HTTPException):
+        check_transition(OrderStatus.PENDING, OrderStatus.VERIFYING, OrderStatus.PAID)
+
+
+async def test_transition_bumps_version(db, order):
+    changed = await transition_order(
+        db, order, OrderStatus.PENDING, OrderStatus.VERIFIED, version=1, through=(OrderStatus.VERIFYING,)
+    )
+    await db.commit()
+    assert changed.version == 2
+    assert await current(db, order) == (OrderStatus.VERIFIED, 2)
+
+
+async def test_transition_refuses_a_changed_order(db, order):
+    assert await transition_order(db, order, OrderStatus.PENDING, OrderStatus.VERIFYING, version=1)
+    await db.commit()
+
+    # Same move again from the state the first request read
+    assert await transition_order(db, order, OrderStatus.PENDING, OrderStatus.VERIFYING, version=1) is None
+    assert await transition_order(db, order, OrderStatus.VERIFYING, OrderStatus.REJECTED, version=1) is None
+    await db.commit()
+    assert await current(db, order) == (OrderStatus.VERIFYING, 2)
+
+
+async def test_transition_checks_the_move_before_writing(db, order):
+    with pytest.raises(HTTPException):
+        await transition_order(db, order, OrderStatus.PENDING, OrderStatus.DELIVERED)
+    await db.rollback()
+    assert await current(db, order) == (OrderStatus.PENDING, 1)
+
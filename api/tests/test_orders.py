@@ -0,0 +1,158 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, select
+from models.auth_model import User
+from models.order_model import Order, OrderItem, OrderStatus
+from models.outbox_model import OutboxEvent
+from utils.geocoding import GAZETTEER
+from utils.pagination import decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def customer(db):
+    """A user to place orders for; their orders and order events go with them"""
+    user_id = uuid.uuid4()
+    await db.execute(insert(User).values(
+        id=user_id, fullname="Orders", email=f"{user_id.hex}@example.com", password_hash="x"
+    ))
+    await db.commit()
+    yield str(user_id)
+    await db.rollback()
+    order_ids = select(Order.order_id).where(Order.user_id == user_id)
+    await db.execute(delete(OutboxEvent).where(OutboxEvent.aggregate_id.in_(order_ids)))
+    await db.execute(delete(User).where(User.id == user_id))
+    await db.commit()
+
+
+def order_request(user_id, count=1, **extra):
+    return {
+        "user_id": user_id,
+        "medications": [
+            {"medication_name": f"Medication {number}", "quantity": number + 1}
+            for number in range(count)
+        ],
+        "delivery_address": "1 Zoo Road, Kano",
+        **extra
+    }
+
+
+async def test_order_and_items_in_one_batch(client, db, customer, statements):
+    statements.clear()
+    response = await client.post("/api/v1/orders/create", json=order_request(customer, 3))
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert [item["quantity"] for item in body["medications"]] == [1, 2, 3]
+
+    # One statement for the order, one for all its items, no reads back
+    assert sum(statement.startswith("INSERT INTO orders ") for statement in statements) == 1
+    assert sum(statement.startswith("INSERT INTO order_items ") for statement in statements) == 1
+    assert not [statement for statement in statements if statement.startswith("SELECT")]
+
+    result = await db.execute(
+        select(Order.delivery_latitude, Order.delivery_longitude, func.count(OrderItem.id))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.order_id == body["order_id"])
+        .group_by(Order.id)
+    )
+    assert result.one() == (*GAZETTEER["kano"], 3)
+    result = await db.execute(select(OutboxEvent.payload).where(OutboxEvent.aggregate_id == body["order_id"]))
+    assert result.scalar_one()["items"] == 3
+    await db.commit()
+
+
+async def test_order_for_an_unknown_user_leaves_nothing_behind(client, db):
+    user_id = str(uuid.uuid4())
+    response = await client.post("/api/v1/orders/create", json=order_request(user_id, 2))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "User not found"
+    result = await db.execute(select(func.count()).select_from(Order).where(Order.user_id == uuid.UUID(user_id)))
+    assert result.scalar_one() == 0
+    await db.commit()
+
+
+async def add_orders(db, user_id, created_at):
+    """Orders for `user_id` created at each of `created_at`; returns their ids, newest first like the listing"""
+    rows = [
+        {
+            "id": uuid.uuid4().hex,
+            "user_id": uuid.UUID(user_id),
+            "order_id": f"ORD_{uuid.uuid4().hex[:12].upper()}",
+            "status": OrderStatus.PENDING,
+            "delivery_address": "1 Test Street",
+            "created_at": stamp,
+        }
+        for stamp in created_at
+    ]
+    await db.execute(insert(Order), rows)
+    await db.commit()
+    rows.sort(key=lambda row: (row["created_at"], row["id"]), reverse=True)
+    return [row["order_id"] for row in rows]
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(created_at, "abc")) == (created_at, "abc")
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor("not a cursor")
+    assert raised.value.status_code == 400
+
+
+async def test_pages_follow_the_cursor_without_gaps_or_repeats(client, db, customer):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    # Two orders share a timestamp, so the id breaks the tie
+    expected = await add_orders(db, customer, [start + timedelta(seconds=offset) for offset in (0, 1, 1, 2, 3)])
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(f"/api/v1/orders/user/{customer}", params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["total_orders"] is None
+        seen += [order["order_id"] for order in body["orders"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == expected
+    assert pages == 3
+
+
+async def test_estimated_total_and_bad_cursors(client, customer):
+    response = await client.get(f"/api/v1/orders/user/{customer}", params={"include_total": True})
+    assert isinstance(response.json()["total_orders"], int)
+    response = await client.get(f"/api/v1/orders/user/{customer}", params={"cursor": "garbage"})
+    assert response.status_code == 400
+
+
+async def test_order_read_is_two_queries(client, customer, statements):
+    created = (await client.post("/api/v1/orders/create", json=order_request(customer, 3))).json()
+
+    statements.clear()
+    response = await client.get(f"/api/v1/orders/{created['order_id']}")
+    assert response.status_code == 200
+    order = response.json()
+    assert [item["medication_name"] for item in order["medications"]] == [
+        "Medication 0", "Medication 1", "Medication 2"
+    ]
+    assert (order["user_id"], order["delivery_address"]) == (customer, "1 Zoo Road, Kano")
+    # The order row, then its items
+    assert len(statements) == 2
+
+    assert (await client.get("/api/v1/orders/ORD_NOSUCHORDER")).status_code == 404
+
+
+async def test_order_history_items_in_one_query(client, customer, statements):
+    for count in (1, 2, 3):
+        await client.post("/api/v1/orders/create", json=order_request(customer, count))
+
+    statements.clear()
+    response = await client.get(f"/api/v1/orders/user/{customer}")
+    # The orders, then every order's items at once
+    assert len(statements) == 2
+    orders = response.json()["orders"]
+    assert [len(order["medications"]) for order in orders] == [3, 2, 1]
@@ -0,0 +1,130 @@
+import asyncio
+import uuid
+from collections import defaultdict
+import pytest
+from sqlalchemy import delete, func, select
+import utils.outbox as outbox
+from models.outbox_model import OutboxEvent, OutboxEventStatus
+from utils.outbox import OutboxRelay, record_event
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def aggregate(db, monkeypatch):
+    """
+    An aggregate id for the test's events, with no subscribers but the test's own.
+    Other pending events are locked meanwhile, so the relays under test skip them.
+    """
+    from database import AsyncSessionLocal
+
+    aggregate_id = f"T_{uuid.uuid4().hex[:12]}"
+    monkeypatch.setattr(outbox, "subscribers", defaultdict(list))
+    async with AsyncSessionLocal() as others:
+        await others.execute(
+            select(OutboxEvent.id)
+            .where(OutboxEvent.status == OutboxEventStatus.PENDING, OutboxEvent.aggregate_id != aggregate_id)
+            .with_for_update()
+        )
+        yield aggregate_id
+        await others.rollback()
+    await db.rollback()
+    await db.execute(delete(OutboxEvent).where(OutboxEvent.aggregate_id == aggregate_id))
+    await db.commit()
+
+
+async def add_events(db, aggregate_id, count, event_type="test.event"):
+    for number in range(count):
+        await record_event(db, event_type, aggregate_id, {"number": number})
+    await db.commit()
+
+
+async def events(db, aggregate_id):
+    result = await db.execute(
+        select(
+            OutboxEvent.event_type,
+            OutboxEvent.payload,
+            OutboxEvent.status,
+            OutboxEvent.attempts,
+            OutboxEvent.last_error,
+            (OutboxEvent.available_at > func.now()).label("backing_off")
+        )
+        .where(OutboxEvent.aggregate_id == aggregate_id)
+        .order_by(OutboxEvent.id)
+    )
+    rows = result.all()
+    await db.commit()
+    return rows
+
+
+async def test_a_failing_subscriber_only_undoes_its_own_event(db, aggregate, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_RETRY_BACKOFF_SECONDS", 100)
+
+    async def echo(db, event):
+        # Written in the relay's transaction: kept only if the event is delivered
+        await record_event(db, "test.echo", event.aggregate_id, event.payload)
+        if event.payload["number"] == 1:
+            raise RuntimeError("subscriber failed")
+
+    outbox.subscribers["test.event"].append(echo)
+    await add_events(db, aggregate, 3)
+
+    relay = OutboxRelay()
+    assert await relay.relay_batch(db) == 3
+    assert relay.counters["delivered"] == 2 and relay.counters["retried"] == 1
+
+    rows = await events(db, aggregate)
+    assert [(row.event_type, row.payload["number"], row.status, row.attempts) for row in rows] == [
+        ("test.event", 0, OutboxEventStatus.DONE, 1),
+        ("test.event", 1, OutboxEventStatus.PENDING, 1),
+        ("test.event", 2, OutboxEventStatus.DONE, 1),
+        ("test.echo", 0, OutboxEventStatus.PENDING, 0),
+        ("test.echo", 2, OutboxEventStatus.PENDING, 0),
+    ]
+    assert rows[1].last_error == "subscriber failed"
+    assert rows[1].backing_off
+
+
+async def test_event_fails_for_good_after_max_attempts(db, aggregate, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 1)
+
+    async def broken(db, event):
+        raise RuntimeError("subscriber failed")
+
+    outbox.subscribers["test.event"].append(broken)
+    await add_events(db, aggregate, 1)
+    relay = OutboxRelay()
+    await relay.relay_batch(db)
+    [row] = await events(db, aggregate)
+    assert (row.status, row.attempts) == (OutboxEventStatus.FAILED, 1)
+    assert relay.counters["failed"] == 1
+    # Nothing left to deliver
+    assert await relay.relay_batch(db) == 0
+
+
+async def test_relays_share_the_outbox_without_waiting(db, aggregate):
+    from database import AsyncSessionLocal
+
+    release = asyncio.Event()
+    delivered = []
+
+    async def slow(db, event):
+        delivered.append(event.payload["number"])
+        if event.payload["number"] == 0:
+            await release.wait()
+
+    outbox.subscribers["test.event"].append(slow)
+    await add_events(db, aggregate, 4)
+
+    first = asyncio.create_task(OutboxRelay(batch_size=2).relay_batch(db))
+    while not delivered:
+        await asyncio.sleep(0.01)
+    # The first relay holds events 0 and 1; the second skips them rather than waiting
+    async with AsyncSessionLocal() as other:
+        assert await asyncio.wait_for(OutboxRelay(batch_size=2).relay_batch(other), 5) == 2
+    assert sorted(delivered) == [0, 2, 3]
+
+    release.set()
+    assert await first == 2
+    assert sorted(delivered) == [0, 1, 2, 3]
+    assert {row.status for row in await events(db, aggregate)} == {OutboxEventStatus.DONE}
@@ -0,0 +1,63 @@
+import random
+import pytest
+import utils.pharmacy_index as pharmacy_index
+from utils.inventory_index import InventoryIndex
+from utils.match_cache import MatchCache
+from utils.spatial_index import GeoGridIndex
+
+
+@pytest.fixture
+def indexes(monkeypatch):
+    """Empty pharmacy, inventory and match indexes in place of the process-wide ones"""
+    monkeypatch.setattr(pharmacy_index, "pharmacy_index", GeoGridIndex(pharmacy_index.PHARMACY_INDEX_CELL_DEGREES))
+    monkeypatch.setattr(pharmacy_index, "inventory_index", InventoryIndex())
+    monkeypatch.setattr(pharmacy_index, "match_cache", MatchCache(
+        1000, 600, pharmacy_index.PHARMACY_MATCH_CACHE_CELL_DEGREES, pharmacy_index.PHARMACY_MATCH_RADIUS_KM
+    ))
+    return pharmacy_index
+
+
+def add_pharmacy(index, number, lat, lon, medications):
+    pharmacy = pharmacy_index.IndexedPharmacy(
+        id=f"ph{number}", name=f"Pharmacy {number}", latitude=lat, longitude=lon,
+        slot=index.inventory_index.slot(f"ph{number}")
+    )
+    index.index_pharmacy(pharmacy, pharmacy.id)
+    for medication in medications:
+        index.index_stock(pharmacy.id, medication, True)
+
+
+def uncached(index, lat, lon, radius_km, limit, medications):
+    return [
+        index.pharmacy_match(pharmacy_index.haversine_km(lat, lon, pharmacy.latitude, pharmacy.longitude), pharmacy, has_all)
+        for pharmacy, has_all in index.match_pharmacies(lat, lon, radius_km, limit, medications)
+    ]
+
+
+def test_cached_matches_equal_uncached(indexes):
+    rng = random.Random(7)
+    # A dense town: many pharmacies per match cache cell
+    for number in range(400):
+        stock = [medication for medication in ("amoxil", "coartem") if rng.random() < 0.5]
+        add_pharmacy(indexes, number, 9.0 + rng.uniform(-0.1, 0.1), 7.4 + rng.uniform(-0.1, 0.1), stock)
+
+    for _ in range(300):
+        lat, lon = 9.0 + rng.uniform(-0.05, 0.05), 7.4 + rng.uniform(-0.05, 0.05)
+        medications = rng.choice([None, ("amoxil",), ("amoxil", "coartem")])
+        radius_km, limit = rng.choice([(2, 5), (5, 10), (15, 10)])
+        expected = uncached(indexes, lat, lon, radius_km, limit, medications)
+        # Twice, so the second answer comes from the cache
+        for _ in range(2):
+            found = indexes.find_nearby_pharmacies(lat, lon, radius_km, limit, medications)
+            assert [match["pharmacy_id"] for match in found] == [match["pharmacy_id"] for match in expected]
+    assert indexes.match_cache.cache.stats()["hits"] >= 300
+
+
+def test_stock_change_reaches_cached_matches(indexes):
+    add_pharmacy(indexes, 1, 9.0, 7.4, [])
+    add_pharmacy(indexes, 2, 9.02, 7.42, ["amoxil"])
+    assert [match["pharmacy_id"] for match in indexes.find_nearby_pharmacies(9.0, 7.4, medications=["Amoxil"])] == ["ph2", "ph1"]
+
+    indexes.index_stock("ph1", "amoxil", True)
+    found = indexes.find_nearby_pharmacies(9.0, 7.4, medications=["Amoxil"])
+    assert [(match["pharmacy_id"], match["has_all_items"]) for match in found] == [("ph1", True), ("ph2", True)]
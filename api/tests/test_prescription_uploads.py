@@ -0,0 +1,130 @@
+import uuid
+import pytest
+from sqlalchemy import delete, insert, select, update
+import routes.order_route as order_route
+from database import AsyncSessionLocal
+from models.auth_model import User
+from models.order_model import Order, OrderStatus
+from models.prescription_model import PrescriptionBlob
+
+pytestmark = pytest.mark.anyio
+
+
+def document():
+    """PNG-looking bytes no other test has stored"""
+    return b"\x89PNG" + bytes(range(256)) * 40 + uuid.uuid4().bytes
+
+
+@pytest.fixture
+async def order(db, storage):
+    """A pending order, with prescription documents kept in temporary storage"""
+    user_id = uuid.uuid4()
+    order_pk = uuid.uuid4().hex
+    order_id = f"ORD_{order_pk[:12].upper()}"
+    await db.execute(insert(User).values(
+        id=user_id, fullname="Uploads", email=f"{user_id.hex}@example.com", password_hash="x"
+    ))
+    await db.execute(insert(Order).values(
+        id=order_pk, user_id=user_id, order_id=order_id,
+        status=OrderStatus.PENDING, delivery_address="1 Test Street"
+    ))
+    await db.commit()
+    yield order_id
+    await db.rollback()
+    result = await db.execute(select(Order.prescription_file_path).where(Order.id == order_pk))
+    storage_key = result.scalar_one()
+    await db.execute(delete(User).where(User.id == user_id))
+    await db.execute(delete(PrescriptionBlob).where(PrescriptionBlob.storage_key == storage_key))
+    await db.commit()
+
+
+async def start_upload(client, order_id, data):
+    """Start a resumable upload and send all of `data`; returns its URL"""
+    base = f"/api/v1/orders/{order_id}/prescription_uploads"
+    response = await client.post(base, json={"size": len(data), "content_type": "image/png"})
+    assert response.status_code == 201
+    upload_url = f"{base}/{response.json()['upload_id']}"
+    response = await client.patch(upload_url, content=data, headers={"Upload-Offset": "0"})
+    assert response.headers["Upload-Offset"] == str(len(data))
+    return upload_url
+
+
+async def current(db, order_id):
+    result = await db.execute(
+        select(Order.status, Order.version, Order.prescription_file_path).where(Order.order_id == order_id)
+    )
+    row = result.one()
+    await db.commit()
+    return row
+
+
+async def test_finalize_after_a_concurrent_change_keeps_the_upload(db, client, order, monkeypatch):
+    data = document()
+    upload_url = await start_upload(client, order, data)
+    load = order_route.load_order_for_prescription
+
+    async def load_then_change(db, order_id):
+        loaded = await load(db, order_id)
+        # Another request moves the order on before this one claims it
+        async with AsyncSessionLocal() as other:
+            await other.execute(
+                update(Order).where(Order.order_id == order_id).values(version=Order.version + 1)
+            )
+            await other.commit()
+        return loaded
+
+    monkeypatch.setattr(order_route, "load_order_for_prescription", load_then_change)
+    response = await client.post(f"{upload_url}/finalize")
+    assert response.status_code == 409
+    assert await current(db, order) == (OrderStatus.PENDING, 2, None)
+
+    # Refused before sealing, so the upload can still be finalized
+    monkeypatch.setattr(order_route, "load_order_for_prescription", load)
+    assert (await client.get(upload_url)).json()["offset"] == len(data)
+    response = await client.post(f"{upload_url}/finalize")
+    assert response.status_code == 202
+    status, version, storage_key = await current(db, order)
+    # Claimed, then pointed at the document
+    assert (status, version) == (OrderStatus.VERIFYING, 4)
+    assert storage_key is not None
+
+
+async def test_chunks_resume_from_the_server_offset(db, client, order, storage):
+    data = document()
+    base = f"/api/v1/orders/{order}/prescription_uploads"
+    response = await client.post(base, json={"size": len(data), "content_type": "image/png"})
+    assert response.headers["Upload-Offset"] == "0"
+    upload_url = response.headers["Location"]
+
+    response = await client.patch(upload_url, content=data[:4000], headers={"Upload-Offset": "0"})
+    assert (response.status_code, response.headers["Upload-Offset"]) == (204, "4000")
+    # The response was lost, so the client sends the same chunk again
+    response = await client.patch(upload_url, content=data[:4000], headers={"Upload-Offset": "0"})
+    assert (response.status_code, response.headers["Upload-Offset"]) == (409, "4000")
+
+    response = await client.get(upload_url)
+    assert (response.json()["offset"], response.headers["Upload-Length"]) == (4000, str(len(data)))
+    response = await client.post(f"{upload_url}/finalize")
+    assert (response.status_code, response.headers["Upload-Offset"]) == (409, "4000")
+    # Nothing past the declared size is accepted
+    response = await client.patch(upload_url, content=data[4000:] + b"xx", headers={"Upload-Offset": "4000"})
+    assert response.status_code == 413
+    assert (await client.get(upload_url)).json()["offset"] == 4000
+
+    response = await client.patch(upload_url, content=data[4000:], headers={"Upload-Offset": "4000"})
+    assert response.headers["Upload-Offset"] == str(len(data))
+    assert (await client.post(f"{upload_url}/finalize")).status_code == 202
+    status, _, storage_key = await current(db, order)
+    assert status == OrderStatus.VERIFYING
+    with open(storage.local_path(storage_key), "rb") as f:
+        assert f.read() == data
+    # The session is gone once finalized
+    assert (await client.post(f"{upload_url}/finalize")).status_code == 404
+
+
+async def test_uploads_larger_than_allowed_are_refused_up_front(client, order):
+    response = await client.post(
+        f"/api/v1/orders/{order}/prescription_uploads",
+        json={"size": order_route.MAX_FILE_SIZE + 1, "content_type": "image/png"}
+    )
+    assert response.status_code == 413
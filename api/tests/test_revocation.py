@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+import pytest
+from utils.revocation import BloomFilter, InMemoryRevocationBackend, RevocationStore
+
+pytestmark = pytest.mark.anyio
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = BloomFilter(10000, 0.01)
+    for i in range(10000):
+        bloom.add(f"revoked-{i}")
+    false_positives = sum(f"live-{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+async def test_revoke_and_check():
+    store = RevocationStore(InMemoryRevocationBackend())
+    assert not await store.is_revoked("a")
+    assert await store.revoke("a", time.time() + 60)
+    assert await store.is_revoked("a")
+    # Rotation relies on the second revoke of a refresh token failing
+    assert not await store.revoke("a", time.time() + 60)
+
+
+async def test_expired_tokens_are_not_stored():
+    store = RevocationStore(InMemoryRevocationBackend())
+    assert await store.revoke("old", time.time() - 1)
+    assert not await store.is_revoked("old")
+    assert len(store.backend) == 0
+
+
+async def test_compact_drops_expired_revocations():
+    store = RevocationStore(InMemoryRevocationBackend())
+    await store.revoke("short", time.time() + 0.05)
+    await store.revoke("long", time.time() + 60)
+    await asyncio.sleep(0.1)
+    store.compact()
+    assert len(store.backend) == 1
+    assert await store.is_revoked("long")
+    assert not await store.is_revoked("short")
+
+
+async def test_revocation_during_compaction_survives_the_swap():
+    store = RevocationStore(InMemoryRevocationBackend())
+    building, release = threading.Event(), threading.Event()
+    build = store._build_bloom
+
+    def slow_build(jtis):
+        building.set()
+        release.wait(5)
+        return build(jtis)
+
+    store._build_bloom = slow_build
+    compaction = asyncio.create_task(asyncio.to_thread(store.compact))
+    await asyncio.to_thread(building.wait, 5)
+    # Revoked after the backend was read for the new filter
+    await store.revoke("late", time.time() + 60)
+    release.set()
+    await compaction
+
+    assert "late" in store.bloom
+    assert await store.is_revoked("late")
+
+
+async def test_version_floor_revokes_older_tokens():
+    store = RevocationStore(InMemoryRevocationBackend())
+    await store.revoke_versions_below("user-1", 3, time.time() + 60)
+    assert await store.is_revoked("any", "user-1", 2)
+    assert not await store.is_revoked("any", "user-1", 3)
+    assert not await store.is_revoked("any", "user-2", 0)
+
+
+async def test_version_floor_only_rises_and_expires():
+    store = RevocationStore(InMemoryRevocationBackend())
+    await store.revoke_versions_below("user-1", 5, time.time() + 0.05)
+    await store.revoke_versions_below("user-1", 4, time.time() + 60)
+    assert await store.is_revoked("any", "user-1", 4)
+    await asyncio.sleep(0.1)
+    assert not await store.is_revoked("any", "user-1", 4)
+    store.compact()
+    assert await store.backend.version_floor("user-1") == 0
@@ -0,0 +1,83 @@
+import hashlib
+import pytest
+from fastapi import HTTPException
+from utils.storage import LocalStorageBackend, StorageBackend, no_chunks
+
+pytestmark = pytest.mark.anyio
+
+
+async def chunks(*parts, then=None):
+    for part in parts:
+        yield part
+    if then is not None:
+        raise then
+
+
+@pytest.fixture
+async def partial(tmp_path):
+    """Local storage holding an empty appendable object at 'partial/u1'"""
+    storage = LocalStorageBackend(str(tmp_path))
+    await storage.save_stream("partial/u1", no_chunks())
+    return storage
+
+
+async def test_appends_resume_from_the_stored_offset(partial):
+    assert await partial.append_stream("partial/u1", 0, chunks(b"abc", b"def")) == 6
+    assert await partial.append_stream("partial/u1", 6, chunks(b"gh")) == 8
+    assert await partial.size("partial/u1") == 8
+
+    with pytest.raises(HTTPException) as raised:
+        await partial.append_stream("partial/u1", 6, chunks(b"gh"))
+    assert raised.value.status_code == 409
+    assert raised.value.headers["Upload-Offset"] == "8"
+
+
+async def test_bytes_before_a_dropped_connection_are_kept(partial):
+    with pytest.raises(ConnectionResetError):
+        await partial.append_stream("partial/u1", 0, chunks(b"abc", b"def", then=ConnectionResetError()))
+    assert await partial.size("partial/u1") == 6
+    assert await partial.append_stream("partial/u1", 6, chunks(b"ghi")) == 9
+
+
+async def test_oversized_append_is_rolled_back_to_its_offset(partial):
+    await partial.append_stream("partial/u1", 0, chunks(b"abcd"), max_size=8)
+    with pytest.raises(HTTPException) as raised:
+        await partial.append_stream("partial/u1", 4, chunks(b"ef", b"ghi"), max_size=8)
+    assert raised.value.status_code == 413
+    assert await partial.size("partial/u1") == 4
+
+
+async def test_one_writer_at_a_time(partial):
+    async def second_writer():
+        yield b"abc"
+        with pytest.raises(HTTPException) as raised:
+            await partial.append_stream("partial/u1", 0, chunks(b"xyz"))
+        assert raised.value.status_code == 409
+        yield b"def"
+
+    assert await partial.append_stream("partial/u1", 0, second_writer()) == 6
+
+
+async def test_sealed_uploads_take_no_more_bytes(partial):
+    await partial.append_stream("partial/u1", 0, chunks(b"prescription"))
+    stored = await partial.seal("partial/u1", "staging/s1")
+    assert (stored.key, stored.size, stored.sha256) == ("staging/s1", 12, hashlib.sha256(b"prescription").hexdigest())
+    with open(partial.local_path("staging/s1"), "rb") as f:
+        assert f.read() == b"prescription"
+    with pytest.raises(FileNotFoundError):
+        await partial.append_stream("partial/u1", 12, chunks(b"more"))
+
+
+def test_keys_cannot_leave_the_root(tmp_path):
+    with pytest.raises(ValueError):
+        LocalStorageBackend(str(tmp_path)).local_path("../outside")
+
+
+
+def test_backends_implement_every_operation():
+    class Incomplete(StorageBackend):
+        async def save_stream(self, key, chunks, max_size=0):
+            ...
+
+    with pytest.raises(TypeError):
+        Incomplete()
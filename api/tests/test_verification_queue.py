@@ -0,0 +1,98 @@
+import uuid
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import delete, insert, select
+import utils.verification_queue as verification_queue
+from models.auth_model import User
+from models.order_model import Order, OrderStatus, PrescriptionStatus
+from models.outbox_model import OutboxEvent
+from models.prescription_model import PrescriptionBlob, VerificationJob, VerificationJobStatus
+from utils.blob_store import blob_key
+from utils.order_events import ORDER_VERIFICATION_FAILED
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def job(db):
+    """A claimed verification job, on its last attempt, for an order waiting on its document"""
+    user_id = uuid.uuid4()
+    order_pk = uuid.uuid4().hex
+    sha256 = uuid.uuid4().hex * 2
+    await db.execute(insert(User).values(
+        id=user_id, fullname="Verification", email=f"{user_id.hex}@example.com", password_hash="x"
+    ))
+    await db.execute(insert(PrescriptionBlob).values(
+        sha256=sha256, storage_key=blob_key(sha256), size=1, ref_count=1
+    ))
+    await db.execute(insert(Order).values(
+        id=order_pk, user_id=user_id, order_id=f"ORD_{order_pk[:12].upper()}",
+        status=OrderStatus.VERIFYING, delivery_address="1 Test Street",
+        prescription_file_path=blob_key(sha256)
+    ))
+    result = await db.execute(
+        insert(VerificationJob)
+        .values(order_id=order_pk, blob_sha256=sha256, status=VerificationJobStatus.RUNNING,
+                attempts=verification_queue.VERIFICATION_MAX_ATTEMPTS)
+        .returning(VerificationJob.id)
+    )
+    job_id = result.scalar_one()
+    await db.commit()
+    yield SimpleNamespace(
+        id=job_id, order_id=order_pk, blob_sha256=sha256, attempts=verification_queue.VERIFICATION_MAX_ATTEMPTS
+    )
+    await db.rollback()
+    await db.execute(delete(OutboxEvent).where(OutboxEvent.aggregate_id == f"ORD_{order_pk[:12].upper()}"))
+    await db.execute(delete(User).where(User.id == user_id))
+    await db.execute(delete(PrescriptionBlob).where(PrescriptionBlob.sha256 == sha256))
+    await db.commit()
+
+
+async def order_state(db, job):
+    result = await db.execute(
+        select(Order.status, Order.prescription_status, Order.rejection_reason, Order.order_id)
+        .where(Order.id == job.order_id)
+    )
+    order = result.one()
+    events = await db.execute(
+        select(OutboxEvent.event_type).where(OutboxEvent.aggregate_id == order.order_id)
+    )
+    status = await db.execute(select(VerificationJob.status).where(VerificationJob.id == job.id))
+    state = order, events.scalars().all(), status.scalar_one()
+    await db.commit()
+    return state
+
+
+async def test_last_failed_attempt_releases_the_order(db, job):
+    await verification_queue.retry_or_fail_job(job, "analysis crashed")
+
+    order, events, status = await order_state(db, job)
+    assert status == VerificationJobStatus.FAILED
+    assert order.status == OrderStatus.REJECTED
+    assert order.prescription_status == PrescriptionStatus.PENDING
+    assert order.rejection_reason == verification_queue.VERIFICATION_FAILED_REASON
+    # The customer hears about it through the outbox, committed with the change
+    assert events == [ORDER_VERIFICATION_FAILED]
+
+
+async def test_earlier_failures_are_retried(db, job):
+    job.attempts = 1
+    await verification_queue.retry_or_fail_job(job, "analysis crashed")
+
+    order, events, status = await order_state(db, job)
+    assert status == VerificationJobStatus.QUEUED
+    assert order.status == OrderStatus.VERIFYING
+    assert events == []
+
+
+async def test_a_newer_document_is_left_alone(db, job):
+    await db.execute(
+        Order.__table__.update().where(Order.id == job.order_id).values(prescription_file_path="blobs/newer")
+    )
+    await db.commit()
+    await verification_queue.retry_or_fail_job(job, "analysis crashed")
+
+    order, events, status = await order_state(db, job)
+    assert status == VerificationJobStatus.FAILED
+    assert order.status == OrderStatus.VERIFYING
+    assert events == []
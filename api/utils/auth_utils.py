@@ -1,27 +1,56 @@
+import asyncio
+import logging
 import os
+import time
+import uuid
+import hashlib
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Optional
 import jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, event, inspect
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
-from models.auth_model import User
+from models.auth_model import User, UserRole
+from schemas.auth_schema import UserResponse
+from utils.ttl_cache import TTLCache
+from utils.revocation import revocation_store
 from dotenv import load_dotenv
 load_dotenv()
-import bcrypt
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = os.getenv("JWT_ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
-REFRESH_TOKEN_EXPIRE_DAYS = os.getenv("REFRESH_TOKEN_EXPIRE_DAYS")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES") or 30)
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS") or 7)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", 300))
 
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt(rounds=int(os.getenv("BCRYPT_ROUNDS", 4)))
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+logger = logging.getLogger(__name__)
 
 
-def verify_password(password: str, password_hash: str) -> bool:
-    """Verify a password against its hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Authenticated caller as described by the token claims, without loading the User row"""
+    user_id: uuid.UUID
+    role: UserRole
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user_id=user.id, role=user.role, token_version=user.token_version)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "Principal":
+        return cls(
+            user_id=uuid.UUID(payload["sub"]),
+            role=UserRole(payload["role"]),
+            token_version=int(payload["tv"])
+        )
+
+    def claims(self) -> dict:
+        return {"sub": str(self.user_id), "role": self.role.value, "tv": self.token_version}
+
 
 def create_token(data: dict, expires_delta: timedelta = None) -> str:
     """Create a JWT token"""
@@ -30,21 +59,31 @@ def create_token(data: dict, expires_delta: timedelta = None) -> str:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def get_current_user(token: str, db: Session) -> User:
-    """Get current user from JWT token"""
+def create_access_token(principal: Principal) -> str:
+    """Create an access token carrying the user id, role and token version"""
+    return create_token(
+        data={**principal.claims(), "type": "access"},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+
+def create_refresh_token(principal: Principal) -> str:
+    """Create a refresh token carrying the same claims as the access token"""
+    return create_token(
+        data={**principal.claims(), "type": "refresh"},
+        expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+    """Verify a JWT and check its type, raising 401 on any failure"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials"
-            )
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,11 +94,193 @@ def get_current_user(token: str, db: Session) -> User:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
         )
-    
-    user = db.query(User).filter(User.id == user_id).first()
+
+    if payload.get("type", "access") != token_type:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type"
+        )
+    return payload
+
+
+@dataclass(slots=True)
+class CachedToken:
+    """Verified token payload plus what has been resolved from it so far"""
+    payload: dict
+    principal: Principal
+    profile: Optional[UserResponse] = None
+
+
+# Decoded tokens keyed on the token's SHA-256 digest, so repeat calls skip signature checks.
+# Per process: another worker's cached profile snapshot can be up to TOKEN_CACHE_TTL_SECONDS
+# stale. Revocation never relies on it; token_version bumps go through the revocation store.
+token_cache = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_tokens(user_id: uuid.UUID):
+    """Drop this process's cached tokens and profile snapshots for a user"""
+    token_cache.pop_where(lambda entry: entry.principal.user_id == user_id)
+
+
+async def revoke_older_tokens(user_id: uuid.UUID, token_version: int):
+    """
+    Revoke a user's tokens from before `token_version` on every worker, for as
+    long as the longest-lived of them could still be valid. Call after the
+    bumped token_version has committed.
+    """
+    invalidate_user_tokens(user_id)
+    await revocation_store.revoke_versions_below(
+        str(user_id),
+        token_version,
+        time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 86400
+    )
+
+
+async def resolve_token(token: str, token_type: str = "access") -> CachedToken:
+    """Verify a token (or find it already verified in the cache)"""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    entry = token_cache.get(key)
+    if entry is None:
+        payload = decode_token(token, token_type)
+        try:
+            entry = CachedToken(payload=payload, principal=Principal.from_payload(payload))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials"
+            )
+        # Never cache past the token's own expiry
+        token_cache.set(key, entry, ttl=payload["exp"] - time.time())
+    elif entry.payload.get("type", "access") != token_type:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type"
+        )
+
+    if await revocation_store.is_revoked(
+        entry.payload.get("jti", ""),
+        str(entry.principal.user_id),
+        entry.principal.token_version
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
+    return entry
+
+
+async def revoke_token(entry: CachedToken) -> bool:
+    """Revoke a verified token until it expires; False if it was already revoked"""
+    return await revocation_store.revoke(entry.payload.get("jti", ""), entry.payload["exp"])
+
+
+async def get_current_principal(token: str, token_type: str = "access") -> Principal:
+    """Get the caller from the JWT claims alone (no database access)"""
+    return (await resolve_token(token, token_type)).principal
+
+
+async def get_current_profile(token: str, db: AsyncSession, updated_at: Optional[datetime] = None) -> UserResponse:
+    """
+    Get the caller's public profile, served from the token cache when possible.
+    Callers that have read the user's current updated_at pass it, so a cached
+    snapshot from another version of the user is reloaded rather than served.
+    """
+    entry = await resolve_token(token)
+    if entry.profile is None or (updated_at is not None and entry.profile.updated_at != updated_at):
+        entry.profile = UserResponse.model_validate(await load_user(entry.principal, db))
+    return entry.profile
+
+
+async def get_current_user(token: str, db: AsyncSession) -> User:
+    """Get current user from JWT token, loading the full User row"""
+    return await load_user(await get_current_principal(token), db)
+
+
+async def bump_token_version(db: AsyncSession, user_id: uuid.UUID, **values) -> int:
+    """
+    Increment a user's token_version in the database (with any other `values`)
+    and return the new version; the caller commits, then calls revoke_older_tokens.
+    """
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1, **values)
+        .returning(User.token_version)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one()
+
+
+async def load_user(principal: Principal, db: AsyncSession) -> User:
+    """Load the User row behind a principal, rejecting tokens from an older token version"""
+    result = await db.execute(select(User).where(User.id == principal.user_id))
+    user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    return user
\ No newline at end of file
+    if user.token_version != principal.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
+    return user
+
+
+@event.listens_for(User, "before_update")
+def _retire_tokens_on_role_change(mapper, connection, target):
+    # The role is signed into tokens, so tokens carrying the old one must stop working.
+    # Bumped in the UPDATE itself, like bump_token_version, so concurrent bumps cannot collide.
+    if inspect(target).attrs.role.history.has_changes():
+        target.token_version = User.token_version + 1
+        object_session(target).info.setdefault("retired_users", {})[target.id] = None
+
+
+@event.listens_for(User, "after_update")
+def _queue_token_invalidation(mapper, connection, target):
+    session = object_session(target)
+    session.info.setdefault("invalidated_users", set()).add(target.id)
+    retired = session.info.get("retired_users", {})
+    if target.id in retired:
+        retired[target.id] = connection.execute(
+            select(User.token_version).where(User.id == target.id)
+        ).scalar_one()
+
+
+def _revoke_in_background(user_id: uuid.UUID, token_version: int):
+    """Raise the revocation floor from a sync hook, on the running loop if there is one"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # A sync session outside the app, e.g. an admin script
+        asyncio.run(revoke_older_tokens(user_id, token_version))
+        return
+    task = loop.create_task(revoke_older_tokens(user_id, token_version))
+    _revocations.add(task)
+    task.add_done_callback(_finish_revocation)
+
+
+def _finish_revocation(task: asyncio.Task):
+    _revocations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Could not revoke tokens after a role change", exc_info=task.exception())
+
+
+# Revocations scheduled by _revoke_in_background, kept referenced until they finish
+_revocations = set()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_token_invalidation(session):
+    for user_id in session.info.pop("invalidated_users", set()):
+        invalidate_user_tokens(user_id)
+    for user_id, token_version in session.info.pop("retired_users", {}).items():
+        if token_version is not None:
+            _revoke_in_background(user_id, token_version)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_token_invalidation(session, previous_transaction):
+    session.info.pop("invalidated_users", None)
+    session.info.pop("retired_users", None)
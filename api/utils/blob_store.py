@@ -0,0 +1,159 @@
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from typing import Optional
+from fastapi import UploadFile
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.prescription_model import PrescriptionBlob
+from utils.storage import get_storage, StoredFile
+from utils.derivatives import all_derivative_keys
+from dotenv import load_dotenv
+load_dotenv()
+
+BLOB_PREFIX = "blobs"
+STAGING_PREFIX = "staging"
+# Unreferenced blobs are kept this long before being purged, so a retry can still reuse them
+BLOB_GC_GRACE_SECONDS = float(os.getenv("BLOB_GC_GRACE_SECONDS", 86400))
+BLOB_GC_BATCH_SIZE = int(os.getenv("BLOB_GC_BATCH_SIZE", 100))
+
+
+def blob_key(sha256: str) -> str:
+    """Storage key for a document with the given content hash"""
+    return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def blob_sha256(key: Optional[str]) -> Optional[str]:
+    """Content hash behind a blob key, or None for files stored before the blob store existed"""
+    if not key or not key.startswith(BLOB_PREFIX + "/"):
+        return None
+    return key.rsplit("/", 1)[-1]
+
+
+async def store_blob(db: AsyncSession, upload: UploadFile) -> PrescriptionBlob:
+    """Stream an upload into the blob store and take a reference on it; the caller commits"""
+    staged = await get_storage().save_upload(f"{STAGING_PREFIX}/{uuid.uuid4().hex}", upload)
+    return await register_blob(db, staged, upload.content_type)
+
+
+async def register_blob(db: AsyncSession, staged: StoredFile, content_type: Optional[str]) -> PrescriptionBlob:
+    """
+    Take a reference on the blob for a fully written staged file and move it into place.
+    The row is upserted (and so locked) before the file is moved, so a concurrent
+    purge of the same blob either finishes first or skips it.
+    """
+    storage = get_storage()
+    try:
+        key = blob_key(staged.sha256)
+        stmt = (
+            insert(PrescriptionBlob)
+            .values(
+                sha256=staged.sha256,
+                storage_key=key,
+                size=staged.size,
+                content_type=content_type,
+                ref_count=1
+            )
+            .on_conflict_do_update(
+                index_elements=[PrescriptionBlob.sha256],
+                set_={"ref_count": PrescriptionBlob.ref_count + 1, "updated_at": func.now()}
+            )
+            .returning(PrescriptionBlob)
+        )
+        result = await db.execute(stmt, execution_options={"populate_existing": True})
+        blob = result.scalar_one()
+        # Same bytes, same key: replacing an existing copy is harmless
+        await storage.move(staged.key, key)
+    except BaseException:
+        await storage.delete(staged.key)
+        raise
+    return blob
+
+
+async def release_blob(db: AsyncSession, key: Optional[str]):
+    """Drop an order's reference on the blob at `key`; the caller commits"""
+    sha256 = blob_sha256(key)
+    if sha256 is None:
+        return
+    await db.execute(
+        update(PrescriptionBlob)
+        .where(PrescriptionBlob.sha256 == sha256, PrescriptionBlob.ref_count > 0)
+        .values(ref_count=PrescriptionBlob.ref_count - 1, updated_at=func.now())
+    )
+
+
+async def record_verification(db: AsyncSession, sha256: str, result: dict):
+    """Cache a verification outcome against the document's content hash; the caller commits"""
+    await db.execute(
+        update(PrescriptionBlob)
+        .where(PrescriptionBlob.sha256 == sha256)
+        .values(verification_result=result, verified_at=func.now())
+    )
+
+
+async def record_derivatives(db: AsyncSession, sha256: str, derivatives: dict):
+    """Remember a document's rendered image and thumbnails; the caller commits"""
+    await db.execute(
+        update(PrescriptionBlob)
+        .where(PrescriptionBlob.sha256 == sha256)
+        .values(derivatives=derivatives)
+    )
+
+
+async def purge_unreferenced_blobs(db: AsyncSession, grace_seconds: float = BLOB_GC_GRACE_SECONDS) -> int:
+    """Delete blobs no order has referenced for `grace_seconds`, files first; returns how many were purged"""
+    result = await db.execute(
+        select(PrescriptionBlob.sha256, PrescriptionBlob.storage_key, PrescriptionBlob.derivatives)
+        .where(
+            PrescriptionBlob.ref_count == 0,
+            PrescriptionBlob.updated_at < func.now() - timedelta(seconds=grace_seconds)
+        )
+        .limit(BLOB_GC_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if not rows:
+        await db.commit()
+        return 0
+
+    storage = get_storage()
+    for row in rows:
+        for key in [row.storage_key, *all_derivative_keys(row.derivatives)]:
+            await storage.delete(key)
+    await db.execute(delete(PrescriptionBlob).where(PrescriptionBlob.sha256.in_([row.sha256 for row in rows])))
+    await db.commit()
+    return len(rows)
+
+
+async def sweep_orphaned_files(db: AsyncSession, grace_seconds: float = BLOB_GC_GRACE_SECONDS) -> int:
+    """
+    Delete stored files that no prescription_blobs row accounts for: blobs moved
+    into place by a transaction that then rolled back (the row went with it),
+    their derivatives, and staged files left by requests that died. Only files
+    untouched for `grace_seconds` are considered, so uploads in flight are left
+    alone. Returns how many files were deleted.
+    """
+    storage = get_storage()
+    cutoff = time.time() - grace_seconds
+    deleted = 0
+    for key in await storage.list_stale(STAGING_PREFIX, cutoff):
+        deleted += await storage.delete_if_stale(key, cutoff)
+
+    # Blob files and their derivatives are named <sha256>[.<suffix>]
+    files = defaultdict(list)
+    for key in await storage.list_stale(BLOB_PREFIX, cutoff):
+        files[key.rsplit("/", 1)[-1].split(".", 1)[0]].append(key)
+    hashes = list(files)
+    for start in range(0, len(hashes), BLOB_GC_BATCH_SIZE):
+        batch = hashes[start:start + BLOB_GC_BATCH_SIZE]
+        result = await db.execute(select(PrescriptionBlob.sha256).where(PrescriptionBlob.sha256.in_(batch)))
+        known = set(result.scalars())
+        await db.commit()
+        for sha256 in batch:
+            if sha256 not in known:
+                for key in files[sha256]:
+                    deleted += await storage.delete_if_stale(key, cutoff)
+    return deleted
@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event, exc
+
+logger = logging.getLogger(__name__)
+
+SLOW_CHECKOUT_MS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_MS", 100))
+
+# Upper bounds (ms) of the checkout wait-time histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """Checkout counters and wait-time histogram for one connection pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_count = 0
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+
+    def observe_wait(self, wait_ms: float):
+        with self._lock:
+            self.wait_buckets[bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.wait_count += 1
+            self.wait_sum_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+        if wait_ms >= SLOW_CHECKOUT_MS:
+            logger.warning("Slow %s pool checkout: waited %.1f ms (%s)", self.name, wait_ms, self.format_counts())
+
+    def attach(self, engine):
+        """Record pool events for a sync Engine (use AsyncEngine.sync_engine for async engines)"""
+        self.pool = engine.pool
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            self.connects += 1
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self.checkouts += 1
+
+        @event.listens_for(engine, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            self.invalidations += 1
+
+        @event.listens_for(engine, "engine_disposed")
+        def on_disposed(engine):
+            self.pool = engine.pool
+
+    def counts(self) -> dict:
+        pool = self.pool
+        if pool is None:
+            # Engine not created yet
+            return {"size": 0, "checked_out": 0, "idle": 0, "overflow": 0}
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        }
+
+    def format_counts(self) -> str:
+        return " ".join(f"{key}={value}" for key, value in self.counts().items())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, histogram = 0, {}
+            for bound, count in zip(WAIT_BUCKETS_MS + ("+Inf",), self.wait_buckets):
+                cumulative += count
+                histogram[f"le_{bound}ms" if bound != "+Inf" else "le_inf"] = cumulative
+            wait = {
+                "count": self.wait_count,
+                "avg_ms": round(self.wait_sum_ms / self.wait_count, 3) if self.wait_count else 0.0,
+                "max_ms": round(self.wait_max_ms, 3),
+                "histogram": histogram,
+            }
+        return {
+            **self.counts(),
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "checkout_wait": wait,
+        }
+
+
+def timed_pool_class(base, metrics: PoolMetrics):
+    """
+    Subclass a QueuePool so the time spent waiting for a connection is recorded.
+    Pool events only fire once a connection has been handed out, so the wait
+    itself is measured around the pool's internal get.
+    """
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return base._do_get(self)
+        except exc.TimeoutError:
+            metrics.checkout_timeouts += 1
+            raise
+        finally:
+            metrics.observe_wait((time.perf_counter() - started) * 1000)
+
+    return type(f"Timed{base.__name__}", (base,), {"_do_get": _do_get})
+
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+
+def pool_snapshot() -> dict:
+    return {
+        "sync": sync_pool_metrics.snapshot(),
+        "async": async_pool_metrics.snapshot(),
+    }
+
+
+def log_pool_counts():
+    for metrics in (sync_pool_metrics, async_pool_metrics):
+        logger.info("DB pool %s: %s", metrics.name, metrics.format_counts())
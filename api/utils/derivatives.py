@@ -0,0 +1,83 @@
+import logging
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from models.prescription_model import PrescriptionBlob
+from utils.doc_analysis import analysis_pool, open_document_image, sniff_content_type
+from utils.storage import get_storage
+from dotenv import load_dotenv
+load_dotenv()
+
+# Normalised copy served instead of the original upload (longest side, pixels)
+PRESCRIPTION_IMAGE_MAX_DIMENSION = int(os.getenv("PRESCRIPTION_IMAGE_MAX_DIMENSION", 2048))
+PRESCRIPTION_THUMBNAIL_SIZES = [
+    int(size) for size in os.getenv("PRESCRIPTION_THUMBNAIL_SIZES", "160,480").split(",") if size.strip()
+]
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 85))
+
+logger = logging.getLogger(__name__)
+
+
+def derivative_keys(storage_key: str) -> dict:
+    """Keys of a document's normalised image and thumbnails, stored beside the original"""
+    return {
+        "image": f"{storage_key}.jpg",
+        "thumbnails": {str(size): f"{storage_key}.{size}.jpg" for size in PRESCRIPTION_THUMBNAIL_SIZES},
+    }
+
+
+def all_derivative_keys(derivatives: Optional[dict]) -> list[str]:
+    if not derivatives:
+        return []
+    return [derivatives["image"], *derivatives["thumbnails"].values()]
+
+
+def render_derivatives(src_path: str, outputs: list[tuple[str, int]]) -> bool:
+    """
+    Write a JPEG of the document to each (path, max_dimension) in `outputs`.
+    Decodes once and shrinks step by step from the largest output down. Runs in
+    the analysis pool; returns False when the document has no picture to render.
+    """
+    with open(src_path, "rb") as f:
+        content_type = sniff_content_type(f.read(16))
+    if content_type is None:
+        return False
+
+    outputs = sorted(outputs, key=lambda output: output[1], reverse=True)
+    image = open_document_image(src_path, content_type, outputs[0][1])
+    if image is None:
+        return False
+
+    image = image.convert("RGB")
+    for path, max_dimension in outputs:
+        image.thumbnail((max_dimension, max_dimension))
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".render-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return True
+
+
+async def create_derivatives(blob: PrescriptionBlob) -> dict:
+    """
+    Render a blob's normalised image and thumbnails on the analysis pool.
+    Returns their keys, or {} when the document cannot be pictured (text-only PDF, corrupt file).
+    """
+    storage = get_storage()
+    keys = derivative_keys(blob.storage_key)
+    outputs = [(storage.local_path(keys["image"]), PRESCRIPTION_IMAGE_MAX_DIMENSION)] + [
+        (storage.local_path(key), int(size)) for size, key in keys["thumbnails"].items()
+    ]
+    try:
+        rendered = await analysis_pool.run(render_derivatives, storage.local_path(blob.storage_key), outputs)
+    except BrokenProcessPool:
+        raise
+    except Exception:
+        logger.exception("Could not render derivatives of blob %s", blob.sha256)
+        return {}
+    return keys if rendered else {}
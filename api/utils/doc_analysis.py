@@ -0,0 +1,227 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from PIL import Image, ImageOps
+from pypdf import PdfReader
+from dotenv import load_dotenv
+load_dotenv()
+
+# Worker processes decoding documents; 0 analyses on a thread of the calling process instead
+DOC_ANALYSIS_WORKERS = int(os.getenv("DOC_ANALYSIS_WORKERS") or os.cpu_count() or 1)
+# Images are downscaled to fit this many pixels on their longest side before text extraction
+DOC_ANALYSIS_MAX_DIMENSION = int(os.getenv("DOC_ANALYSIS_MAX_DIMENSION", 2000))
+DOC_ANALYSIS_MAX_PDF_PAGES = int(os.getenv("DOC_ANALYSIS_MAX_PDF_PAGES", 5))
+# "none", "tesseract" (needs pytesseract and the tesseract binary), or "package.module:function"
+# taking a PIL image and returning its text
+DOC_TEXT_EXTRACTOR = os.getenv("DOC_TEXT_EXTRACTOR", "none")
+
+MAGIC_NUMBERS = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"%PDF-", "application/pdf"),
+)
+
+# A name stays on its line, so "Dr. Ada Obi\nDate: ..." does not pick up "Date"
+DOCTOR_PATTERN = re.compile(r"\bDr\.?[ \t]+([A-Z][\w.'-]*(?:[ \t]+[A-Z][\w.'-]*){0,2})")
+DATE_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4})\b")
+DOSE_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\s?(?:mg|mcg|g|ml|iu|units?)\b", re.IGNORECASE)
+
+
+class DocumentError(Exception):
+    """The document cannot be read; verification rejects it"""
+
+
+class TextExtractionError(Exception):
+    """The text extractor failed; verification is retried rather than the document rejected"""
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Content type from a file's leading bytes, or None if it is not a supported format"""
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    return None
+
+
+def no_text(image: Image.Image) -> str:
+    return ""
+
+
+def tesseract_text(image: Image.Image) -> str:
+    import pytesseract
+
+    return pytesseract.image_to_string(image)
+
+
+TEXT_EXTRACTORS = {"none": no_text, "tesseract": tesseract_text}
+
+# Resolved once per process, workers included
+_text_extractor = None
+
+
+def get_text_extractor():
+    global _text_extractor
+    if _text_extractor is None:
+        if DOC_TEXT_EXTRACTOR in TEXT_EXTRACTORS:
+            _text_extractor = TEXT_EXTRACTORS[DOC_TEXT_EXTRACTOR]
+        else:
+            module, _, name = DOC_TEXT_EXTRACTOR.partition(":")
+            _text_extractor = getattr(importlib.import_module(module), name)
+    return _text_extractor
+
+
+def extract_text(image: Image.Image) -> str:
+    try:
+        return get_text_extractor()(image) or ""
+    except Exception as e:
+        raise TextExtractionError(f"Text extraction failed: {e}")
+
+
+def prepare_image(image: Image.Image) -> Image.Image:
+    """Upright, greyscale and no larger than DOC_ANALYSIS_MAX_DIMENSION, which is all OCR needs"""
+    image = ImageOps.exif_transpose(image).convert("L")
+    image.thumbnail((DOC_ANALYSIS_MAX_DIMENSION, DOC_ANALYSIS_MAX_DIMENSION))
+    return image
+
+
+def analyze_image(path: str, content_type: str):
+    with Image.open(path) as image:
+        width, height = image.size
+        if content_type == "image/jpeg":
+            # Let the JPEG decoder skip detail the downscale would throw away anyway
+            image.draft("L", (DOC_ANALYSIS_MAX_DIMENSION, DOC_ANALYSIS_MAX_DIMENSION))
+        prepared = prepare_image(image)
+    return {"width": width, "height": height, "page_count": 1}, [extract_text(prepared)]
+
+
+def page_scan(page) -> Image.Image:
+    """Largest image embedded in a PDF page, which for a scanned document is the page itself"""
+    return max(page.images, key=lambda image: len(image.data)).image
+
+
+def open_document_image(path: str, content_type: str, max_dimension: int) -> Optional[Image.Image]:
+    """
+    Decoded, upright picture of a document (the first page of a PDF), or None for a PDF without one.
+    JPEGs are decoded at reduced scale when that still covers `max_dimension`.
+    """
+    if content_type == "application/pdf":
+        reader = PdfReader(path)
+        if reader.is_encrypted or not reader.pages or not reader.pages[0].images:
+            return None
+        image = page_scan(reader.pages[0])
+    else:
+        image = Image.open(path)
+        if content_type == "image/jpeg":
+            image.draft("RGB", (max_dimension, max_dimension))
+    return ImageOps.exif_transpose(image)
+
+
+def analyze_pdf(path: str):
+    reader = PdfReader(path)
+    if reader.is_encrypted:
+        raise DocumentError("PDF is password protected")
+
+    texts = []
+    for page in reader.pages[:DOC_ANALYSIS_MAX_PDF_PAGES]:
+        text = page.extract_text() or ""
+        if not text.strip() and page.images:
+            # Scanned page: read the page image instead
+            text = extract_text(prepare_image(page_scan(page)))
+        texts.append(text)
+    return {"page_count": len(reader.pages)}, texts
+
+
+def extract_fields(text: str) -> dict:
+    """Prescription details found in extracted text"""
+    doctor = DOCTOR_PATTERN.search(text)
+    date = DATE_PATTERN.search(text)
+    return {
+        "doctor_name": f"Dr. {doctor.group(1)}" if doctor else None,
+        "prescription_date": date.group(1) if date else None,
+        "medications_found": [
+            line.strip()[:100] for line in text.splitlines() if DOSE_PATTERN.search(line)
+        ],
+        "text_length": len(text),
+    }
+
+
+def analyze_document(path: str) -> dict:
+    """
+    Identify a document by its content and extract what it says.
+    Runs in the analysis pool, so it takes a path and returns plain data.
+    """
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        content_type = sniff_content_type(f.read(16))
+    if content_type is None:
+        return {"detected_type": None, "error": "Unrecognised file format"}
+
+    try:
+        if content_type == "application/pdf":
+            details, texts = analyze_pdf(path)
+        else:
+            details, texts = analyze_image(path, content_type)
+    except TextExtractionError:
+        raise
+    except Exception as e:
+        # Truncated, corrupt or decompression-bomb files
+        return {"detected_type": content_type, "error": f"Unreadable document: {e}"}
+
+    return {
+        "detected_type": content_type,
+        **details,
+        "extracted_data": extract_fields("\n".join(texts)),
+        "analysis_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+class DocumentAnalysisPool:
+    """Process pool running analyze_document, so decoding uses every core instead of the event loop's"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None and self.workers > 0:
+            # spawn: forking a process that already runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def analyze(self, path: str) -> dict:
+        return await self.run(analyze_document, path)
+
+    async def run(self, fn, *args):
+        """Run any module-level function on the pool"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            # A crashed worker poisons the whole executor; start a fresh one next time
+            self.shutdown()
+            raise
+
+    def analyze_batch(self, paths: list[str]) -> list[dict]:
+        """Analyse many documents at once, spread across the workers"""
+        executor = self._get_executor()
+        if executor is None:
+            return [analyze_document(path) for path in paths]
+        chunksize = max(1, len(paths) // (self.workers * 4))
+        return list(executor.map(analyze_document, paths, chunksize=chunksize))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+analysis_pool = DocumentAnalysisPool(DOC_ANALYSIS_WORKERS)
@@ -1,71 +1,62 @@
-from fastapi import UploadFile
-from datetime import datetime
 from schemas.order_schema import *
+from utils.doc_analysis import analysis_pool
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.pharmacy_index import find_nearby_pharmacies
+from utils.notifications import enqueue_pharmacy_notifications
 
 
-async def verify_prescription_document(file: UploadFile) -> dict:
+async def verify_prescription_document(file_path: str, content_type: str) -> dict:
     """
-    Verify prescription document using ML/AI or manual review
-    Returns validation result with status and details
+    Verify a stored prescription document
+    The file type is taken from the file's content; the client-declared content_type is only recorded.
+    Returns validation result with status and details (JSON-serializable, it is cached per document)
     """
-    # Implement your document verification logic here
-    # This could involve:
-    # - File type validation
-    # - OCR to extract text
-    # - AI model to verify prescription authenticity
-    # - Check for required fields (doctor signature, date, etc.)
-    
     allowed_types = ["image/jpeg", "image/png", "application/pdf"]
-    if file.content_type not in allowed_types:
+    analysis = await analysis_pool.analyze(file_path)
+    
+    if analysis["detected_type"] not in allowed_types:
         return {
             "valid": False,
             "reason": "Invalid file type. Only JPEG, PNG, and PDF allowed"
         }
+    if analysis.get("error"):
+        return {
+            "valid": False,
+            "reason": analysis["error"]
+        }
     
-    # Placeholder for actual verification
-    # You would integrate with services like:
-    # - Google Vision API
-    # - AWS Textract
-    # - Custom ML model
+    # Authenticity checks (doctor signature, registration number, etc.) would go here,
+    # working from the extracted text
     
     return {
         "valid": True,
-        "extracted_data": {
-            "doctor_name": "Dr. Sample",
-            "prescription_date": datetime.now().isoformat(),
-            "medications_found": ["Medication A", "Medication B"]
-        }
+        "document": {
+            "detected_type": analysis["detected_type"],
+            "declared_type": content_type,
+            "page_count": analysis["page_count"],
+            "width": analysis.get("width"),
+            "height": analysis.get("height"),
+        },
+        "extracted_data": analysis["extracted_data"]
     }
 
-async def find_matching_pharmacies(medications: list[MedicationItem], location: str) -> list[dict]:
+async def find_matching_pharmacies(medications: list[MedicationItem], latitude: Optional[float], longitude: Optional[float]) -> list[dict]:
     """
-    Find pharmacies that have the required medications in stock
+    Find the pharmacies nearest to the delivery location, those stocking every item first
+    Served from the in-memory spatial and inventory indexes
     """
-    # Implement pharmacy matching logic
-    # Query database for pharmacies in the area with stock
-    
-    pharmacies = [
-        {
-            "pharmacy_id": "ph_001",
-            "name": "City Pharmacy",
-            "distance_km": 2.5,
-            "has_all_items": True
-        },
-        {
-            "pharmacy_id": "ph_002", 
-            "name": "MedPlus Store",
-            "distance_km": 3.1,
-            "has_all_items": True
-        }
-    ]
-    
-    return pharmacies
+    if latitude is None or longitude is None:
+        # The delivery address could not be placed on the map
+        return []
+    return find_nearby_pharmacies(
+        latitude,
+        longitude,
+        medications=[medication.medication_name for medication in medications]
+    )
 
-async def notify_pharmacies(order_id: str, pharmacies: list[dict]):
+async def notify_pharmacies(db: AsyncSession, order_id: str, pharmacies: list[dict]):
     """
-    Send notifications to matched pharmacies
+    Queue notifications to matched pharmacies; the caller commits
+    They are sent by notification_worker.py, so a restart loses none
     """
-    # Implement notification logic (email, SMS, push notification)
-    for pharmacy in pharmacies:
-        print(f"Notifying pharmacy {pharmacy['pharmacy_id']} about order {order_id}")
-        # Send actual notifications here
+    await enqueue_pharmacy_notifications(db, order_id, pharmacies)
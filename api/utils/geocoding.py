@@ -0,0 +1,136 @@
+import importlib
+import logging
+import os
+import re
+from typing import Optional
+import httpx
+from utils.ttl_cache import TTLCache
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "gazetteer" (city centres below only), "nominatim" (GEOCODER_URL, an OpenStreetMap
+# Nominatim search endpoint), or "package.module:function", an async function
+# taking an address and returning (latitude, longitude) or None
+GEOCODER = os.getenv("GEOCODER", "gazetteer")
+GEOCODER_URL = os.getenv("GEOCODER_URL", "https://nominatim.openstreetmap.org/search")
+# Nominatim's usage policy asks for an identifying User-Agent and at most one request a second
+GEOCODER_USER_AGENT = os.getenv("GEOCODER_USER_AGENT", "MedApp/1.0")
+# ISO country codes results are limited to; empty for anywhere
+GEOCODER_COUNTRY_CODES = os.getenv("GEOCODER_COUNTRY_CODES", "ng")
+GEOCODER_TIMEOUT_SECONDS = float(os.getenv("GEOCODER_TIMEOUT_SECONDS", 3))
+GEOCODER_CACHE_SIZE = int(os.getenv("GEOCODER_CACHE_SIZE", 10000))
+GEOCODER_CACHE_TTL_SECONDS = float(os.getenv("GEOCODER_CACHE_TTL_SECONDS", 86400))
+
+# Approximate city centres, used when the geocoder is off, down or finds nothing
+GAZETTEER = {
+    "abakaliki": (6.3249, 8.1137),
+    "abeokuta": (7.1475, 3.3619),
+    "abuja": (9.0765, 7.3986),
+    "akure": (7.2571, 5.2058),
+    "asaba": (6.1985, 6.7319),
+    "bauchi": (10.3158, 9.8442),
+    "benin city": (6.3350, 5.6037),
+    "calabar": (4.9757, 8.3417),
+    "enugu": (6.4584, 7.5464),
+    "gombe": (10.2897, 11.1673),
+    "ibadan": (7.3775, 3.9470),
+    "ikeja": (6.6018, 3.3515),
+    "ilorin": (8.4966, 4.5421),
+    "jos": (9.8965, 8.8583),
+    "kaduna": (10.5105, 7.4165),
+    "kano": (12.0022, 8.5920),
+    "katsina": (12.9908, 7.6018),
+    "lagos": (6.5244, 3.3792),
+    "lokoja": (7.8023, 6.7333),
+    "maiduguri": (11.8311, 13.1510),
+    "makurdi": (7.7337, 8.5214),
+    "minna": (9.6139, 6.5569),
+    "onitsha": (6.1413, 6.8029),
+    "osogbo": (7.7827, 4.5418),
+    "owerri": (5.4850, 7.0350),
+    "port harcourt": (4.8156, 7.0498),
+    "sokoto": (13.0059, 5.2476),
+    "umuahia": (5.5263, 7.4896),
+    "uyo": (5.0377, 7.9128),
+    "warri": (5.5167, 5.7500),
+    "yola": (9.2035, 12.4954),
+    "zaria": (11.0855, 7.7199),
+}
+
+
+def gazetteer_lookup(address: str) -> Optional[tuple[float, float]]:
+    """
+    (latitude, longitude) of the city named in a free-text address, or None.
+    When several cities appear, the last one wins ("12 Kano Road, Kaduna" is in Kaduna).
+    """
+    words = " " + " ".join(re.sub(r"[^a-z]+", " ", (address or "").lower()).split()) + " "
+    best_position, best = -1, None
+    for city, coordinates in GAZETTEER.items():
+        position = words.rfind(f" {city} ")
+        if position > best_position:
+            best_position, best = position, coordinates
+    return best
+
+
+def geocoder_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=GEOCODER_TIMEOUT_SECONDS,
+        headers={"User-Agent": GEOCODER_USER_AGENT}
+    )
+
+
+async def nominatim_geocode(address: str) -> Optional[tuple[float, float]]:
+    """Best match for an address from a Nominatim search endpoint, or None if it found nothing"""
+    params = {"q": address, "format": "jsonv2", "limit": 1}
+    if GEOCODER_COUNTRY_CODES:
+        params["countrycodes"] = GEOCODER_COUNTRY_CODES
+    async with geocoder_client() as client:
+        response = await client.get(GEOCODER_URL, params=params)
+        response.raise_for_status()
+        results = response.json()
+    if not results:
+        return None
+    return float(results[0]["lat"]), float(results[0]["lon"])
+
+
+GEOCODERS = {"gazetteer": None, "nominatim": nominatim_geocode}
+
+_geocoder = None
+# Answers by normalised address, misses included, so repeats skip the provider
+geocode_cache = TTLCache(GEOCODER_CACHE_SIZE, GEOCODER_CACHE_TTL_SECONDS)
+_NOT_CACHED = object()
+
+
+def get_geocoder():
+    """The configured geocoder, or None when only the gazetteer is used"""
+    global _geocoder
+    if GEOCODER in GEOCODERS:
+        return GEOCODERS[GEOCODER]
+    if _geocoder is None:
+        module, _, name = GEOCODER.partition(":")
+        _geocoder = getattr(importlib.import_module(module), name)
+    return _geocoder
+
+
+async def geocode_address(address: str) -> Optional[tuple[float, float]]:
+    """
+    (latitude, longitude) of a free-text address, or None.
+    Asks GEOCODER, then falls back to the city centre from the gazetteer when
+    it is unavailable or finds nothing; a failed lookup is not cached.
+    """
+    geocoder = get_geocoder()
+    if geocoder is None:
+        return gazetteer_lookup(address)
+
+    query = " ".join((address or "").split())
+    coordinates = geocode_cache.get(query.lower(), _NOT_CACHED)
+    if coordinates is _NOT_CACHED:
+        try:
+            coordinates = await geocoder(query) if query else None
+        except Exception as e:
+            logger.warning("Geocoder failed, using the gazetteer: %s", e)
+            return gazetteer_lookup(address)
+        geocode_cache.set(query.lower(), coordinates)
+    return coordinates or gazetteer_lookup(address)
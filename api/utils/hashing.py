@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+import bcrypt
+
+# Worker processes running bcrypt; 0 runs hashes on the event loop's default threadpool instead
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1)
+# Hashes allowed to wait for a free worker before requests are turned away with a 503
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+
+# Cost selection: BCRYPT_ROUNDS pins the cost, otherwise it is calibrated at startup
+# to the highest cost whose hash stays within BCRYPT_TARGET_MS on this machine
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", 250))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", 10))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", 15))
+CALIBRATION_PROBE_ROUNDS = 8
+
+logger = logging.getLogger(__name__)
+
+# Cost used for new hashes; replaced by calibrate_bcrypt_rounds()
+bcrypt_rounds = int(os.getenv("BCRYPT_ROUNDS") or BCRYPT_MIN_ROUNDS)
+
+
+def hash_password(password: str, rounds: int = None) -> str:
+    """Hash a password using bcrypt"""
+    salt = bcrypt.gensalt(rounds=rounds or bcrypt_rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """Verify a password against its hash"""
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_rounds(password_hash: str) -> int:
+    """Cost factor stored in a bcrypt hash ($2b$<rounds>$...)"""
+    return int(password_hash.split("$")[2])
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """
+    Whether a stored hash should be redone at the current cost.
+    Calibrated costs can differ between processes and hosts, so only weaker
+    hashes are upgraded; otherwise a user's hash would flip between costs on
+    every login. A cost pinned with BCRYPT_ROUNDS is the same fleet-wide and
+    is applied both ways, which is how the cost is lowered.
+    """
+    try:
+        rounds = hash_rounds(password_hash)
+    except (IndexError, ValueError):
+        return True
+    if os.getenv("BCRYPT_ROUNDS"):
+        return rounds != bcrypt_rounds
+    return rounds < bcrypt_rounds
+
+
+def calibrate_bcrypt_rounds() -> int:
+    """
+    Pick the bcrypt cost for this machine and make it the target for new hashes.
+    Each extra round doubles the work, so one timed probe at a low cost is
+    enough to extrapolate.
+    """
+    global bcrypt_rounds
+
+    if os.getenv("BCRYPT_ROUNDS"):
+        bcrypt_rounds = int(os.getenv("BCRYPT_ROUNDS"))
+        logger.info("bcrypt cost pinned to %d by BCRYPT_ROUNDS", bcrypt_rounds)
+        return bcrypt_rounds
+
+    salt = bcrypt.gensalt(rounds=CALIBRATION_PROBE_ROUNDS)
+    probe_ms = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", salt)
+        probe_ms = min(probe_ms, (time.perf_counter() - started) * 1000)
+
+    rounds = CALIBRATION_PROBE_ROUNDS
+    while probe_ms * 2 ** (rounds + 1 - CALIBRATION_PROBE_ROUNDS) <= BCRYPT_TARGET_MS:
+        rounds += 1
+    bcrypt_rounds = max(BCRYPT_MIN_ROUNDS, min(rounds, BCRYPT_MAX_ROUNDS))
+
+    logger.info(
+        "bcrypt cost calibrated to %d (~%.0f ms per hash, target %.0f ms)",
+        bcrypt_rounds,
+        probe_ms * 2 ** (bcrypt_rounds - CALIBRATION_PROBE_ROUNDS),
+        BCRYPT_TARGET_MS
+    )
+    return bcrypt_rounds
+
+
+class HashingPool:
+    """
+    Bounded process pool for bcrypt work.
+    At most `workers` hashes run at once and at most `max_queue` more wait for a
+    slot; anything beyond that is rejected straight away so a login burst
+    cannot pile up behind the CPU.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = None
+        self._slots = None
+
+    def _get_executor(self):
+        if self._executor is None and self.workers > 0:
+            # spawn: forking a process that already runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.in_flight >= max(self.workers, 1) + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(self.workers, 1))
+
+        self.in_flight += 1
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            # A crashed worker poisons the whole executor; start a fresh one next time
+            self.shutdown()
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "bcrypt_rounds": bcrypt_rounds,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the hashing pool"""
+    # Workers are separate processes, so the calibrated cost is passed explicitly
+    return await hashing_pool.run(hash_password, password, bcrypt_rounds)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    """Verify a password on the hashing pool"""
+    return await hashing_pool.run(verify_password, password, password_hash)
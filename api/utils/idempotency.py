@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.idempotency_model import IdempotencyKey, IdempotencyKeyStatus
+from utils.ttl_cache import TTLCache
+from dotenv import load_dotenv
+load_dotenv()
+
+# Repeats within this window replay the first response; after it the key can be reused
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 86400))
+# A claim still in progress after this long is taken to belong to a request that died
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 300))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000))
+IDEMPOTENCY_CACHE_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_CACHE_TTL_SECONDS", 600))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: Any
+
+
+# Completed responses by (scope, key), so repeats reaching this process skip the database
+idempotency_cache = TTLCache(
+    IDEMPOTENCY_CACHE_SIZE,
+    min(IDEMPOTENCY_CACHE_TTL_SECONDS, IDEMPOTENCY_KEY_TTL_SECONDS)
+)
+
+
+def idempotency_scope(user_id, endpoint: str) -> str:
+    """Scope of a user's keys on an endpoint; clients pick keys, so each user gets their own"""
+    return f"{user_id}:{endpoint}"
+
+
+def request_fingerprint(*parts) -> str:
+    """sha256 of the request parts as canonical JSON"""
+    encoded = json.dumps(jsonable_encoder(parts), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _hash_file(file) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(1024 * 1024), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+async def upload_fingerprint(upload: UploadFile) -> str:
+    """Fingerprint of an uploaded file's bytes and type; the file is rewound for the handler"""
+    return request_fingerprint(await asyncio.to_thread(_hash_file, upload.file), upload.content_type)
+
+
+def still_processing() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is still being processed",
+        headers={"Retry-After": "1"}
+    )
+
+
+def replay(stored: StoredResponse, fingerprint: str) -> JSONResponse:
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return JSONResponse(
+        status_code=stored.status_code,
+        content=stored.body,
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+async def claim_idempotency_key(db: AsyncSession, scope: str, key: str, fingerprint: str) -> Optional[datetime]:
+    """
+    Record the key as in progress and commit; returns the claim's created_at,
+    which identifies this request as its owner, or None if another request has it.
+    The claim is committed on its own so no lock is held while the handler runs;
+    a repeat sees it straight away and is answered without waiting. A claim
+    left in progress for IDEMPOTENCY_LEASE_SECONDS, by a process that died
+    mid-request, can be taken over.
+    """
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+    stmt = insert(IdempotencyKey).values(
+        scope=scope,
+        key=key,
+        fingerprint=fingerprint,
+        status=IdempotencyKeyStatus.IN_PROGRESS,
+        expires_at=expires_at
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+        # An expired key not purged yet is reused as if it were new
+        set_={
+            "fingerprint": stmt.excluded.fingerprint,
+            "status": IdempotencyKeyStatus.IN_PROGRESS,
+            "response_status": None,
+            "response_body": None,
+            "created_at": func.now(),
+            "completed_at": None,
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=or_(
+            IdempotencyKey.expires_at <= func.now(),
+            and_(
+                IdempotencyKey.status == IdempotencyKeyStatus.IN_PROGRESS,
+                IdempotencyKey.fingerprint == stmt.excluded.fingerprint,
+                IdempotencyKey.created_at <= func.now() - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+            )
+        )
+    ).returning(IdempotencyKey.created_at)
+
+    result = await db.execute(stmt)
+    claimed_at = result.scalar_one_or_none()
+    await db.commit()
+    return claimed_at
+
+
+async def release_idempotency_key(db: AsyncSession, scope: str, key: str, claimed_at: datetime):
+    """Delete a claim whose request failed, if it is still ours, so a retry can run"""
+    await db.execute(
+        delete(IdempotencyKey)
+        .where(
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.key == key,
+            IdempotencyKey.created_at == claimed_at,
+            IdempotencyKey.status == IdempotencyKeyStatus.IN_PROGRESS
+        )
+    )
+    await db.commit()
+
+
+async def load_response(db: AsyncSession, scope: str, key: str, fingerprint: str) -> StoredResponse:
+    """
+    Stored response for a key owned by another request; 409 with Retry-After
+    while that request is still running.
+    """
+    result = await db.execute(
+        select(
+            IdempotencyKey.fingerprint,
+            IdempotencyKey.status,
+            IdempotencyKey.response_status,
+            IdempotencyKey.response_body
+        )
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+    )
+    row = result.first()
+    await db.rollback()
+    if row is not None and row.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if row is None or row.status != IdempotencyKeyStatus.COMPLETED:
+        # Still running, or released by a failed request since the claim was tried
+        raise still_processing()
+    return StoredResponse(row.fingerprint, row.response_status, row.response_body)
+
+
+def encode_response(result, status_code: int) -> tuple[int, Any]:
+    if isinstance(result, Response):
+        return result.status_code, json.loads(result.body)
+    return status_code, jsonable_encoder(result)
+
+
+async def run_idempotent(
+    db: AsyncSession,
+    scope: str,
+    key: Optional[str],
+    fingerprint: Optional[str],
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int = 200
+):
+    """
+    Run `handler` once per Idempotency-Key and commit its work.
+    The key is claimed in a short transaction of its own first, so repeats of a
+    request still running get 409 with Retry-After instead of waiting on it.
+    The handler only flushes; its changes commit together with the stored
+    response, and only while the claim is still this request's. A request that
+    fails anywhere rolls back and releases the key for a retry. Repeats of a
+    completed request get its stored response replayed with an
+    Idempotent-Replayed header; the same key with a different fingerprint is
+    refused with 422. Without a key the handler just runs.
+    """
+    if key is None:
+        result = await handler()
+        await db.commit()
+        return result
+    if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+        )
+
+    stored = idempotency_cache.get((scope, key))
+    if stored is not None:
+        return replay(stored, fingerprint)
+
+    claimed_at = await claim_idempotency_key(db, scope, key, fingerprint)
+    if claimed_at is None:
+        stored = await load_response(db, scope, key, fingerprint)
+        idempotency_cache.set((scope, key), stored)
+        return replay(stored, fingerprint)
+
+    try:
+        result = await handler()
+        response_status, body = encode_response(result, status_code)
+        completed = await db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.created_at == claimed_at,
+                IdempotencyKey.status == IdempotencyKeyStatus.IN_PROGRESS
+            )
+            .values(
+                status=IdempotencyKeyStatus.COMPLETED,
+                response_status=response_status,
+                response_body=body,
+                completed_at=func.now()
+            )
+            .returning(IdempotencyKey.key)
+        )
+        if completed.first() is None:
+            # Ran past the lease and another request took the key over; its work stands
+            await db.rollback()
+            raise still_processing()
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        await release_idempotency_key(db, scope, key, claimed_at)
+        raise
+    idempotency_cache.set((scope, key), StoredResponse(fingerprint, response_status, body))
+    return result
+
+
+async def purge_expired_idempotency_keys(db: AsyncSession) -> int:
+    """Delete expired keys; returns how many were removed"""
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < func.now()))
+    await db.commit()
+    return result.rowcount
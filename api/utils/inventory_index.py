@@ -0,0 +1,91 @@
+import threading
+from typing import Hashable, Iterable
+
+
+def normalize_medication(name: str) -> str:
+    """Key a medication by its name, ignoring case and spacing"""
+    return " ".join(name.lower().split())
+
+
+class InventoryIndex:
+    """
+    Which pharmacies stock which medications, as one bitset per medication.
+    Every pharmacy is given a bit position (slot) once; a medication's bitset
+    has the slots of its stockists set. "Stocks every item" for an order is
+    the intersection of its medications' bitsets, a handful of machine-word
+    ANDs per item, after which each candidate is a single bit test.
+    Bitsets are Python ints, so they grow with the number of pharmacies.
+    """
+
+    def __init__(self):
+        self._slots = {}
+        self._stocked = {}
+        self._lock = threading.Lock()
+
+    def slot(self, pharmacy_id: Hashable) -> int:
+        """Bit position of a pharmacy, assigned on first use and kept for the life of the index"""
+        slot = self._slots.get(pharmacy_id)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.setdefault(pharmacy_id, len(self._slots))
+        return slot
+
+    def set_stock(self, pharmacy_id: Hashable, medication: str, in_stock: bool) -> bool:
+        """Mark a medication in or out of stock at a pharmacy; False if that was already so"""
+        bit = 1 << self.slot(pharmacy_id)
+        key = normalize_medication(medication)
+        with self._lock:
+            previous = self._stocked.get(key, 0)
+            bits = previous | bit if in_stock else previous & ~bit
+            if bits == previous:
+                return False
+            if bits:
+                self._stocked[key] = bits
+            else:
+                self._stocked.pop(key, None)
+            return True
+
+    def load(self, entries: Iterable[tuple[Hashable, str]]):
+        """
+        Replace all stock with the (pharmacy_id, medication) pairs in `entries`.
+        Builds each bitset in one go rather than bit by bit, which would copy the
+        whole bitset for every entry. Slots are kept, so pharmacies already
+        indexed elsewhere stay valid.
+        """
+        slots = {}
+        for pharmacy_id, medication in entries:
+            slots.setdefault(normalize_medication(medication), []).append(self.slot(pharmacy_id))
+
+        stocked = {}
+        for key, positions in slots.items():
+            bitmap = bytearray(max(positions) // 8 + 1)
+            for position in positions:
+                bitmap[position >> 3] |= 1 << (position & 7)
+            stocked[key] = int.from_bytes(bitmap, "little")
+        with self._lock:
+            self._stocked = stocked
+
+    def stocking_all(self, medications: Iterable[str]) -> int:
+        """Bitset of the pharmacies stocking every one of `medications`"""
+        keys = {normalize_medication(medication) for medication in medications}
+        with self._lock:
+            mask = (1 << len(self._slots)) - 1
+            # Rarest first: the intersection empties soonest
+            for bits in sorted((self._stocked.get(key, 0) for key in keys), key=int.bit_count):
+                mask &= bits
+                if not mask:
+                    break
+        return mask
+
+    def stocks(self, pharmacy_id: Hashable, medication: str) -> bool:
+        slot = self._slots.get(pharmacy_id)
+        return slot is not None and bool(self._stocked.get(normalize_medication(medication), 0) >> slot & 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pharmacies": len(self._slots),
+                "medications": len(self._stocked),
+                "stock_entries": sum(bits.bit_count() for bits in self._stocked.values()),
+                "bitset_bytes": sum((bits.bit_length() + 7) // 8 for bits in self._stocked.values()),
+            }
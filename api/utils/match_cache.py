@@ -0,0 +1,100 @@
+import math
+import threading
+from collections import Counter
+from typing import Any, Optional
+from utils.spatial_index import KM_PER_DEGREE
+from utils.ttl_cache import TTLCache
+
+
+class MatchCache:
+    """
+    Pharmacy match results keyed on (cell, medication set, *query options).
+    Results are computed for the centre of a `cell_degrees` cell and shared
+    by every delivery point in it. Each key is also indexed by its cell, so a
+    change at one pharmacy drops only the entries of cells close enough for a
+    search of up to `radius_km` to reach it, and a stock change only those
+    whose medication set contains the medication.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, cell_degrees: float, radius_km: float):
+        self.cache = TTLCache(maxsize, ttl)
+        self.cell_degrees = cell_degrees
+        self.reach_km = radius_km + self.margin_km
+        self._by_cell = {}
+        self._indexed = 0
+        self._lock = threading.Lock()
+        self.invalidation_events = Counter()
+
+    def cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def centre(self, cell: tuple[int, int]) -> tuple[float, float]:
+        return (cell[0] + 0.5) * self.cell_degrees, (cell[1] + 0.5) * self.cell_degrees
+
+    @property
+    def margin_km(self) -> float:
+        """Furthest a delivery point can be from its cell's centre"""
+        return self.cell_degrees * KM_PER_DEGREE * math.sqrt(2) / 2
+
+    def get(self, key: tuple) -> Optional[Any]:
+        return self.cache.get(key)
+
+    def set(self, key: tuple, value: Any):
+        """`key[0]` is the cell, `key[1]` the normalised medication set (or None)"""
+        self.cache.set(key, value)
+        with self._lock:
+            keys = self._by_cell.setdefault(key[0], set())
+            if key not in keys:
+                keys.add(key)
+                self._indexed += 1
+            # Expired and evicted keys linger here until their cell is invalidated
+            if self._indexed > 2 * self.cache.maxsize:
+                self._by_cell = {}
+                for live in self.cache.keys():
+                    self._by_cell.setdefault(live[0], set()).add(live)
+                self._indexed = sum(len(keys) for keys in self._by_cell.values())
+
+    def invalidate_near(self, lat: float, lon: float, medication: Optional[str] = None) -> int:
+        """
+        Drop entries whose results could include a pharmacy at (lat, lon);
+        with `medication`, only those matching on it. Returns how many were dropped.
+        """
+        dlat = self.reach_km / KM_PER_DEGREE
+        dlon = self.reach_km / (KM_PER_DEGREE * math.cos(math.radians(min(abs(lat) + dlat, 89.9))))
+        row0, col0 = self.cell(lat - dlat, lon - dlon)
+        row1, col1 = self.cell(lat + dlat, lon + dlon)
+
+        dropped = []
+        with self._lock:
+            # Walk whichever is smaller: the cells in reach or the cells with entries
+            if (row1 - row0 + 1) * (col1 - col0 + 1) <= len(self._by_cell):
+                cells = [(row, col) for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)]
+            else:
+                cells = [cell for cell in self._by_cell if row0 <= cell[0] <= row1 and col0 <= cell[1] <= col1]
+            for cell in cells:
+                keys = self._by_cell.get(cell)
+                if not keys:
+                    continue
+                matching = [key for key in keys if medication is None or (key[1] is not None and medication in key[1])]
+                keys.difference_update(matching)
+                if not keys:
+                    del self._by_cell[cell]
+                self._indexed -= len(matching)
+                dropped += matching
+            self.invalidation_events["stock" if medication else "pharmacy"] += 1
+
+        return sum(self.cache.pop(key, None) is not None for key in dropped)
+
+    def clear(self):
+        with self._lock:
+            self._by_cell = {}
+            self._indexed = 0
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "cell_degrees": self.cell_degrees,
+            "cells": len(self._by_cell),
+            "invalidation_events": dict(self.invalidation_events),
+        }
@@ -0,0 +1,406 @@
+import asyncio
+import importlib
+import logging
+import os
+import random
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import select, update, delete, insert, func, or_, bindparam, Interval
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models.notification_model import Notification, DeadLetterNotification
+from models.pharmacy_model import Pharmacy
+from dotenv import load_dotenv
+load_dotenv()
+
+# Channels the notification worker sends on; matched pharmacies are notified on each
+NOTIFICATION_CHANNELS = [channel.strip() for channel in os.getenv("NOTIFICATION_CHANNELS", "push,sms").split(",") if channel.strip()]
+# channel=module:Class pairs; channels without one are logged by LogSender
+NOTIFICATION_SENDERS = os.getenv("NOTIFICATION_SENDERS", "")
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", 6))
+# Retry delay doubles after each failed attempt, starting from this
+NOTIFICATION_RETRY_BACKOFF_SECONDS = float(os.getenv("NOTIFICATION_RETRY_BACKOFF_SECONDS", 10))
+NOTIFICATION_SEND_TIMEOUT_SECONDS = float(os.getenv("NOTIFICATION_SEND_TIMEOUT_SECONDS", 30))
+# A claimed notification not recorded within this long is assumed lost with its dispatcher
+NOTIFICATION_LOCK_TIMEOUT_SECONDS = float(os.getenv("NOTIFICATION_LOCK_TIMEOUT_SECONDS", 300))
+NOTIFICATION_CLAIM_BATCH = int(os.getenv("NOTIFICATION_CLAIM_BATCH", 200))
+# Claimed but not yet recorded notifications per dispatcher; claiming stops at this many
+NOTIFICATION_MAX_IN_FLIGHT = int(os.getenv("NOTIFICATION_MAX_IN_FLIGHT", 1000))
+# Send results are written back in batches at least this often
+NOTIFICATION_FLUSH_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_FLUSH_INTERVAL_SECONDS", 0.2))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Message:
+    id: int
+    channel: str
+    recipient: str
+    payload: dict
+    # Including the attempt in progress
+    attempts: int
+
+
+class NotificationError(Exception):
+    """Delivery failed; the notification is retried"""
+
+
+class PermanentNotificationError(NotificationError):
+    """Delivery can never succeed (e.g. an invalid phone number); the notification is dead-lettered at once"""
+
+
+class NotificationSender(ABC):
+    """
+    Delivers notifications on one channel, `batch_size` messages per call at most.
+    Providers that take one message per call subclass MessageSender instead.
+    """
+    max_concurrency = 10
+    batch_size = 1
+
+    @abstractmethod
+    async def send_batch(self, messages: list[Message]) -> list[Optional[Exception]]:
+        """One error, or None when delivered, per message"""
+
+
+class MessageSender(NotificationSender):
+    """Sender for providers that take one message per call; the messages of a batch are sent concurrently"""
+
+    @abstractmethod
+    async def send(self, message: Message):
+        """Deliver one message, raising NotificationError when it failed"""
+
+    async def send_batch(self, messages: list[Message]) -> list[Optional[Exception]]:
+        results = await asyncio.gather(*(self.send(message) for message in messages), return_exceptions=True)
+        return [result if isinstance(result, Exception) else None for result in results]
+
+
+class LogSender(MessageSender):
+    """Logs notifications instead of sending them; the default until a provider is configured"""
+
+    async def send(self, message: Message):
+        logger.info("Notifying %s via %s: %s", message.recipient, message.channel, message.payload.get("text"))
+
+
+class StubSender(NotificationSender):
+    """Local stand-in for a provider: waits `latency` seconds per call and fails `failure_rate` of messages"""
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, batch_size: int = 1, max_concurrency: int = 10):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.calls = 0
+        self.sent = []
+
+    async def send_batch(self, messages: list[Message]) -> list[Optional[Exception]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        errors = []
+        for message in messages:
+            if random.random() < self.failure_rate:
+                errors.append(NotificationError("Stub failure"))
+            else:
+                self.sent.append(message)
+                errors.append(None)
+        return errors
+
+
+def load_senders() -> dict[str, NotificationSender]:
+    """A sender per channel in NOTIFICATION_CHANNELS, from NOTIFICATION_SENDERS or LogSender"""
+    senders = {channel: LogSender() for channel in NOTIFICATION_CHANNELS}
+    for entry in NOTIFICATION_SENDERS.split(","):
+        if not entry.strip():
+            continue
+        channel, _, target = entry.partition("=")
+        module, _, name = target.strip().partition(":")
+        senders[channel.strip()] = getattr(importlib.import_module(module), name)()
+    return senders
+
+
+def pharmacy_recipient(channel: str, pharmacy_id: str, phone: Optional[str]) -> Optional[str]:
+    """Address of a pharmacy on a channel, or None if it cannot be reached there"""
+    if channel == "sms":
+        return phone
+    return pharmacy_id
+
+
+async def enqueue_notification(db: AsyncSession, channel: str, recipient: str, payload: dict, order_id: str = None):
+    """Queue one notification; the caller commits"""
+    await db.execute(
+        insert(Notification).values(channel=channel, recipient=recipient, order_id=order_id, payload=payload)
+    )
+
+
+async def enqueue_pharmacy_notifications(db: AsyncSession, order_id: str, pharmacies: list[dict]) -> int:
+    """Queue a notification per matched pharmacy and channel; the caller commits"""
+    if not pharmacies:
+        return 0
+    result = await db.execute(
+        select(Pharmacy.id, Pharmacy.phone).where(Pharmacy.id.in_([pharmacy["pharmacy_id"] for pharmacy in pharmacies]))
+    )
+    phones = dict(result.all())
+
+    rows = []
+    for pharmacy in pharmacies:
+        payload = {
+            "type": "order_available",
+            "order_id": order_id,
+            "pharmacy_name": pharmacy["name"],
+            "distance_km": pharmacy["distance_km"],
+            "has_all_items": pharmacy.get("has_all_items"),
+            "text": f"New order {order_id}, {pharmacy['distance_km']} km away",
+        }
+        for channel in NOTIFICATION_CHANNELS:
+            recipient = pharmacy_recipient(channel, pharmacy["pharmacy_id"], phones.get(pharmacy["pharmacy_id"]))
+            if recipient:
+                rows.append({
+                    "channel": channel,
+                    "recipient": recipient,
+                    "pharmacy_id": pharmacy["pharmacy_id"],
+                    "order_id": order_id,
+                    "payload": payload,
+                })
+    if rows:
+        await db.execute(insert(Notification), rows)
+    return len(rows)
+
+
+async def claim_notifications(db: AsyncSession, limit: int, channels: list[str]) -> list[Message]:
+    """
+    Claim up to `limit` due notifications on `channels`, or ones whose dispatcher went away, and commit the claim.
+    SKIP LOCKED lets any number of dispatchers poll the table without blocking on each other.
+    """
+    claimable = (
+        select(Notification.id)
+        .where(
+            Notification.available_at <= func.now(),
+            Notification.channel.in_(channels),
+            or_(
+                Notification.locked_at.is_(None),
+                Notification.locked_at < func.now() - timedelta(seconds=NOTIFICATION_LOCK_TIMEOUT_SECONDS)
+            )
+        )
+        .order_by(Notification.available_at, Notification.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.id.in_(claimable.scalar_subquery()))
+        .values(attempts=Notification.attempts + 1, locked_at=func.now())
+        .returning(
+            Notification.id,
+            Notification.channel,
+            Notification.recipient,
+            Notification.payload,
+            Notification.attempts
+        )
+    )
+    messages = [Message(**row._mapping) for row in result]
+    await db.commit()
+    return messages
+
+
+async def record_results(db: AsyncSession, results: list[tuple[Message, Optional[Exception]]]) -> Counter:
+    """
+    Delete delivered notifications, reschedule failed ones with backoff and move
+    those out of attempts to the dead-letter table; the caller commits.
+    """
+    outcome = Counter()
+    sent, failed, dead = [], [], []
+    for message, error in results:
+        if error is None:
+            sent.append(message.id)
+            outcome["sent"] += 1
+            continue
+        failed.append({
+            "b_id": message.id,
+            "b_error": str(error) or type(error).__name__,
+            "b_delay": timedelta(seconds=NOTIFICATION_RETRY_BACKOFF_SECONDS * 2 ** (message.attempts - 1)),
+        })
+        if isinstance(error, PermanentNotificationError) or message.attempts >= NOTIFICATION_MAX_ATTEMPTS:
+            dead.append(message.id)
+            outcome["dead_lettered"] += 1
+        else:
+            outcome["retried"] += 1
+
+    if sent:
+        await db.execute(delete(Notification).where(Notification.id.in_(sent)))
+    if failed:
+        # On the table rather than the mapped class: an executemany, not an ORM bulk update
+        table = Notification.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                last_error=bindparam("b_error"),
+                available_at=func.now() + bindparam("b_delay", type_=Interval),
+                locked_at=None
+            ),
+            failed
+        )
+    if dead:
+        moved = (
+            delete(Notification)
+            .where(Notification.id.in_(dead))
+            .returning(
+                Notification.id,
+                Notification.channel,
+                Notification.recipient,
+                Notification.pharmacy_id,
+                Notification.order_id,
+                Notification.payload,
+                Notification.attempts,
+                Notification.last_error,
+                Notification.created_at
+            )
+            .cte("moved")
+        )
+        columns = ["id", "channel", "recipient", "pharmacy_id", "order_id", "payload", "attempts", "last_error", "created_at"]
+        await db.execute(
+            insert(DeadLetterNotification).from_select(columns, select(*(moved.c[column] for column in columns)))
+        )
+    return outcome
+
+
+class NotificationDispatcher:
+    """
+    Claims due notifications on the channels it has senders for and fans them
+    out to their channel's sender.
+    Each channel sends at most `max_concurrency` calls at a time, in chunks of
+    its `batch_size`; claiming pauses while `max_in_flight` notifications are
+    unrecorded, so a slow provider backs up into the table rather than memory.
+    Results are written back in batches.
+    """
+
+    def __init__(
+        self,
+        senders: dict[str, NotificationSender],
+        max_in_flight: int = NOTIFICATION_MAX_IN_FLIGHT,
+        claim_batch: int = NOTIFICATION_CLAIM_BATCH
+    ):
+        self.senders = senders
+        self.max_in_flight = max_in_flight
+        self.claim_batch = claim_batch
+        self._limits = {channel: asyncio.Semaphore(sender.max_concurrency) for channel, sender in senders.items()}
+        self._in_flight = 0
+        self._capacity = asyncio.Condition()
+        self._results = []
+        self._tasks = set()
+        self.counters = Counter()
+
+    async def send_chunk(self, channel: str, messages: list[Message]):
+        async with self._limits[channel]:
+            try:
+                errors = await asyncio.wait_for(
+                    self.senders[channel].send_batch(messages),
+                    NOTIFICATION_SEND_TIMEOUT_SECONDS
+                )
+            except Exception as e:
+                errors = [NotificationError(str(e) or type(e).__name__)] * len(messages)
+        if len(errors) != len(messages):
+            # Cannot tell which were delivered; every message must still be recorded to free its capacity
+            error = NotificationError(f"Sender returned {len(errors)} results for {len(messages)} messages")
+            errors = [error] * len(messages)
+        self._results.extend(zip(messages, errors))
+
+    def dispatch(self, messages: list[Message]):
+        """Start sending claimed messages, chunked by channel"""
+        by_channel = {}
+        for message in messages:
+            by_channel.setdefault(message.channel, []).append(message)
+        for channel, pending in by_channel.items():
+            size = self.senders[channel].batch_size
+            for start in range(0, len(pending), size):
+                task = asyncio.create_task(self.send_chunk(channel, pending[start:start + size]))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Write back the results gathered so far and free their capacity"""
+        if not self._results:
+            return
+        results, self._results = self._results, []
+        try:
+            async with AsyncSessionLocal() as db:
+                outcome = await record_results(db, results)
+                await db.commit()
+            self.counters.update(outcome)
+            for message, error in results:
+                self.counters[f"{message.channel}.{'sent' if error is None else 'failed'}"] += 1
+        except Exception:
+            # Still locked; claimed again once NOTIFICATION_LOCK_TIMEOUT_SECONDS pass
+            logger.exception("Could not record %d notification results", len(results))
+        async with self._capacity:
+            self._in_flight -= len(results)
+            self._capacity.notify_all()
+
+    async def flush_periodically(self, stopping: asyncio.Event):
+        while not stopping.is_set() or self._tasks or self._results:
+            await asyncio.sleep(NOTIFICATION_FLUSH_INTERVAL_SECONDS)
+            await self.flush()
+
+    async def claim(self, stopping: asyncio.Event, poll_interval: float):
+        while not stopping.is_set():
+            async with self._capacity:
+                await self._capacity.wait_for(lambda: self._in_flight < self.max_in_flight)
+                limit = min(self.claim_batch, self.max_in_flight - self._in_flight)
+                self._in_flight += limit
+            try:
+                async with AsyncSessionLocal() as db:
+                    messages = await claim_notifications(db, limit, list(self.senders))
+            except Exception:
+                logger.exception("Could not claim notifications")
+                messages = []
+            async with self._capacity:
+                self._in_flight -= limit - len(messages)
+
+            if messages:
+                self.counters["claimed"] += len(messages)
+                self.dispatch(messages)
+                if len(messages) == limit:
+                    continue
+            try:
+                await asyncio.wait_for(stopping.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, stopping: asyncio.Event, poll_interval: float = 1.0):
+        """Dispatch until `stopping` is set, then finish the sends in progress"""
+        flusher = asyncio.create_task(self.flush_periodically(stopping))
+        await self.claim(stopping, poll_interval)
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+        await flusher
+
+    def stats(self) -> dict:
+        return {"in_flight": self._in_flight, **self.counters}
+
+
+async def notification_queue_stats(db: AsyncSession) -> dict:
+    """Waiting notifications per channel, age of the oldest due one and dead letters"""
+    is_due = Notification.available_at <= func.now()
+    pending = await db.execute(
+        select(
+            Notification.channel,
+            func.count(),
+            func.count().filter(is_due),
+            func.extract("epoch", func.now() - func.min(Notification.available_at).filter(is_due))
+        )
+        .group_by(Notification.channel)
+    )
+    pending = pending.all()
+    dead_letters = await db.execute(
+        select(DeadLetterNotification.channel, func.count()).group_by(DeadLetterNotification.channel)
+    )
+    return {
+        "pending": {channel: count for channel, count, _, _ in pending},
+        "due": {channel: due for channel, _, due, _ in pending},
+        "oldest_due_age_seconds": {channel: round(float(age), 3) for channel, _, _, age in pending if age is not None},
+        "dead_letters": dict(dead_letters.all()),
+    }
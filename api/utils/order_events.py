@@ -0,0 +1,46 @@
+import os
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.outbox import Event, record_event, subscribe
+from utils.notifications import NOTIFICATION_CHANNELS, enqueue_notification
+from dotenv import load_dotenv
+load_dotenv()
+
+ORDER_CREATED = "order.created"
+PRESCRIPTION_UPLOADED = "order.prescription_uploaded"
+ORDER_VERIFIED = "order.verified"
+ORDER_REJECTED = "order.rejected"
+# Verification gave up on the document; the order is REJECTED so it can be uploaded again
+ORDER_VERIFICATION_FAILED = "order.verification_failed"
+ORDER_PAID = "order.paid"
+
+# Channel customers hear about their order's progress on; empty to not notify them
+CUSTOMER_NOTIFICATION_CHANNEL = os.getenv("CUSTOMER_NOTIFICATION_CHANNEL", "push")
+
+CUSTOMER_MESSAGES = {
+    ORDER_VERIFIED: "Your prescription for order {order_id} was verified. Nearby pharmacies have been notified.",
+    ORDER_REJECTED: "Your prescription for order {order_id} was not accepted: {reason}",
+    ORDER_VERIFICATION_FAILED: "We could not check your prescription for order {order_id}. Please upload it again.",
+    ORDER_PAID: "Payment for order {order_id} received.",
+}
+
+
+async def record_order_event(db: AsyncSession, event_type: str, order_id: str, user_id, **details):
+    """Add an order lifecycle event to the outbox; the caller commits it with the order change"""
+    await record_event(db, event_type, order_id, {"order_id": order_id, "user_id": str(user_id), **details})
+
+
+@subscribe(ORDER_VERIFIED, ORDER_REJECTED, ORDER_VERIFICATION_FAILED, ORDER_PAID)
+async def notify_customer(db: AsyncSession, event: Event):
+    if CUSTOMER_NOTIFICATION_CHANNEL not in NOTIFICATION_CHANNELS:
+        return
+    text = CUSTOMER_MESSAGES[event.event_type].format(
+        order_id=event.aggregate_id,
+        reason=event.payload.get("reason")
+    )
+    await enqueue_notification(
+        db,
+        CUSTOMER_NOTIFICATION_CHANNEL,
+        event.payload["user_id"],
+        {"type": event.event_type, "order_id": event.aggregate_id, "text": text},
+        order_id=event.aggregate_id
+    )
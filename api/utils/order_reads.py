@@ -0,0 +1,73 @@
+from collections import defaultdict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.order_model import Order, OrderItem
+from schemas.order_schema import OrderResponse, MedicationItemResponse
+from utils.http_cache import make_etag
+
+# Columns needed to build an OrderResponse (plus id for joining items and paging)
+ORDER_READ_COLUMNS = (
+    Order.id,
+    Order.order_id,
+    Order.user_id,
+    Order.status,
+    Order.prescription_required,
+    Order.prescription_status,
+    Order.delivery_address,
+    Order.created_at,
+    Order.updated_at,
+)
+
+
+def order_etag(row) -> str:
+    """ETag for an order; needs only id, created_at and updated_at"""
+    return make_etag("order", row.id, row.updated_at or row.created_at)
+
+
+def select_order_version(order_id: str):
+    """Cheap select of just what order_etag needs, for conditional GETs"""
+    return select(Order.id, Order.created_at, Order.updated_at).where(Order.order_id == order_id)
+
+
+def select_order_rows():
+    """Core select of the order columns used by the read model"""
+    return select(*ORDER_READ_COLUMNS)
+
+
+async def build_order_responses(db: AsyncSession, rows, message: str) -> list[OrderResponse]:
+    """
+    Turn order rows into OrderResponses with their medications.
+    Items for every order are fetched in one query, so the cost is two
+    queries however many orders and items there are; plain rows are used
+    throughout so nothing enters the session's identity map.
+    """
+    if not rows:
+        return []
+
+    items = await db.execute(
+        select(OrderItem.order_id, OrderItem.medication_name, OrderItem.dosage, OrderItem.quantity)
+        .where(OrderItem.order_id.in_([row.id for row in rows]))
+        .order_by(OrderItem.order_id, OrderItem.created_at)
+    )
+    medications = defaultdict(list)
+    for item in items:
+        medications[item.order_id].append(MedicationItemResponse(
+            medication_name=item.medication_name,
+            dosage=item.dosage,
+            quantity=item.quantity
+        ))
+
+    return [
+        OrderResponse(
+            order_id=row.order_id,
+            user_id=str(row.user_id),
+            status=row.status,
+            prescription_required=row.prescription_required,
+            prescription_status=row.prescription_status,
+            medications=medications[row.id],
+            delivery_address=row.delivery_address,
+            created_at=row.created_at,
+            message=message
+        )
+        for row in rows
+    ]
@@ -0,0 +1,85 @@
+from typing import Optional, Sequence
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.order_model import Order, OrderStatus
+
+# Statuses an order may move to from each status; DELIVERED and CANCELLED are final
+ORDER_TRANSITIONS: dict[OrderStatus, frozenset[OrderStatus]] = {
+    OrderStatus.PENDING: frozenset({
+        OrderStatus.PRESCRIPTION_UPLOADED,
+        OrderStatus.VERIFYING,
+        # Orders that need no prescription go straight to payment
+        OrderStatus.PAYMENT_PENDING,
+        OrderStatus.CANCELLED,
+    }),
+    OrderStatus.PRESCRIPTION_UPLOADED: frozenset({OrderStatus.VERIFYING, OrderStatus.CANCELLED}),
+    OrderStatus.VERIFYING: frozenset({
+        # A newer document replaces the one being verified
+        OrderStatus.VERIFYING,
+        OrderStatus.VERIFIED,
+        OrderStatus.REJECTED,
+        OrderStatus.CANCELLED,
+    }),
+    OrderStatus.VERIFIED: frozenset({OrderStatus.PAYMENT_PENDING, OrderStatus.CANCELLED}),
+    # A rejected prescription can be replaced
+    OrderStatus.REJECTED: frozenset({OrderStatus.VERIFYING, OrderStatus.CANCELLED}),
+    OrderStatus.PAYMENT_PENDING: frozenset({OrderStatus.PAID, OrderStatus.CANCELLED}),
+    OrderStatus.PAID: frozenset({OrderStatus.PROCESSING}),
+    OrderStatus.PROCESSING: frozenset({OrderStatus.DELIVERED}),
+    OrderStatus.DELIVERED: frozenset(),
+    OrderStatus.CANCELLED: frozenset(),
+}
+
+
+def check_transition(current: OrderStatus, *targets: OrderStatus):
+    """Raise 409 unless an order can move from `current` through each of `targets` in turn"""
+    for target in targets:
+        if target not in ORDER_TRANSITIONS[current]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Order cannot go from {current.value} to {target.value}"
+            )
+        current = target
+
+
+def order_conflict() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="Order was changed by another request; reload it and try again"
+    )
+
+
+async def transition_order(
+    db: AsyncSession,
+    order_pk: str,
+    expected: OrderStatus,
+    target: OrderStatus,
+    version: Optional[int] = None,
+    through: Sequence[OrderStatus] = (),
+    conditions: Sequence = (),
+    returning: Sequence = (),
+    **values
+):
+    """
+    Move an order from `expected` to `target` in one conditional
+    UPDATE ... RETURNING, bumping its version; the caller commits.
+    The update only applies if the order is still in `expected` (and at
+    `version`, when given, and matching any extra `conditions`), so a
+    concurrent change is never overwritten. `through` lists intermediate
+    statuses the move is checked against but not written, for steps taken
+    in one go. Returns the `returning` columns plus the new version, or
+    None when the order had changed.
+    """
+    check_transition(expected, *through, target)
+    statement = update(Order).where(Order.id == order_pk, Order.status == expected, *conditions)
+    if version is not None:
+        statement = statement.where(Order.version == version)
+    result = await db.execute(
+        statement
+        .values(status=target, version=Order.version + 1, **values)
+        .returning(Order.version, *returning)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
+
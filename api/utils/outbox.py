@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from sqlalchemy import select, update, delete, insert, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models.outbox_model import OutboxEvent, OutboxEventStatus
+from dotenv import load_dotenv
+load_dotenv()
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+# Retry delay doubles after each failed delivery, starting from this
+OUTBOX_RETRY_BACKOFF_SECONDS = float(os.getenv("OUTBOX_RETRY_BACKOFF_SECONDS", 5))
+# Delivered events are kept this long for the lag and throughput figures, then purged
+OUTBOX_RETENTION_SECONDS = float(os.getenv("OUTBOX_RETENTION_SECONDS", 86400))
+OUTBOX_STATS_WINDOW_SECONDS = float(os.getenv("OUTBOX_STATS_WINDOW_SECONDS", 300))
+# none, or redis: every event is also added to a Redis stream (uses REDIS_*)
+OUTBOX_BROKER = os.getenv("OUTBOX_BROKER", "none")
+OUTBOX_REDIS_STREAM = os.getenv("OUTBOX_REDIS_STREAM", "order_events")
+OUTBOX_REDIS_STREAM_MAXLEN = int(os.getenv("OUTBOX_REDIS_STREAM_MAXLEN", 100000))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    id: int
+    event_type: str
+    aggregate_id: str
+    payload: dict
+    created_at: datetime
+
+
+Subscriber = Callable[[AsyncSession, Event], Awaitable[None]]
+subscribers: dict[str, list[Subscriber]] = defaultdict(list)
+
+
+def subscribe(*event_types: str):
+    """
+    Register an async handler(db, event) for event types.
+    Handlers run in the relay's transaction, inside a savepoint: their writes
+    commit together with the event being marked delivered, or not at all.
+    """
+    def register(handler: Subscriber) -> Subscriber:
+        for event_type in event_types:
+            subscribers[event_type].append(handler)
+        return handler
+    return register
+
+
+async def record_event(db: AsyncSession, event_type: str, aggregate_id: str, payload: dict):
+    """Add an event to the outbox; the caller commits it with the change it describes"""
+    await db.execute(
+        insert(OutboxEvent).values(event_type=event_type, aggregate_id=aggregate_id, payload=payload)
+    )
+
+
+class RedisStreamBroker:
+    """Adds events to a Redis stream for consumers outside this codebase"""
+
+    def __init__(self):
+        import redis.asyncio as redis
+
+        self.client = redis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", 6379)),
+            db=int(os.getenv("REDIS_DB", 0)),
+            password=os.getenv("REDIS_PASSWORD") or None
+        )
+
+    async def publish(self, events: list[Event]):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.xadd(
+                    OUTBOX_REDIS_STREAM,
+                    {
+                        "id": event.id,
+                        "type": event.event_type,
+                        "aggregate_id": event.aggregate_id,
+                        "payload": json.dumps(event.payload),
+                    },
+                    maxlen=OUTBOX_REDIS_STREAM_MAXLEN,
+                    approximate=True
+                )
+            await pipe.execute()
+
+
+def create_broker():
+    if OUTBOX_BROKER == "redis":
+        return RedisStreamBroker()
+    if OUTBOX_BROKER == "none":
+        return None
+    raise RuntimeError(f"Unknown OUTBOX_BROKER '{OUTBOX_BROKER}'")
+
+
+class OutboxRelay:
+    """
+    Delivers pending outbox events to the broker and subscribers in id order.
+    A batch is locked with SKIP LOCKED, so several relays can drain the outbox
+    side by side (events of one order are then not strictly ordered across relays).
+    Delivery is at least once: a relay that dies mid-batch leaves the batch
+    pending, and the broker may see an event again when a subscriber fails.
+    """
+
+    def __init__(self, broker=None, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.broker = broker
+        self.batch_size = batch_size
+        self.counters = Counter()
+        self.last_lag_seconds = None
+        self.started = time.monotonic()
+
+    async def relay_batch(self, db: AsyncSession) -> int:
+        """Deliver one batch and commit; returns how many events it held"""
+        result = await db.execute(
+            select(
+                OutboxEvent.id,
+                OutboxEvent.event_type,
+                OutboxEvent.aggregate_id,
+                OutboxEvent.payload,
+                OutboxEvent.created_at,
+                OutboxEvent.attempts
+            )
+            .where(OutboxEvent.status == OutboxEventStatus.PENDING, OutboxEvent.available_at <= func.now())
+            .order_by(OutboxEvent.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = result.all()
+        if not rows:
+            await db.commit()
+            return 0
+        events = [Event(**{key: value for key, value in row._mapping.items() if key != "attempts"}) for row in rows]
+
+        if self.broker is not None:
+            # A broker failure leaves the whole batch pending
+            await self.broker.publish(events)
+
+        delivered = []
+        for row, event in zip(rows, events):
+            try:
+                async with db.begin_nested():
+                    for handler in subscribers.get(event.event_type, []):
+                        await handler(db, event)
+                delivered.append(event.id)
+            except Exception as e:
+                logger.exception("Outbox event %s (%s) failed", event.id, event.event_type)
+                await self.record_failure(db, event, row.attempts + 1, str(e))
+
+        if delivered:
+            await db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_(delivered))
+                .values(
+                    status=OutboxEventStatus.DONE,
+                    attempts=OutboxEvent.attempts + 1,
+                    processed_at=func.now()
+                )
+            )
+        await db.commit()
+
+        self.counters["batches"] += 1
+        self.counters["delivered"] += len(delivered)
+        self.last_lag_seconds = (datetime.now(events[-1].created_at.tzinfo) - events[-1].created_at).total_seconds()
+        return len(events)
+
+    async def record_failure(self, db: AsyncSession, event: Event, attempts: int, error: str):
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            logger.error("Outbox event %s failed permanently: %s", event.id, error)
+            values = {"status": OutboxEventStatus.FAILED, "processed_at": func.now()}
+            self.counters["failed"] += 1
+        else:
+            delay = OUTBOX_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+            values = {"available_at": func.now() + timedelta(seconds=delay)}
+            self.counters["retried"] += 1
+        await db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id == event.id)
+            .values(attempts=attempts, last_error=error, **values)
+        )
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            **self.counters,
+            "events_per_second": round(self.counters["delivered"] / elapsed, 2) if elapsed else 0.0,
+            "last_lag_seconds": round(self.last_lag_seconds, 3) if self.last_lag_seconds is not None else None,
+        }
+
+
+async def purge_delivered_events(db: AsyncSession) -> int:
+    """Delete delivered events older than OUTBOX_RETENTION_SECONDS; failed ones are kept for inspection"""
+    result = await db.execute(
+        delete(OutboxEvent)
+        .where(
+            OutboxEvent.status == OutboxEventStatus.DONE,
+            OutboxEvent.processed_at < func.now() - timedelta(seconds=OUTBOX_RETENTION_SECONDS)
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def outbox_stats(db: AsyncSession) -> dict:
+    """Backlog, relay lag percentiles and throughput over the last OUTBOX_STATS_WINDOW_SECONDS"""
+    result = await db.execute(
+        text(
+            """
+            SELECT
+                count(*) FILTER (WHERE status = :pending) AS pending,
+                extract(epoch FROM now() - min(created_at) FILTER (WHERE status = :pending)) AS oldest_pending,
+                count(*) FILTER (WHERE status = :failed) AS failed,
+                count(*) FILTER (WHERE status = :done AND processed_at > now() - make_interval(secs => :window)) AS delivered,
+                percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM processed_at - created_at))
+                    FILTER (WHERE status = :done AND processed_at > now() - make_interval(secs => :window)) AS lag_p50,
+                percentile_cont(0.95) WITHIN GROUP (ORDER BY extract(epoch FROM processed_at - created_at))
+                    FILTER (WHERE status = :done AND processed_at > now() - make_interval(secs => :window)) AS lag_p95
+            FROM outbox_events
+            WHERE status <> :done OR processed_at > now() - make_interval(secs => :window)
+            """
+        ),
+        {
+            "pending": OutboxEventStatus.PENDING.name,
+            "failed": OutboxEventStatus.FAILED.name,
+            "done": OutboxEventStatus.DONE.name,
+            "window": OUTBOX_STATS_WINDOW_SECONDS,
+        }
+    )
+    row = result.one()
+
+    def seconds(value):
+        return round(float(value), 3) if value is not None else None
+
+    return {
+        "pending": row.pending,
+        "oldest_pending_age_seconds": seconds(row.oldest_pending),
+        "failed": row.failed,
+        "window_seconds": OUTBOX_STATS_WINDOW_SECONDS,
+        "delivered_last_window": row.delivered,
+        "events_per_second": round(row.delivered / OUTBOX_STATS_WINDOW_SECONDS, 3),
+        "lag_seconds": {"p50": seconds(row.lag_p50), "p95": seconds(row.lag_p95)},
+    }
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from sqlalchemy import select, event, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models.pharmacy_model import Pharmacy, PharmacyStock
+from utils.spatial_index import GeoGridIndex, haversine_km
+from utils.inventory_index import InventoryIndex, normalize_medication
+from utils.match_cache import MatchCache
+from dotenv import load_dotenv
+load_dotenv()
+
+PHARMACY_INDEX_CELL_DEGREES = float(os.getenv("PHARMACY_INDEX_CELL_DEGREES", 0.05))
+# Other processes' pharmacy changes are picked up from updated_at this often
+PHARMACY_INDEX_REFRESH_SECONDS = float(os.getenv("PHARMACY_INDEX_REFRESH_SECONDS", 30))
+PHARMACY_MATCH_RADIUS_KM = float(os.getenv("PHARMACY_MATCH_RADIUS_KM", 15))
+PHARMACY_MATCH_LIMIT = int(os.getenv("PHARMACY_MATCH_LIMIT", 10))
+PHARMACY_MATCH_CACHE_SIZE = int(os.getenv("PHARMACY_MATCH_CACHE_SIZE", 10000))
+PHARMACY_MATCH_CACHE_TTL_SECONDS = float(os.getenv("PHARMACY_MATCH_CACHE_TTL_SECONDS", 60))
+# Delivery points in the same cell share match results (0.01 degrees is ~1.1 km)
+PHARMACY_MATCH_CACHE_CELL_DEGREES = float(os.getenv("PHARMACY_MATCH_CACHE_CELL_DEGREES", 0.01))
+# Refreshes re-read this much history so rows from transactions that committed late are not missed
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedPharmacy:
+    id: str
+    name: str
+    latitude: float
+    longitude: float
+    # Bit position in the inventory bitsets
+    slot: int
+
+    @classmethod
+    def from_row(cls, row) -> "IndexedPharmacy":
+        return cls(
+            id=row.id,
+            name=row.name,
+            latitude=row.latitude,
+            longitude=row.longitude,
+            slot=inventory_index.slot(row.id)
+        )
+
+
+# Active pharmacies and their stock in this process, kept current by the hooks below and periodic refreshes
+pharmacy_index = GeoGridIndex(PHARMACY_INDEX_CELL_DEGREES)
+inventory_index = InventoryIndex()
+synced_until: Optional[datetime] = None
+
+# Match results up to the default radius; wider searches are not cached
+match_cache = MatchCache(
+    PHARMACY_MATCH_CACHE_SIZE,
+    PHARMACY_MATCH_CACHE_TTL_SECONDS,
+    PHARMACY_MATCH_CACHE_CELL_DEGREES,
+    PHARMACY_MATCH_RADIUS_KM
+)
+
+
+def index_pharmacy(pharmacy: Optional[IndexedPharmacy], pharmacy_id: str):
+    previous = pharmacy_index.get(pharmacy_id)
+    if previous is not None and previous[2] == pharmacy:
+        return
+    if pharmacy is None:
+        pharmacy_index.remove(pharmacy_id)
+    else:
+        pharmacy_index.upsert(pharmacy.id, pharmacy.latitude, pharmacy.longitude, pharmacy)
+    # Matches near where the pharmacy was and where it is now may change
+    if previous is not None:
+        match_cache.invalidate_near(previous[0], previous[1])
+    if pharmacy is not None:
+        match_cache.invalidate_near(pharmacy.latitude, pharmacy.longitude)
+
+
+def index_stock(pharmacy_id: str, medication_key: str, in_stock: bool):
+    if not inventory_index.set_stock(pharmacy_id, medication_key, in_stock):
+        return
+    located = pharmacy_index.get(pharmacy_id)
+    if located is not None:
+        match_cache.invalidate_near(located[0], located[1], medication=medication_key)
+
+
+def index_columns():
+    return select(
+        Pharmacy.id,
+        Pharmacy.name,
+        Pharmacy.latitude,
+        Pharmacy.longitude,
+        Pharmacy.is_active,
+        Pharmacy.updated_at
+    )
+
+
+def stock_columns():
+    return select(PharmacyStock.pharmacy_id, PharmacyStock.medication_key, PharmacyStock.quantity)
+
+
+async def load_pharmacy_index(db: AsyncSession) -> int:
+    """Rebuild the index from every active pharmacy and all stock"""
+    global synced_until
+    started = (await db.execute(select(func.now()))).scalar_one()
+    result = await db.execute(index_columns().where(Pharmacy.is_active.is_(True)))
+    rows = result.all()
+    result = await db.execute(stock_columns().where(PharmacyStock.quantity > 0))
+    stock = result.all()
+    await db.commit()
+
+    pharmacy_index.clear()
+    for row in rows:
+        index_pharmacy(IndexedPharmacy.from_row(row), row.id)
+    inventory_index.load((row.pharmacy_id, row.medication_key) for row in stock)
+    match_cache.clear()
+    synced_until = started
+    logger.info("Pharmacy index loaded with %d pharmacies, %d stock entries", len(rows), len(stock))
+    return len(rows)
+
+
+async def refresh_pharmacy_index(db: AsyncSession) -> int:
+    """Apply pharmacies and stock changed (or deactivated) since the last load or refresh"""
+    global synced_until
+    if synced_until is None:
+        return await load_pharmacy_index(db)
+
+    started = (await db.execute(select(func.now()))).scalar_one()
+    since = synced_until - REFRESH_OVERLAP
+    result = await db.execute(index_columns().where(Pharmacy.updated_at > since))
+    rows = result.all()
+    result = await db.execute(stock_columns().where(PharmacyStock.updated_at > since))
+    stock = result.all()
+    await db.commit()
+
+    for row in rows:
+        index_pharmacy(IndexedPharmacy.from_row(row) if row.is_active else None, row.id)
+    for row in stock:
+        index_stock(row.pharmacy_id, row.medication_key, row.quantity > 0)
+    synced_until = started
+    return len(rows) + len(stock)
+
+
+async def refresh_pharmacy_index_periodically():
+    while True:
+        await asyncio.sleep(PHARMACY_INDEX_REFRESH_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await refresh_pharmacy_index(db)
+        except Exception:
+            logger.exception("Pharmacy index refresh failed")
+
+
+async def set_pharmacy_stock(db: AsyncSession, pharmacy_id: str, items: Iterable[tuple[str, int]]):
+    """
+    Upsert a pharmacy's stock of each (medication_name, quantity).
+    The inventory index is updated when the caller commits.
+    """
+    rows = {}
+    for medication_name, quantity in items:
+        key = normalize_medication(medication_name)
+        rows[key] = {
+            "pharmacy_id": pharmacy_id,
+            "medication_key": key,
+            "medication_name": medication_name.strip(),
+            "quantity": quantity,
+        }
+    if not rows:
+        return
+
+    stmt = insert(PharmacyStock).values(list(rows.values()))
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[PharmacyStock.pharmacy_id, PharmacyStock.medication_key],
+            set_={
+                "medication_name": stmt.excluded.medication_name,
+                "quantity": stmt.excluded.quantity,
+                "updated_at": func.now(),
+            }
+        )
+    )
+    db.info.setdefault("inventory_index", []).extend(
+        (pharmacy_id, key, row["quantity"] > 0) for key, row in rows.items()
+    )
+
+
+def match_pharmacies(
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    limit: int,
+    medications: Optional[tuple[str, ...]]
+) -> list[tuple[IndexedPharmacy, Optional[bool]]]:
+    """(pharmacy, has_all_items) for up to `limit` stockists of every item and `limit` others"""
+    if medications is None:
+        return [(pharmacy, None) for _, _, pharmacy in pharmacy_index.nearest(latitude, longitude, limit, radius_km)]
+
+    mask = inventory_index.stocking_all(medications)
+    found = pharmacy_index.nearest(
+        latitude, longitude, limit, radius_km,
+        where=lambda _, pharmacy: mask >> pharmacy.slot & 1
+    )
+    matches = [(pharmacy, True) for _, _, pharmacy in found]
+    if len(matches) < limit:
+        found = pharmacy_index.nearest(
+            latitude, longitude, limit - len(matches), radius_km,
+            where=lambda _, pharmacy: not mask >> pharmacy.slot & 1
+        )
+        matches += [(pharmacy, False) for _, _, pharmacy in found]
+    return matches
+
+
+def pharmacies_within(
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    medications: Optional[tuple[str, ...]]
+) -> list[tuple[IndexedPharmacy, Optional[bool]]]:
+    """(pharmacy, has_all_items) for every active pharmacy within `radius_km`"""
+    found = pharmacy_index.within(latitude, longitude, radius_km)
+    if medications is None:
+        return [(pharmacy, None) for _, _, pharmacy in found]
+    mask = inventory_index.stocking_all(medications)
+    return [(pharmacy, bool(mask >> pharmacy.slot & 1)) for _, _, pharmacy in found]
+
+
+def find_nearby_pharmacies(
+    latitude: float,
+    longitude: float,
+    radius_km: float = PHARMACY_MATCH_RADIUS_KM,
+    limit: int = PHARMACY_MATCH_LIMIT,
+    medications: Optional[Iterable[str]] = None
+) -> list[dict]:
+    """
+    Nearest active pharmacies to a point, nearest first.
+    With `medications`, pharmacies stocking all of them come first and each
+    result says whether it has all items.
+    Candidates are cached per location cell and medication set: every
+    pharmacy the radius can reach from anywhere in the cell, so ranking them
+    from the exact point and cutting to `limit` gives the uncached result.
+    """
+    if medications is not None:
+        medications = tuple(sorted({normalize_medication(medication) for medication in medications}))
+
+    if radius_km > PHARMACY_MATCH_RADIUS_KM:
+        candidates = match_pharmacies(latitude, longitude, radius_km, limit, medications)
+    else:
+        cell = match_cache.cell(latitude, longitude)
+        key = (cell, medications, radius_km)
+        candidates = match_cache.get(key)
+        if candidates is None:
+            # Not cut to `limit`: the nearest from the centre need not be the nearest from the point
+            candidates = pharmacies_within(*match_cache.centre(cell), radius_km + match_cache.margin_km, medications)
+            match_cache.set(key, candidates)
+
+    matches = []
+    for pharmacy, has_all_items in candidates:
+        distance = haversine_km(latitude, longitude, pharmacy.latitude, pharmacy.longitude)
+        if distance <= radius_km:
+            matches.append((has_all_items is False, distance, pharmacy, has_all_items))
+    matches.sort(key=lambda match: match[:2])
+    return [
+        pharmacy_match(distance, pharmacy, has_all_items)
+        for _, distance, pharmacy, has_all_items in matches[:limit]
+    ]
+
+
+def pharmacy_match(distance: float, pharmacy: IndexedPharmacy, has_all_items: Optional[bool]) -> dict:
+    match = {
+        "pharmacy_id": pharmacy.id,
+        "name": pharmacy.name,
+        "distance_km": round(distance, 2),
+        "latitude": pharmacy.latitude,
+        "longitude": pharmacy.longitude,
+    }
+    if has_all_items is not None:
+        match["has_all_items"] = has_all_items
+    return match
+
+
+def index_stats() -> dict:
+    return {
+        **pharmacy_index.stats(),
+        "inventory": inventory_index.stats(),
+        "match_cache": match_cache.stats(),
+        "synced_until": synced_until.isoformat() if synced_until else None,
+    }
+
+
+@event.listens_for(Pharmacy, "after_insert")
+@event.listens_for(Pharmacy, "after_update")
+def _queue_pharmacy_index_update(mapper, connection, target):
+    entry = IndexedPharmacy.from_row(target) if target.is_active else None
+    object_session(target).info.setdefault("pharmacy_index", {})[target.id] = entry
+
+
+@event.listens_for(Pharmacy, "after_delete")
+def _queue_pharmacy_index_removal(mapper, connection, target):
+    object_session(target).info.setdefault("pharmacy_index", {})[target.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pharmacy_index_updates(session):
+    for pharmacy_id, entry in session.info.pop("pharmacy_index", {}).items():
+        index_pharmacy(entry, pharmacy_id)
+    for pharmacy_id, medication_key, in_stock in session.info.pop("inventory_index", []):
+        index_stock(pharmacy_id, medication_key, in_stock)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pharmacy_index_updates(session, previous_transaction):
+    session.info.pop("pharmacy_index", None)
+    session.info.pop("inventory_index", None)
@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import heapq
+import math
+import os
+import threading
+import time
+
+TOKEN_REVOCATION_BACKEND = os.getenv("TOKEN_REVOCATION_BACKEND", "memory")
+TOKEN_REVOCATION_BLOOM_CAPACITY = int(os.getenv("TOKEN_REVOCATION_BLOOM_CAPACITY", 1_000_000))
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("TOKEN_REVOCATION_BLOOM_ERROR_RATE", 0.001))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class InMemoryRevocationBackend:
+    """
+    Revoked jtis and token version floors with their expiry, purged lazily once
+    the tokens would have expired anyway. Only this process sees them, so it
+    suits a single API worker; use the redis backend for more.
+    """
+
+    local = True
+
+    def __init__(self):
+        self._expiry = {}
+        self._heap = []
+        self._floors = {}
+        self._lock = threading.Lock()
+
+    async def add(self, jti: str, expires_at: float) -> bool:
+        with self._lock:
+            if jti in self._expiry:
+                return False
+            self._expiry[jti] = expires_at
+            heapq.heappush(self._heap, (expires_at, jti))
+            return True
+
+    async def contains(self, jti: str) -> bool:
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    async def raise_version_floor(self, user_id: str, version: int, expires_at: float):
+        with self._lock:
+            current = self._floors.get(user_id)
+            if current is None or version > current[0]:
+                self._floors[user_id] = (version, expires_at)
+
+    async def version_floor(self, user_id: str) -> int:
+        floor = self._floors.get(user_id)
+        return floor[0] if floor is not None and floor[1] > time.time() else 0
+
+    async def lookup(self, jti: str, user_id: str) -> tuple[bool, int]:
+        return await self.contains(jti), await self.version_floor(user_id)
+
+    def purge(self) -> list[str]:
+        """Drop expired entries and return the jtis still revoked"""
+        now = time.time()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, jti = heapq.heappop(self._heap)
+                self._expiry.pop(jti, None)
+            self._floors = {user_id: floor for user_id, floor in self._floors.items() if floor[1] > now}
+            return list(self._expiry)
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+# Sets a user's token version floor unless a higher one is already set
+RAISE_VERSION_FLOOR_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1], 'EXAT', ARGV[2])
+end
+"""
+
+
+class RedisRevocationBackend:
+    """Revoked jtis and token version floors as expiring Redis keys, shared by every API worker"""
+
+    local = False
+
+    def __init__(self):
+        import redis.asyncio as redis
+
+        self.client = redis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", 6379)),
+            db=int(os.getenv("REDIS_DB", 0)),
+            password=os.getenv("REDIS_PASSWORD") or None
+        )
+
+    @staticmethod
+    def _key(jti: str) -> str:
+        return f"revoked_jti:{jti}"
+
+    @staticmethod
+    def _floor_key(user_id: str) -> str:
+        return f"token_version_floor:{user_id}"
+
+    async def add(self, jti: str, expires_at: float) -> bool:
+        return bool(await self.client.set(self._key(jti), 1, exat=math.ceil(expires_at), nx=True))
+
+    async def contains(self, jti: str) -> bool:
+        return bool(await self.client.exists(self._key(jti)))
+
+    async def raise_version_floor(self, user_id: str, version: int, expires_at: float):
+        await self.client.eval(RAISE_VERSION_FLOOR_SCRIPT, 1, self._floor_key(user_id), version, math.ceil(expires_at))
+
+    async def version_floor(self, user_id: str) -> int:
+        return int(await self.client.get(self._floor_key(user_id)) or 0)
+
+    async def lookup(self, jti: str, user_id: str) -> tuple[bool, int]:
+        """Both checks in one round trip"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.exists(self._key(jti))
+            pipe.get(self._floor_key(user_id))
+            revoked, floor = await pipe.execute()
+        return bool(revoked), int(floor or 0)
+
+    def purge(self) -> list[str]:
+        # Redis expires keys itself
+        return []
+
+    def __len__(self):
+        return -1
+
+
+class RevocationStore:
+    """
+    Set of revoked token ids, plus per-user token version floors: tokens
+    carrying an older token_version than their user's floor are revoked too.
+    With a process-local backend, a Bloom filter answers the common "not
+    revoked" case without touching the set; it is rebuilt from the live
+    entries once enough revocations have expired or it fills up. A shared
+    backend cannot use the filter because other workers revoke tokens too.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.bloom = None
+        self.checks = 0
+        self.bloom_negatives = 0
+        self.revocations = 0
+        # Guards the filter swap; jtis revoked while a new filter is built are
+        # collected in _rebuilding and added to it before it replaces the old one
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._rebuilding = None
+        if backend.local:
+            self.bloom = self._build_bloom([])
+
+    @staticmethod
+    def _build_bloom(jtis: list[str]) -> BloomFilter:
+        capacity = max(TOKEN_REVOCATION_BLOOM_CAPACITY, len(jtis) * 2)
+        bloom = BloomFilter(capacity, TOKEN_REVOCATION_BLOOM_ERROR_RATE)
+        for jti in jtis:
+            bloom.add(jti)
+        return bloom
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        """Revoke a token id until `expires_at`; False if it was already revoked"""
+        if expires_at <= time.time():
+            return True
+        added = await self.backend.add(jti, expires_at)
+        if added:
+            full = False
+            with self._lock:
+                self.revocations += 1
+                if self.bloom is not None:
+                    self.bloom.add(jti)
+                    full = self.bloom.count >= self.bloom.capacity
+                if self._rebuilding is not None:
+                    self._rebuilding.append(jti)
+            if full:
+                await asyncio.to_thread(self.compact)
+        return added
+
+    async def revoke_versions_below(self, user_id: str, version: int, expires_at: float):
+        """Revoke a user's tokens older than `version`, until `expires_at`"""
+        await self.backend.raise_version_floor(user_id, version, expires_at)
+
+    async def is_revoked(self, jti: str, user_id: str = None, token_version: int = 0) -> bool:
+        """Whether a token is revoked by its id, or by its user's token version floor"""
+        self.checks += 1
+        if user_id is None:
+            if self.bloom is not None and jti not in self.bloom:
+                self.bloom_negatives += 1
+                return False
+            return await self.backend.contains(jti)
+        if self.bloom is not None and jti not in self.bloom:
+            self.bloom_negatives += 1
+            return token_version < await self.backend.version_floor(user_id)
+        revoked, floor = await self.backend.lookup(jti, user_id)
+        return revoked or token_version < floor
+
+    def compact(self):
+        """
+        Forget expired revocations and rebuild the Bloom filter without them.
+        Runs off the event loop; revocations made meanwhile are carried over.
+        """
+        with self._compact_lock:
+            with self._lock:
+                self._rebuilding = []
+            try:
+                live = self.backend.purge()
+                if self.bloom is None:
+                    return
+                bloom = self._build_bloom(live)
+                with self._lock:
+                    for jti in self._rebuilding:
+                        bloom.add(jti)
+                    self.bloom = bloom
+            finally:
+                with self._lock:
+                    self._rebuilding = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "revocations": self.revocations,
+            "checks": self.checks,
+            "bloom_negatives": self.bloom_negatives,
+            "bloom_bits": self.bloom.num_bits if self.bloom is not None else None,
+            "bloom_hashes": self.bloom.num_hashes if self.bloom is not None else None,
+        }
+
+
+def create_revocation_store() -> RevocationStore:
+    if TOKEN_REVOCATION_BACKEND == "redis":
+        return RevocationStore(RedisRevocationBackend())
+    if TOKEN_REVOCATION_BACKEND == "memory":
+        return RevocationStore(InMemoryRevocationBackend())
+    raise RuntimeError(f"Unknown TOKEN_REVOCATION_BACKEND '{TOKEN_REVOCATION_BACKEND}'")
+
+
+revocation_store = create_revocation_store()
@@ -0,0 +1,134 @@
+import math
+import threading
+from typing import Any, Callable, Hashable, Optional
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class GeoGridIndex:
+    """
+    Points bucketed into a grid of `cell_degrees` x `cell_degrees` cells.
+    A radius query only measures the points in cells overlapping the query's
+    bounding box, so its cost follows local density rather than the total
+    number of points. Points can be added, moved and removed one at a time.
+    """
+
+    def __init__(self, cell_degrees: float = 0.05):
+        self.cell_degrees = cell_degrees
+        self._cells = {}
+        self._where = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def upsert(self, key: Hashable, lat: float, lon: float, value: Any = None):
+        cell = self._cell(lat, lon)
+        with self._lock:
+            previous = self._where.get(key)
+            if previous is not None and previous != cell:
+                self._discard(key, previous)
+            self._cells.setdefault(cell, {})[key] = (lat, lon, value)
+            self._where[key] = cell
+
+    def remove(self, key: Hashable) -> bool:
+        with self._lock:
+            cell = self._where.pop(key, None)
+            if cell is None:
+                return False
+            self._discard(key, cell)
+            return True
+
+    def _discard(self, key: Hashable, cell: tuple[int, int]):
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+
+    def get(self, key: Hashable) -> Optional[tuple[float, float, Any]]:
+        """(lat, lon, value) of a point, or None"""
+        with self._lock:
+            cell = self._where.get(key)
+            return None if cell is None else self._cells[cell][key]
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._where.clear()
+
+    def within(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        limit: Optional[int] = None,
+        where: Optional[Callable[[Hashable, Any], bool]] = None
+    ) -> list[tuple[float, Hashable, Any]]:
+        """
+        (distance_km, key, value) for every point within `radius_km`, nearest first.
+        `where(key, value)` filters points before any distance is computed.
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        # Longitude degrees shrink towards the poles; size the box for the widest latitude it spans
+        widest = min(abs(lat) + dlat, 89.9)
+        dlon = radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest)))
+        row0, col0 = self._cell(lat - dlat, lon - dlon)
+        row1, col1 = self._cell(lat + dlat, lon + dlon)
+
+        found = []
+        with self._lock:
+            for row in range(row0, row1 + 1):
+                for col in range(col0, col1 + 1):
+                    bucket = self._cells.get((row, col))
+                    if not bucket:
+                        continue
+                    for key, (plat, plon, value) in bucket.items():
+                        if abs(plat - lat) > dlat or abs(plon - lon) > dlon:
+                            continue
+                        if where is not None and not where(key, value):
+                            continue
+                        distance = haversine_km(lat, lon, plat, plon)
+                        if distance <= radius_km:
+                            found.append((distance, key, value))
+
+        found.sort(key=lambda item: item[0])
+        return found[:limit] if limit is not None else found
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        max_radius_km: float,
+        where: Optional[Callable[[Hashable, Any], bool]] = None
+    ) -> list[tuple[float, Hashable, Any]]:
+        """Up to `k` nearest points within `max_radius_km`, widening the search from one cell outwards"""
+        radius = min(self.cell_degrees * KM_PER_DEGREE, max_radius_km)
+        while True:
+            found = self.within(lat, lon, radius, limit=k, where=where)
+            if len(found) >= k or radius >= max_radius_km:
+                return found
+            radius = min(radius * 2, max_radius_km)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def stats(self) -> dict:
+        return {
+            "points": len(self._where),
+            "cells": len(self._cells),
+            "cell_degrees": self.cell_degrees,
+        }
@@ -0,0 +1,255 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator
+import anyio
+from fastapi import HTTPException, UploadFile
+from dotenv import load_dotenv
+load_dotenv()
+
+STORAGE_TYPE = os.getenv("STORAGE_TYPE", "local")
+LOCAL_STORAGE_PATH = os.getenv("LOCAL_STORAGE_PATH", "uploads")
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10485760))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+
+
+@dataclass
+class StoredFile:
+    key: str
+    size: int
+    sha256: str
+
+
+async def iter_upload(upload: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read an UploadFile in fixed-size chunks"""
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+
+async def no_chunks() -> AsyncIterator[bytes]:
+    return
+    yield
+
+
+def file_too_large(max_size: int = MAX_FILE_SIZE) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum size is {max_size} bytes"
+    )
+
+
+def offset_mismatch(offset: int) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Upload offset mismatch, resume from byte {offset}",
+        headers={"Upload-Offset": str(offset)}
+    )
+
+
+def upload_busy() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="Another request is writing to this upload"
+    )
+
+
+class StorageBackend(ABC):
+    """Where uploaded documents live; keys are '/'-separated relative paths"""
+
+    @abstractmethod
+    async def save_stream(self, key: str, chunks: AsyncIterator[bytes], max_size: int = MAX_FILE_SIZE) -> StoredFile:
+        ...
+
+    async def save_upload(self, key: str, upload: UploadFile, max_size: int = MAX_FILE_SIZE) -> StoredFile:
+        """Stream an UploadFile into storage, rejecting it early when the declared size is too big"""
+        if upload.size is not None and upload.size > max_size:
+            raise file_too_large(max_size)
+        return await self.save_stream(key, iter_upload(upload), max_size)
+
+    @abstractmethod
+    async def move(self, src_key: str, dst_key: str):
+        """Atomically put the object at src_key under dst_key, replacing any existing one"""
+
+    @abstractmethod
+    async def append_stream(self, key: str, offset: int, chunks: AsyncIterator[bytes], max_size: int = MAX_FILE_SIZE) -> int:
+        """
+        Append to an existing object that must currently be `offset` bytes long; returns the new length.
+        Bytes that arrived before the stream broke off are kept, so the writer can resume after them.
+        """
+
+    @abstractmethod
+    async def size(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    async def seal(self, key: str, dst_key: str) -> StoredFile:
+        """Hash a completed appendable object and move it to dst_key, locking out further appends"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def list_stale(self, prefix: str, older_than: float) -> list[str]:
+        """Keys under `prefix` not modified since `older_than` (a Unix time), for sweeping"""
+
+    @abstractmethod
+    async def delete_if_stale(self, key: str, older_than: float) -> bool:
+        """Delete an object unless it was modified after `older_than`; True if it was deleted"""
+
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        """Filesystem path for a key; derivative rendering and image responses read from it"""
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Files under LOCAL_STORAGE_PATH.
+    Data goes to a temporary file next to the destination and is renamed into
+    place once complete, so readers never see a partial file.
+    """
+
+    def __init__(self, root: str = LOCAL_STORAGE_PATH):
+        self.root = os.path.abspath(root)
+
+    def local_path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Storage key escapes the storage root: {key}")
+        return path
+
+    async def save_stream(self, key: str, chunks: AsyncIterator[bytes], max_size: int = MAX_FILE_SIZE) -> StoredFile:
+        path = self.local_path(key)
+        await anyio.to_thread.run_sync(lambda: os.makedirs(os.path.dirname(path), exist_ok=True))
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        digest = hashlib.sha256()
+        size = 0
+
+        def write(chunk: bytes):
+            digest.update(chunk)
+            os.write(fd, chunk)
+
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise file_too_large(max_size)
+                await anyio.to_thread.run_sync(write, chunk)
+            os.close(fd)
+            fd = None
+            await anyio.to_thread.run_sync(os.replace, tmp_path, path)
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            os.unlink(tmp_path)
+            raise
+
+        return StoredFile(key=key, size=size, sha256=digest.hexdigest())
+
+    async def move(self, src_key: str, dst_key: str):
+        src, dst = self.local_path(src_key), self.local_path(dst_key)
+
+        def replace():
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            os.replace(src, dst)
+
+        await anyio.to_thread.run_sync(replace)
+
+    def _open_locked(self, key: str):
+        """Open an existing file for writing, holding an exclusive lock that stops concurrent appends"""
+        fd = os.open(self.local_path(key), os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise upload_busy()
+        return fd
+
+    async def append_stream(self, key: str, offset: int, chunks: AsyncIterator[bytes], max_size: int = MAX_FILE_SIZE) -> int:
+        fd = await anyio.to_thread.run_sync(self._open_locked, key)
+        try:
+            size = os.fstat(fd).st_size
+            if size != offset:
+                raise offset_mismatch(size)
+            os.lseek(fd, size, os.SEEK_SET)
+
+            async for chunk in chunks:
+                if size + len(chunk) > max_size:
+                    os.ftruncate(fd, offset)
+                    raise file_too_large(max_size)
+                await anyio.to_thread.run_sync(os.write, fd, chunk)
+                size += len(chunk)
+            return size
+        finally:
+            os.close(fd)
+
+    async def size(self, key: str) -> int:
+        return (await anyio.to_thread.run_sync(os.stat, self.local_path(key))).st_size
+
+    async def seal(self, key: str, dst_key: str) -> StoredFile:
+        src, dst = self.local_path(key), self.local_path(dst_key)
+
+        def hash_and_move() -> StoredFile:
+            fd = self._open_locked(key)
+            try:
+                digest = hashlib.sha256()
+                size = 0
+                while chunk := os.read(fd, UPLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                # Renamed while still locked, so no append can land after the hash
+                os.replace(src, dst)
+            finally:
+                os.close(fd)
+            return StoredFile(key=dst_key, size=size, sha256=digest.hexdigest())
+
+        return await anyio.to_thread.run_sync(hash_and_move)
+
+    async def delete(self, key: str):
+        try:
+            await anyio.to_thread.run_sync(os.unlink, self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    async def list_stale(self, prefix: str, older_than: float) -> list[str]:
+        top = self.local_path(prefix)
+
+        def walk() -> list[str]:
+            keys = []
+            for directory, _, names in os.walk(top):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    try:
+                        if os.stat(path).st_mtime < older_than:
+                            keys.append(os.path.relpath(path, self.root).replace(os.sep, "/"))
+                    except FileNotFoundError:
+                        pass
+            return keys
+
+        return await anyio.to_thread.run_sync(walk)
+
+    async def delete_if_stale(self, key: str, older_than: float) -> bool:
+        path = self.local_path(key)
+
+        def delete() -> bool:
+            try:
+                # A file replaced since it was listed (same content uploaded again) is kept
+                if os.stat(path).st_mtime >= older_than:
+                    return False
+                os.unlink(path)
+                return True
+            except FileNotFoundError:
+                return False
+
+        return await anyio.to_thread.run_sync(delete)
+
+
+def get_storage() -> StorageBackend:
+    """Storage backend selected by STORAGE_TYPE"""
+    if STORAGE_TYPE == "local":
+        return LocalStorageBackend()
+    raise RuntimeError(f"Unsupported STORAGE_TYPE '{STORAGE_TYPE}'")
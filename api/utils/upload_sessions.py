@@ -0,0 +1,67 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.order_model import Order
+from models.prescription_model import PrescriptionUpload
+from utils.storage import get_storage, no_chunks
+from dotenv import load_dotenv
+load_dotenv()
+
+# Sessions expire this long after their last chunk; the partial file is deleted with them
+UPLOAD_SESSION_TTL_SECONDS = float(os.getenv("UPLOAD_SESSION_TTL_SECONDS", 86400))
+
+
+def partial_key(upload_id: str) -> str:
+    return f"partial/{upload_id}"
+
+
+def session_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+
+
+async def create_upload_session(db: AsyncSession, order: Order, size: int, content_type: str) -> PrescriptionUpload:
+    """Create an upload session and its empty partial file; the caller commits"""
+    session = PrescriptionUpload(
+        id=uuid.uuid4().hex,
+        order_id=order.id,
+        size=size,
+        content_type=content_type,
+        expires_at=session_expiry()
+    )
+    await get_storage().save_stream(partial_key(session.id), no_chunks())
+    db.add(session)
+    return session
+
+
+async def get_upload_session(db: AsyncSession, order_id: str, upload_id: str) -> PrescriptionUpload:
+    """Load a live upload session belonging to the order with public id `order_id`"""
+    result = await db.execute(
+        select(PrescriptionUpload)
+        .join(Order, Order.id == PrescriptionUpload.order_id)
+        .where(PrescriptionUpload.id == upload_id, Order.order_id == order_id)
+    )
+    session = result.scalar_one_or_none()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if session.expires_at <= datetime.now(timezone.utc):
+        raise HTTPException(status_code=410, detail="Upload has expired, please start again")
+    return session
+
+
+async def expire_upload_sessions(db: AsyncSession) -> int:
+    """Delete expired upload sessions and their partial files; returns how many were removed"""
+    result = await db.execute(
+        delete(PrescriptionUpload)
+        .where(PrescriptionUpload.expires_at < func.now())
+        .returning(PrescriptionUpload.id)
+    )
+    upload_ids = result.scalars().all()
+    await db.commit()
+
+    storage = get_storage()
+    for upload_id in upload_ids:
+        await storage.delete(partial_key(upload_id))
+    return len(upload_ids)
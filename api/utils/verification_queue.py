@@ -0,0 +1,265 @@
+import logging
+import os
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import select, update, insert, func, or_, and_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models.order_model import Order, OrderItem, OrderStatus, PrescriptionStatus
+from models.prescription_model import PrescriptionBlob, VerificationJob, VerificationJobStatus
+from schemas.order_schema import MedicationItem
+from utils.blob_store import record_verification, record_derivatives, blob_key
+from utils.derivatives import create_derivatives
+from utils.doc_verify import verify_prescription_document, find_matching_pharmacies, notify_pharmacies
+from utils.storage import get_storage
+from utils.order_events import record_order_event, ORDER_VERIFIED, ORDER_REJECTED, ORDER_VERIFICATION_FAILED
+from utils.order_state import transition_order
+from dotenv import load_dotenv
+load_dotenv()
+
+VERIFICATION_MAX_ATTEMPTS = int(os.getenv("VERIFICATION_MAX_ATTEMPTS", 5))
+# Retry delay doubles after each failed attempt, starting from this
+VERIFICATION_RETRY_BACKOFF_SECONDS = float(os.getenv("VERIFICATION_RETRY_BACKOFF_SECONDS", 30))
+# A running job not finished within this long is assumed lost with its worker and is claimed again
+VERIFICATION_JOB_TIMEOUT_SECONDS = float(os.getenv("VERIFICATION_JOB_TIMEOUT_SECONDS", 300))
+# Shown on an order whose document could not be verified
+VERIFICATION_FAILED_REASON = "The prescription could not be checked. Please upload it again."
+# Window of finished jobs the latency percentiles are computed over
+VERIFICATION_STATS_WINDOW_SECONDS = float(os.getenv("VERIFICATION_STATS_WINDOW_SECONDS", 900))
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_verification(db: AsyncSession, order: Order, blob: PrescriptionBlob):
+    """Queue verification of an order's prescription; the caller commits"""
+    await db.execute(insert(VerificationJob).values(order_id=order.id, blob_sha256=blob.sha256))
+
+
+async def claim_verification_job(db: AsyncSession):
+    """
+    Claim the oldest available job, or one whose worker went away, and commit the claim.
+    SKIP LOCKED lets any number of workers poll the table without blocking on each other.
+    """
+    claimable = (
+        select(VerificationJob.id)
+        .where(
+            or_(
+                and_(
+                    VerificationJob.status == VerificationJobStatus.QUEUED,
+                    VerificationJob.available_at <= func.now()
+                ),
+                and_(
+                    VerificationJob.status == VerificationJobStatus.RUNNING,
+                    VerificationJob.locked_at < func.now() - timedelta(seconds=VERIFICATION_JOB_TIMEOUT_SECONDS)
+                )
+            )
+        )
+        .order_by(VerificationJob.available_at, VerificationJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(VerificationJob)
+        .where(VerificationJob.id == claimable)
+        .values(
+            status=VerificationJobStatus.RUNNING,
+            attempts=VerificationJob.attempts + 1,
+            locked_at=func.now(),
+            started_at=func.coalesce(VerificationJob.started_at, func.now())
+        )
+        .returning(
+            VerificationJob.id,
+            VerificationJob.order_id,
+            VerificationJob.blob_sha256,
+            VerificationJob.attempts
+        )
+    )
+    job = result.first()
+    await db.commit()
+    return job
+
+
+async def finish_job(db: AsyncSession, job_id: int, status: VerificationJobStatus, error: str = None):
+    await db.execute(
+        update(VerificationJob)
+        .where(VerificationJob.id == job_id)
+        .values(status=status, last_error=error, finished_at=func.now(), locked_at=None)
+    )
+
+
+async def fail_job(db: AsyncSession, job, error: str):
+    """
+    Give up on a job. Its order, if still waiting on this document, is moved to
+    REJECTED so the customer can upload again, and the customer is told in the
+    same transaction; the caller commits.
+    """
+    logger.error("Verification job %s failed permanently: %s", job.id, error)
+    await finish_job(db, job.id, VerificationJobStatus.FAILED, error)
+    order = await transition_order(
+        db,
+        job.order_id,
+        OrderStatus.VERIFYING,
+        OrderStatus.REJECTED,
+        conditions=(Order.prescription_file_path == blob_key(job.blob_sha256),),
+        returning=(Order.order_id, Order.user_id),
+        prescription_status=PrescriptionStatus.PENDING,
+        rejection_reason=VERIFICATION_FAILED_REASON
+    )
+    if order is not None:
+        await record_order_event(db, ORDER_VERIFICATION_FAILED, order.order_id, order.user_id, error=error)
+
+
+async def retry_or_fail_job(job, error: str):
+    """Put a failed job back on the queue with backoff, or give up after VERIFICATION_MAX_ATTEMPTS"""
+    async with AsyncSessionLocal() as db:
+        if job.attempts >= VERIFICATION_MAX_ATTEMPTS:
+            await fail_job(db, job, error)
+        else:
+            delay = VERIFICATION_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            await db.execute(
+                update(VerificationJob)
+                .where(VerificationJob.id == job.id)
+                .values(
+                    status=VerificationJobStatus.QUEUED,
+                    available_at=func.now() + timedelta(seconds=delay),
+                    last_error=error,
+                    locked_at=None
+                )
+            )
+        await db.commit()
+
+
+async def process_verification_job(job):
+    """
+    Verify a claimed job's document and move its order to VERIFIED or REJECTED,
+    queueing notifications to the matched pharmacies when verified. Also renders the document's normalised image and thumbnails the first time it is seen.
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            blob = await db.get(PrescriptionBlob, job.blob_sha256)
+            if blob is None:
+                await fail_job(db, job, "Document is no longer stored")
+                await db.commit()
+                return
+            # Nothing is held open while the document is being verified
+            await db.commit()
+
+        verification_result = blob.verification_result
+        if verification_result is None:
+            verification_result = await verify_prescription_document(
+                get_storage().local_path(blob.storage_key),
+                blob.content_type
+            )
+
+        derivatives = blob.derivatives
+        if derivatives is None:
+            derivatives = await create_derivatives(blob)
+
+        async with AsyncSessionLocal() as db:
+            if blob.verification_result is None:
+                await record_verification(db, blob.sha256, verification_result)
+            if blob.derivatives is None:
+                await record_derivatives(db, blob.sha256, derivatives)
+                await db.execute(
+                    update(Order)
+                    .where(Order.id == job.order_id, Order.prescription_file_path == blob.storage_key)
+                    .values(
+                        prescription_image_path=derivatives.get("image"),
+                        prescription_thumbnails=derivatives.get("thumbnails")
+                    )
+                )
+
+            if verification_result["valid"]:
+                target = OrderStatus.VERIFIED
+                values = {"prescription_status": PrescriptionStatus.VALID}
+            else:
+                target = OrderStatus.REJECTED
+                values = {
+                    "prescription_status": PrescriptionStatus.INVALID,
+                    "rejection_reason": verification_result["reason"]
+                }
+            # Only if the order still waits on this document; a newer upload has its own job
+            order = await transition_order(
+                db,
+                job.order_id,
+                OrderStatus.VERIFYING,
+                target,
+                conditions=(Order.prescription_file_path == blob.storage_key,),
+                returning=(Order.order_id, Order.user_id, Order.delivery_latitude, Order.delivery_longitude),
+                **values
+            )
+
+            if order is not None and verification_result["valid"]:
+                items = await db.execute(
+                    select(OrderItem.medication_name, OrderItem.quantity, OrderItem.dosage)
+                    .where(OrderItem.order_id == job.order_id)
+                )
+                medications = [MedicationItem(**item._mapping) for item in items]
+                pharmacies = await find_matching_pharmacies(medications, order.delivery_latitude, order.delivery_longitude)
+                # Queued in the same transaction as the status change: both happen or neither
+                await notify_pharmacies(db, order.order_id, pharmacies)
+                await record_order_event(
+                    db, ORDER_VERIFIED, order.order_id, order.user_id, matched_pharmacies=len(pharmacies)
+                )
+            elif order is not None:
+                await record_order_event(
+                    db, ORDER_REJECTED, order.order_id, order.user_id, reason=verification_result["reason"]
+                )
+
+            await finish_job(db, job.id, VerificationJobStatus.DONE)
+            await db.commit()
+
+    except Exception as e:
+        logger.exception("Verification job %s failed", job.id)
+        await retry_or_fail_job(job, str(e))
+
+
+async def latest_verification_job(db: AsyncSession, order_pk: str) -> Optional[VerificationJob]:
+    result = await db.execute(
+        select(VerificationJob)
+        .where(VerificationJob.order_id == order_pk)
+        .order_by(VerificationJob.id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def verification_queue_stats(db: AsyncSession) -> dict:
+    """Queue depth per status, age of the oldest waiting job and recent queue/processing latency"""
+    depth = await db.execute(
+        select(
+            VerificationJob.status,
+            func.count(),
+            func.extract("epoch", func.now() - func.min(VerificationJob.created_at))
+        )
+        .where(VerificationJob.status.in_([VerificationJobStatus.QUEUED, VerificationJobStatus.RUNNING]))
+        .group_by(VerificationJob.status)
+    )
+    depth = depth.all()
+    latency = await db.execute(
+        text("""
+            SELECT
+                count(*) AS finished,
+                percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM started_at - created_at)) AS wait_p50,
+                percentile_cont(0.95) WITHIN GROUP (ORDER BY extract(epoch FROM started_at - created_at)) AS wait_p95,
+                percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM finished_at - created_at)) AS total_p50,
+                percentile_cont(0.95) WITHIN GROUP (ORDER BY extract(epoch FROM finished_at - created_at)) AS total_p95
+            FROM verification_jobs
+            WHERE status = :done AND finished_at > now() - make_interval(secs => :window)
+        """),
+        {"done": VerificationJobStatus.DONE.name, "window": VERIFICATION_STATS_WINDOW_SECONDS}
+    )
+    row = latency.one()
+
+    def seconds(value):
+        return round(float(value), 3) if value is not None else None
+
+    return {
+        "depth": {status.value: count for status, count, _ in depth},
+        "oldest_age_seconds": {status.value: seconds(age) for status, _, age in depth},
+        "finished_last_window": row.finished,
+        "window_seconds": VERIFICATION_STATS_WINDOW_SECONDS,
+        "wait_seconds": {"p50": seconds(row.wait_p50), "p95": seconds(row.wait_p95)},
+        "total_seconds": {"p50": seconds(row.total_p50), "p95": seconds(row.total_p95)},
+    }
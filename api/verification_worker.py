@@ -0,0 +1,76 @@
+"""
+Prescription verification worker.
+Claims jobs from the verification_jobs table and verifies them; run one or more
+next to the API with `python verification_worker.py`.
+"""
+import asyncio
+import logging
+import os
+import signal
+from database import AsyncSessionLocal
+# Order.owner refers to User by name, so its model has to be loaded too
+from models.auth_model import User
+from utils.verification_queue import claim_verification_job, process_verification_job
+from utils.doc_analysis import analysis_pool, DOC_ANALYSIS_WORKERS
+from utils.pharmacy_index import load_pharmacy_index, refresh_pharmacy_index_periodically, PHARMACY_INDEX_REFRESH_SECONDS
+from dotenv import load_dotenv
+load_dotenv()
+
+# Jobs verified concurrently by this process
+VERIFICATION_WORKER_CONCURRENCY = int(os.getenv("VERIFICATION_WORKER_CONCURRENCY", 4))
+# How long an idle worker waits before looking for new jobs again
+VERIFICATION_POLL_INTERVAL_SECONDS = float(os.getenv("VERIFICATION_POLL_INTERVAL_SECONDS", 1))
+
+logger = logging.getLogger("verification_worker")
+
+
+async def work(stopping: asyncio.Event):
+    while not stopping.is_set():
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await claim_verification_job(db)
+        except Exception:
+            logger.exception("Could not claim a verification job")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stopping.wait(), VERIFICATION_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await process_verification_job(job)
+
+
+async def main():
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Finish the jobs in hand, claim nothing new
+        loop.add_signal_handler(sig, stopping.set)
+
+    # Verified orders are matched against this process's copy of the pharmacy index
+    async with AsyncSessionLocal() as db:
+        await load_pharmacy_index(db)
+    refresher = None
+    if PHARMACY_INDEX_REFRESH_SECONDS > 0:
+        refresher = asyncio.create_task(refresh_pharmacy_index_periodically())
+
+    logger.info(
+        "Verification worker started with concurrency %d, %d analysis processes",
+        VERIFICATION_WORKER_CONCURRENCY,
+        DOC_ANALYSIS_WORKERS
+    )
+    try:
+        await asyncio.gather(*(work(stopping) for _ in range(VERIFICATION_WORKER_CONCURRENCY)))
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+        analysis_pool.shutdown()
+    logger.info("Verification worker stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    asyncio.run(main())
@@ -6,7 +6,6 @@ import * as ImagePicker from 'expo-image-picker';
 import * as DocumentPicker from 'expo-document-picker';
 import { PharmacyColors } from '../constants/Colors';
 import { useCustomAlert } from './CustomAlert';
-import { uploadPrescriptionImages } from '../utils/uploadPrescription';
 
 interface PrescriptionUploadModalProps {
   visible: boolean;
@@ -26,6 +26,7 @@ export const API_ENDPOINTS = {
 	orders: {
 		list: `/api/${API_VERSION}/orders`,
 		detail: (id: string) => `/api/${API_VERSION}/orders/${id}`,
+		prescriptionUploads: (id: string) => `/api/${API_VERSION}/orders/${id}/prescription_uploads`,
 	},
 	medicines: {
 		list: `/api/${API_VERSION}/medicines`,
@@ -1,37 +1,91 @@
 // utils/uploadPrescription.ts
-import { Storage, ID } from 'appwrite';
-import { client } from '../config/appwriteConfig';
+// Resumable prescription uploads: the file goes up in chunks, and after a
+// dropped connection the upload carries on from the last byte the server kept.
+import { API_ENDPOINTS, buildApiUrl, fetchJson } from '../config/apiConfig';
 
-const storage = new Storage(client);
-const BUCKET_ID = 'prescriptions'; // Create this bucket in Appwrite
+const CHUNK_SIZE = 256 * 1024;
+const MAX_RETRIES = 5;
 
-export const uploadPrescriptionImages = async (imageUris: string[]) => {
-  const uploadedFiles = [];
+interface UploadSession {
+  upload_id: string;
+  order_id: string;
+  offset: number;
+  size: number;
+  expires_at: string;
+}
 
-  for (const uri of imageUris) {
+interface UploadOptions {
+  // Called after each chunk with the bytes the server has and the file size
+  onProgress?: (sent: number, total: number) => void;
+}
+
+class UploadError extends Error {
+  status?: number;
+
+  constructor(message: string, status?: number) {
+    super(message);
+    this.status = status;
+  }
+}
+
+// Network failures and server errors are worth retrying; other answers are final
+const isRetryable = (error: any) =>
+  !(error instanceof UploadError) || error.status === undefined || error.status >= 500;
+
+const delay = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Append a chunk at `offset`; returns the offset the server is now at
+const sendChunk = async (uploadUrl: string, chunk: Blob, offset: number): Promise<number> => {
+  const response = await fetch(buildApiUrl(uploadUrl), {
+    method: 'PATCH',
+    headers: {
+      'Content-Type': 'application/offset+octet-stream',
+      'Upload-Offset': String(offset),
+    },
+    body: chunk,
+  });
+  const serverOffset = response.headers.get('Upload-Offset');
+
+  // 409: our offset was stale (e.g. a chunk landed but its response was lost)
+  if ((response.ok || response.status === 409) && serverOffset !== null) {
+    return Number(serverOffset);
+  }
+  const data = await response.json().catch(() => null);
+  throw new UploadError((data && data.detail) || response.statusText || 'Upload failed', response.status);
+};
+
+export const uploadPrescription = async (orderId: string, uri: string, options: UploadOptions = {}) => {
+  // Fetch the image as a blob
+  const file = await (await fetch(uri)).blob();
+
+  const base = API_ENDPOINTS.orders.prescriptionUploads(orderId);
+  const session = await fetchJson<UploadSession>(base, {
+    method: 'POST',
+    body: { size: file.size, content_type: file.type || 'image/jpeg' },
+  });
+  const uploadUrl = `${base}/${session.upload_id}`;
+
+  let offset = 0;
+  let failures = 0;
+  while (offset < file.size) {
     try {
-      // Fetch the image as a blob
-      const response = await fetch(uri);
-      const blob = await response.blob();
-      
-      // Create a File object
-      const file = new File([blob], `prescription_${Date.now()}.jpg`, {
-        type: 'image/jpeg',
-      });
-
-      // Upload to Appwrite
-      const result = await storage.createFile(
-        BUCKET_ID,
-        ID.unique(),
-        file
-      );
-
-      uploadedFiles.push(result);
+      offset = await sendChunk(uploadUrl, file.slice(offset, offset + CHUNK_SIZE), offset);
+      failures = 0;
+      options.onProgress?.(offset, file.size);
     } catch (error) {
-      console.error('Upload error:', error);
-      throw error;
+      if (!isRetryable(error) || ++failures > MAX_RETRIES) {
+        console.error('Upload error:', error);
+        throw error;
+      }
+      await delay(500 * 2 ** failures);
+      // Ask the server what it kept and resume from there; if that fails too,
+      // the next PATCH is answered with 409 and the right offset
+      offset = await fetchJson<UploadSession>(uploadUrl)
+        .then(current => current.offset)
+        .catch(() => offset);
     }
   }
 
-  return uploadedFiles;
-};
\ No newline at end of file
+  // Verifies the prescription and notifies pharmacies, like a single-shot upload
+  return fetchJson(`${uploadUrl}/finalize`, { method: 'POST' });
+};